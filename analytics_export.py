@@ -0,0 +1,281 @@
+"""
+Export der Tracks eines Users (Metadaten + alle Punkte) als Parquet oder Arrow IPC für Analysen.
+
+Aufruf:
+    python analytics_export.py --user-id ID --out EXPORTVERZEICHNIS [--format parquet|arrow] [--batch-size 200] [--full]
+
+Ergebnis unter EXPORTVERZEICHNIS/user_<id>/:
+    tracks.<ext>                      eine Zeile pro Track (bei jedem Lauf neu geschrieben, klein)
+    points/year=<JJJJ>/part-<n>.<ext>  eine Zeile pro Punkt, nach Jahr des Track-Datums partitioniert
+    _manifest.json                    pro Track: exportierter Stand (TrackDB.updated_at) und Datei
+
+Inkrementell: neu geschrieben werden nur Tracks, deren updated_at sich seit dem letzten Lauf geändert hat;
+ihre alten Zeilen werden aus den betroffenen Dateien gefiltert, gelöschte Tracks ebenso. Gearbeitet wird in
+Blöcken von --batch-size Tracks, der Speicherbedarf hängt also nicht von der Größe des Accounts ab. Die Punkte
+kommen aus dem Punktspeicher (point_store.py), nur fehlende werden aus der GPX-Datei gelesen. Hat eine
+Jahres-Partition mehr als COMPACT_MAX_PARTS Dateien (z.B. durch tägliche Läufe), werden ihre kleinen Dateien zu
+Dateien mit etwa COMPACT_TARGET_ROWS Punkten zusammengefasst.
+
+Benötigt pyarrow (optional, nur für diesen Export): pip install pyarrow
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+import blob_storage
+import db_config
+import gpx_utils
+import migrations
+import point_store
+import track_analytics
+
+MANIFEST_VERSION = 1
+FILE_EXTENSIONS = {"parquet": "parquet", "arrow": "arrow"}
+COMPACT_MAX_PARTS = 16  # ab mehr Dateien in einer Jahres-Partition wird zusammengefasst
+COMPACT_TARGET_ROWS = 1_000_000  # Punkte pro zusammengefasster Datei (ungefähr)
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        return None
+
+def _write_table(pa, table, path: Path, fmt: str):
+    """Atomar schreiben: erst Temp-Datei, dann os.replace - Leser sehen nie halbe Dateien."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.tmp")
+    if fmt == "parquet":
+        pa.parquet.write_table(table, temp_path, compression="zstd")
+    else:
+        with pa.OSFile(str(temp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temp_path, path)
+
+def _read_table(pa, path: Path, fmt: str):
+    if fmt == "parquet":
+        return pa.parquet.read_table(path)
+    with pa.memory_map(str(path), "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+def _points_schema(pa):
+    return pa.schema([("track_id", pa.int64()), ("point_index", pa.int32()), ("lat", pa.float64()), ("lon", pa.float64()),
+                      ("ele", pa.float32()), ("time", pa.timestamp("ms", tz="UTC")), ("distance_m", pa.float64())])
+
+def _tracks_table(pa, tracks: List[db_config.TrackDB], point_counts: Dict[int, int]):
+    def labels(track):
+        try: return json.loads(track.labels) if track.labels and track.labels != "null" else []
+        except json.JSONDecodeError: return []
+    columns = {
+        "track_id": pa.array([t.id for t in tracks], pa.int64()),
+        "name": pa.array([t.name for t in tracks], pa.string()),
+        "original_filename": pa.array([t.original_filename for t in tracks], pa.string()),
+        "track_date": pa.array([t.track_date for t in tracks], pa.timestamp("ms")),
+        "upload_date": pa.array([t.upload_date for t in tracks], pa.timestamp("ms")),
+        "updated_at": pa.array([t.updated_at for t in tracks], pa.timestamp("ms")),
+        "labels": pa.array([labels(t) for t in tracks], pa.list_(pa.string())),
+        "point_count": pa.array([point_counts.get(t.id) for t in tracks], pa.int64()),
+    }
+    for name in ("distance_km", "gpx_parsed_total_ascent", "gpx_parsed_total_descent", "moving_time_s", "elapsed_time_s",
+                 "avg_moving_speed_kmh", "max_speed_kmh", "smoothed_ascent_m"):
+        columns[name] = pa.array([getattr(t, name) for t in tracks], pa.float64())
+    return pa.table(columns)
+
+def _load_point_arrays(user_id: int, tracks: List[db_config.TrackDB]) -> Dict[int, Dict[str, np.ndarray]]:
+    arrays = point_store.get_track_point_arrays(user_id, [t.id for t in tracks])
+    for track in tracks:
+        if track.id in arrays:
+            continue
+        with blob_storage.get_store().local_file(track.stored_filename) as gpx_file_path:
+            point_arrays = gpx_utils.get_point_arrays_from_gpx_file(str(gpx_file_path)) if gpx_file_path is not None else None
+        if point_arrays is None:
+            print(f"Track ID {track.id}: keine Punkte lesbar ({track.stored_filename}), nur Metadaten exportiert.")
+            continue
+        arrays[track.id] = point_arrays
+    return arrays
+
+def _points_table(pa, track_ids: List[int], arrays: Dict[int, Dict[str, np.ndarray]]):
+    parts = [arrays[track_id] for track_id in track_ids]
+    counts = np.array([part["lat"].size for part in parts], dtype=np.int64)
+    time_s = np.concatenate([part["time"] for part in parts]) if parts else np.empty(0)
+    distance_m = [np.concatenate(([0.0], np.cumsum(track_analytics.segment_distances_m(part["lat"], part["lon"])))) if part["lat"].size
+                  else np.empty(0) for part in parts]
+    time_ms = np.where(np.isfinite(time_s), np.round(time_s * 1000), 0).astype(np.int64)
+    return pa.table({
+        "track_id": pa.array(np.repeat(np.array(track_ids, dtype=np.int64), counts)),
+        "point_index": pa.array(np.concatenate([np.arange(n, dtype=np.int32) for n in counts]) if parts else np.empty(0, np.int32)),
+        "lat": pa.array(np.concatenate([part["lat"] for part in parts]) if parts else np.empty(0)),
+        "lon": pa.array(np.concatenate([part["lon"] for part in parts]) if parts else np.empty(0)),
+        "ele": pa.array(np.concatenate([part["ele"] for part in parts]).astype(np.float32) if parts else np.empty(0, np.float32), from_pandas=True),
+        "time": pa.array(time_ms, pa.timestamp("ms", tz="UTC"), mask=~np.isfinite(time_s)),
+        "distance_m": pa.array(np.concatenate(distance_m) if parts else np.empty(0)),
+    }, schema=_points_schema(pa))
+
+def _load_manifest(path: Path, fmt: str) -> Dict[str, Any]:
+    empty = {"version": MANIFEST_VERSION, "format": fmt, "next_part": 0, "tracks": {}}
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return empty
+    except json.JSONDecodeError:
+        print(f"Manifest {path} unlesbar - vollständiger Export.")
+        return empty
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("format") != fmt:
+        print("Manifest-Version oder Format geändert - vollständiger Export.")
+        return empty
+    return manifest
+
+def _save_manifest(path: Path, manifest: Dict[str, Any]):
+    temp_path = path.with_name(f".{path.name}.tmp")
+    temp_path.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(temp_path, path)
+
+def _remove_stale_rows(pa, export_dir: Path, fmt: str, relative_file: str, stale_ids: Set[int]):
+    path = export_dir / relative_file
+    if not path.exists():
+        return
+    table = _read_table(pa, path, fmt)
+    kept = table.filter(pa.compute.invert(pa.compute.is_in(table["track_id"], value_set=pa.array(sorted(stale_ids), pa.int64()))))
+    if kept.num_rows: _write_table(pa, kept, path, fmt)
+    else: path.unlink()
+
+def _compact_partitions(pa, export_dir: Path, fmt: str, manifest_path: Path, manifest: Dict[str, Any]) -> int:
+    """
+    Fasst in Jahres-Partitionen mit mehr als COMPACT_MAX_PARTS Dateien aufeinanderfolgende kleine Dateien zusammen;
+    die Zeilen eines Tracks bleiben dabei in einer Datei. Erst neue Datei schreiben, dann Manifest, dann alte Dateien
+    löschen - nach einem Abbruch entfernt der nächste Lauf die nicht mehr referenzierten. Rückgabe: entfernte Dateien.
+    """
+    exported: Dict[str, Dict[str, Any]] = manifest["tracks"]
+    rows_by_file: Dict[str, int] = defaultdict(int)
+    for entry in exported.values():
+        if entry.get("file"):
+            rows_by_file[entry["file"]] += entry.get("point_count") or 0
+    files_by_partition: Dict[str, List[str]] = defaultdict(list)
+    for relative_file in sorted(rows_by_file):
+        files_by_partition[relative_file.rsplit("/", 1)[0]].append(relative_file)
+
+    removed_files = 0
+    for partition, files in sorted(files_by_partition.items()):
+        if len(files) <= COMPACT_MAX_PARTS:
+            continue
+        groups: List[List[str]] = [[]]
+        group_rows = 0
+        for relative_file in files:
+            if group_rows >= COMPACT_TARGET_ROWS:
+                groups.append([]); group_rows = 0
+            groups[-1].append(relative_file)
+            group_rows += rows_by_file[relative_file]
+        for group in groups:
+            if len(group) < 2:
+                continue
+            relative_file = f"{partition}/part-{manifest['next_part']:06d}.{FILE_EXTENSIONS[fmt]}"
+            manifest["next_part"] += 1
+            _write_table(pa, pa.concat_tables([_read_table(pa, export_dir / f, fmt) for f in group]), export_dir / relative_file, fmt)
+            merged = set(group)
+            for entry in exported.values():
+                if entry.get("file") in merged:
+                    entry["file"] = relative_file
+            _save_manifest(manifest_path, manifest)
+            for old_file in group:
+                (export_dir / old_file).unlink(missing_ok=True)
+            removed_files += len(group) - 1
+        print(f"  {partition}: {len(files)} Dateien zu {len(groups)} zusammengefasst")
+    return removed_files
+
+def export_user(user_id: int, out_dir: Path, fmt: str = "parquet", batch_size: int = 200, full: bool = False) -> int:
+    pa = _pyarrow()
+    if pa is None:
+        print("pyarrow ist nicht installiert (pip install pyarrow) - Export nicht möglich.")
+        return 1
+    ext = FILE_EXTENSIONS[fmt]
+    export_dir = out_dir / f"user_{user_id}"
+    manifest_path = export_dir / "_manifest.json"
+    export_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {"version": MANIFEST_VERSION, "format": fmt, "next_part": 0, "tracks": {}} if full else _load_manifest(manifest_path, fmt)
+    exported: Dict[str, Dict[str, Any]] = manifest["tracks"]
+
+    # Reste abgebrochener Läufe (Dateien ohne Manifest-Eintrag) und bei --full/Formatwechsel alles Alte entfernen
+    referenced = {entry["file"] for entry in exported.values() if entry.get("file")}
+    for old_tracks_file in export_dir.glob("tracks.*"):
+        if old_tracks_file.suffix != f".{ext}": old_tracks_file.unlink()
+    for stray in (export_dir / "points").rglob("*"):
+        if stray.is_file() and stray.relative_to(export_dir).as_posix() not in referenced:
+            stray.unlink()
+
+    started = time.monotonic()
+    db = db_config.SessionLocal()
+    try:
+        tracks = db.query(db_config.TrackDB).filter(db_config.TrackDB.user_id == user_id, db_config.TrackDB.deleted_at.is_(None)) \
+            .order_by(db_config.TrackDB.id).all()
+        db.expunge_all()
+    finally: db.close()
+    current = {str(t.id): t for t in tracks}
+    changed = [t for t in tracks if exported.get(str(t.id), {}).get("updated_at") != str(t.updated_at)]
+    removed_keys = [key for key in exported if key not in current]
+
+    # alte Zeilen geänderter/gelöschter Tracks aus ihren Dateien filtern
+    stale_by_file: Dict[str, Set[int]] = defaultdict(set)
+    for key in removed_keys + [str(t.id) for t in changed]:
+        entry = exported.get(key)
+        if entry and entry.get("file"):
+            stale_by_file[entry["file"]].add(int(key))
+    for relative_file, stale_ids in stale_by_file.items():
+        _remove_stale_rows(pa, export_dir, fmt, relative_file, stale_ids)
+    for key in removed_keys + [str(t.id) for t in changed]:
+        exported.pop(key, None)
+    _save_manifest(manifest_path, manifest)
+
+    by_year: Dict[str, List[db_config.TrackDB]] = defaultdict(list)
+    for track in changed:
+        by_year[str(track.track_date.year) if track.track_date else "unknown"].append(track)
+    written_points = 0
+    for year, year_tracks in sorted(by_year.items()):
+        for start in range(0, len(year_tracks), batch_size):
+            batch = year_tracks[start:start + batch_size]
+            arrays = _load_point_arrays(user_id, batch)
+            with_points = [t.id for t in batch if t.id in arrays]
+            relative_file = None
+            if with_points:
+                relative_file = f"points/year={year}/part-{manifest['next_part']:06d}.{ext}"
+                manifest["next_part"] += 1
+                table = _points_table(pa, with_points, arrays)
+                _write_table(pa, table, export_dir / relative_file, fmt)
+                written_points += table.num_rows
+            for track in batch:
+                exported[str(track.id)] = {"updated_at": str(track.updated_at), "file": relative_file if track.id in arrays else None,
+                                           "point_count": int(arrays[track.id]["lat"].size) if track.id in arrays else None}
+            _save_manifest(manifest_path, manifest)  # nach jedem Block: ein Abbruch wiederholt nur den laufenden Block
+            print(f"  {year}: {min(start + batch_size, len(year_tracks))}/{len(year_tracks)} Tracks exportiert")
+
+    compacted_files = _compact_partitions(pa, export_dir, fmt, manifest_path, manifest)
+
+    point_counts = {int(key): entry.get("point_count") for key, entry in exported.items()}
+    _write_table(pa, _tracks_table(pa, tracks, point_counts), export_dir / f"tracks.{ext}", fmt)
+    print(f"Export User {user_id} ({fmt}): {len(changed)} Tracks neu/geändert ({written_points} Punkte), "
+          f"{len(removed_keys)} entfernt, {len(tracks) - len(changed)} unverändert, {compacted_files} Punktdateien "
+          f"zusammengefasst - {time.monotonic() - started:.1f}s.")
+    return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tracks und Punkte eines Users als Parquet/Arrow exportieren (inkrementell).")
+    parser.add_argument("--user-id", type=int, required=True, help="User, dessen Tracks exportiert werden")
+    parser.add_argument("--out", type=Path, required=True, help="Exportverzeichnis (Unterordner user_<id> wird angelegt)")
+    parser.add_argument("--format", choices=sorted(FILE_EXTENSIONS), default="parquet", help="Dateiformat (Standard: parquet)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Tracks pro Block bzw. Punktdatei")
+    parser.add_argument("--full", action="store_true", help="Alles neu exportieren statt nur Änderungen")
+    args = parser.parse_args(argv)
+    migrations.prepare_database()
+    return export_user(args.user_id, args.out, fmt=args.format, batch_size=max(1, args.batch_size), full=args.full)
+
+if __name__ == "__main__":
+    sys.exit(main())
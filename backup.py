@@ -3,14 +3,19 @@ from datetime import datetime
 import json
 from typing import List, Dict, Any, Optional, Tuple, Set
 import asyncio
+from contextlib import nullcontext
 import traceback
 from pathlib import Path
 from functools import wraps
 from types import SimpleNamespace
 
 import db_config
+import blob_storage
+import file_gc
 import gpx_utils
 import design
+import migrations
+import settings
 
 ui.add_head_html('<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" integrity="sha256-p4NxAoJBhIIN+hmNHrzRCf9tD/miZyoHS5obTRR9BMY=" crossorigin=""/>')
 dynamic_header_renderer = design.apply_design_and_get_header()
@@ -360,9 +365,9 @@ async def update_map_and_related_stats(user_id: int, is_initial_map_fit: bool =
         for track_data in selected_track_display_data:
             total_dist_km += track_data.get('distance_km', 0.0) or 0
             total_asc_m += track_data.get('total_ascent', 0.0) or 0
-            gpx_file_path = db_config.get_gpx_filepath(db, user_id, track_data['id'])
-            if gpx_file_path and gpx_file_path.exists():
-                points = gpx_utils.get_points_from_gpx_file(str(gpx_file_path))
+            stored_filename = db_config.get_gpx_storage_key(db, user_id, track_data['id'])
+            with blob_storage.get_store().local_file(stored_filename) if stored_filename else nullcontext() as gpx_file_path:
+                points = gpx_utils.get_points_from_gpx_file(str(gpx_file_path)) if gpx_file_path else None
                 if points:
                     map_view.generic_layer(name='polyline', args=[points, {'color': design.PRIMARY_COLOR_HEX, 'weight': 3}])
                     all_track_points_for_bounds.extend(points)
@@ -385,25 +390,26 @@ async def update_map_and_related_stats(user_id: int, is_initial_map_fit: bool =
         track_for_profile = selected_track_display_data[0]
         db_chart = db_config.SessionLocal()
         try:
-            gpx_file_path_chart = db_config.get_gpx_filepath(db_chart, user_id, track_for_profile['id'])
-            if gpx_file_path_chart and gpx_file_path_chart.exists():
-                elevation_chart_data = gpx_utils.get_elevation_data_for_chart(str(gpx_file_path_chart))
-                if elevation_chart_data:
-                    with chart_container:
-                        chart_container.clear()
-                        ui.echart({
-                            "title": {"text": f"Höhenprofil: {track_for_profile.get('name', 'Unbenannt')}", "left": 'center', "textStyle": {"fontSize": 14}},
-                            "grid": {"left": '60px', "right": '30px', "bottom": '50px', "top": '50px', "containLabel": False},
-                            "tooltip": {"trigger": 'axis', "axisPointer": {"type": 'cross'}},
-                            "xAxis": {"type": 'category', "boundaryGap": False, "data": elevation_chart_data["categories"], "name": "Distanz (km)", "nameLocation": "middle", "nameGap": 25},
-                            "yAxis": {"type": 'value', "name": "Höhe (m)", "axisLabel": {"formatter": '{value} m'}},
-                            "series": [{"name": "Höhe", "type": 'line', "smooth": True, "data": elevation_chart_data["series_data"],
-                                        "lineStyle": {"color": design.PRIMARY_COLOR_HEX}, "areaStyle": {"color": design.SECONDARY_COLOR_HEX, "opacity": 0.3}}]
-                        }).classes('w-full h-full')
+            stored_filename_chart = db_config.get_gpx_storage_key(db_chart, user_id, track_for_profile['id'])
+            with blob_storage.get_store().local_file(stored_filename_chart) if stored_filename_chart else nullcontext() as gpx_file_path_chart:
+                if gpx_file_path_chart:
+                    elevation_chart_data = gpx_utils.get_elevation_data_for_chart(str(gpx_file_path_chart))
+                    if elevation_chart_data:
+                        with chart_container:
+                            chart_container.clear()
+                            ui.echart({
+                                "title": {"text": f"Höhenprofil: {track_for_profile.get('name', 'Unbenannt')}", "left": 'center', "textStyle": {"fontSize": 14}},
+                                "grid": {"left": '60px', "right": '30px', "bottom": '50px', "top": '50px', "containLabel": False},
+                                "tooltip": {"trigger": 'axis', "axisPointer": {"type": 'cross'}},
+                                "xAxis": {"type": 'category', "boundaryGap": False, "data": elevation_chart_data["categories"], "name": "Distanz (km)", "nameLocation": "middle", "nameGap": 25},
+                                "yAxis": {"type": 'value', "name": "Höhe (m)", "axisLabel": {"formatter": '{value} m'}},
+                                "series": [{"name": "Höhe", "type": 'line', "smooth": True, "data": elevation_chart_data["series_data"],
+                                            "lineStyle": {"color": design.PRIMARY_COLOR_HEX}, "areaStyle": {"color": design.SECONDARY_COLOR_HEX, "opacity": 0.3}}]
+                            }).classes('w-full h-full')
+                    else:
+                        with chart_container: chart_container.clear(); ui.label("Keine Höhendaten verfügbar.").classes('p-2 text-center text-grey w-full')
                 else:
-                    with chart_container: chart_container.clear(); ui.label("Keine Höhendaten verfügbar.").classes('p-2 text-center text-grey w-full')
-            else:
-                with chart_container: chart_container.clear(); ui.label("GPX-Datei für Höhenprofil nicht gefunden.").classes('p-2 text-center text-grey w-full')
+                    with chart_container: chart_container.clear(); ui.label("GPX-Datei für Höhenprofil nicht gefunden.").classes('p-2 text-center text-grey w-full')
         except Exception as e_chart:
             print(f"Fehler beim Erstellen des Höhenprofils: {e_chart}"); traceback.print_exc()
             if chart_container:
@@ -428,14 +434,18 @@ async def delete_multiple_tracks_confirmed(user_id: int, track_ids_to_delete: Li
     if not track_ids_to_delete: return
     db = db_config.SessionLocal()
     try:
-        num_deleted, errors = db_config.delete_multiple_tracks_with_files(db, user_id, track_ids_to_delete)
+        # Papierkorb wie in main.py; Dateien und Artefakte entfernt file_gc.py nach Ablauf des Undo-Fensters
+        num_deleted = db_config.soft_delete_tracks(db, user_id, track_ids_to_delete)
         if num_deleted > 0: ui.notify(f"{num_deleted} Tracks gelöscht.", type='positive')
-        if errors: ui.notify(f"{len(errors)} Fehler beim Löschen: {', '.join(errors)}", type='warning', multi_line=True)
-        if num_deleted == 0 and not errors: ui.notify("Keine Tracks gelöscht.", type='info')
+        else: ui.notify("Keine Tracks gelöscht.", type='info')
         app.storage.user['selected_track_ids_list'] = []
         app.storage.user['map_needs_initial_fit'] = True
         await load_tracks_from_db_and_refresh_ui(user_id)
     finally: db.close()
 
+app.on_startup(file_gc.start)
+app.on_shutdown(file_gc.stop)
+
 app.storage.secret = "MEIN_SUPER_GEHEIMER_STORAGE_KEY_UNBEDINGT_AENDERN"
+migrations.prepare_database(auto_migrate=settings.DEV_MODE)  # Schema (u.a. tracks.deleted_at) wie in main.py
 ui.run(title="GPX Track Manager", storage_secret=app.storage.secret, reload=True, port=8081, show=False)
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Benchmark für den Login-Pfad: 2FA-Codes (bcrypt vs. HMAC) und Passwort-Prüfung (blockierend im Event-Loop
+vs. Auth-Thread-Pool). Läuft gegen eine temporäre Datenbank.
+
+Aufruf:
+    python benchmarks/bench_auth.py [--logins 16] [--codes 20] [--rounds 12] [--threads 2]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+def _configure_environment(args) -> Path:
+    temp_dir = Path(tempfile.mkdtemp(prefix="bench_auth_"))
+    os.environ["GPX_DATABASE_PATH"] = str(temp_dir / "bench.db")
+    os.environ["GPX_BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["GPX_AUTH_THREADS"] = str(args.threads)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    return temp_dir
+
+def bench_2fa_codes(db_config, user_id: int, count: int):
+    started = time.perf_counter()
+    for _ in range(count):
+        code = db_config.generate_email_2fa_code()
+        db_config.verify_password(code, db_config.get_password_hash(code))
+    bcrypt_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(count):
+        code = db_config.generate_email_2fa_code()
+        db_config._check_email_2fa_code(user_id, code, db_config._hash_email_2fa_code(user_id, code))
+    hmac_s = time.perf_counter() - started
+    print(f"2FA-Code setzen+prüfen: bcrypt {count / bcrypt_s:10.1f}/s   HMAC {count / hmac_s:10.1f}/s")
+
+async def _measure_logins(db_config, username: str, password: str, count: int, use_pool: bool):
+    stalls = []
+    stop = asyncio.Event()
+
+    async def ticker():  # misst, wie lange der Event-Loop andere Aufgaben (UI, Websockets) warten lässt
+        while not stop.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stalls.append(time.perf_counter() - before - 0.01)
+
+    async def login():
+        db = db_config.SessionLocal()
+        try:
+            user = db_config.get_user_by_username(db, username)
+            if use_pool:
+                ok = await db_config.run_auth_task(db_config.verify_password_and_upgrade, db, user, password)
+            else:
+                ok = db_config.verify_password_and_upgrade(db, user, password)
+            assert ok
+        finally:
+            db.close()
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(count)))
+    elapsed = time.perf_counter() - started
+    stop.set(); await ticker_task
+    label = "Thread-Pool " if use_pool else "blockierend "
+    print(f"Login {label}: {count / elapsed:6.2f} Logins/s, {elapsed:6.2f}s gesamt, "
+          f"max. Event-Loop-Blockade {max(stalls) * 1000:8.1f} ms")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Login-/2FA-Benchmark")
+    parser.add_argument("--logins", type=int, default=16, help="gleichzeitige Logins")
+    parser.add_argument("--codes", type=int, default=20, help="Anzahl 2FA-Codes")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt-Kostenfaktor")
+    parser.add_argument("--threads", type=int, default=2, help="Auth-Threads")
+    args = parser.parse_args(argv)
+    _configure_environment(args)
+    import db_config
+    import migrations
+    migrations.migrate()
+
+    db = db_config.SessionLocal()
+    try:
+        user = db_config.create_user(db, "bench_auth", "geheim123", "bench@example.com")
+        user_id = user.id
+    finally:
+        db.close()
+    print(f"bcrypt rounds={args.rounds}, Auth-Threads={args.threads}, CPU-Kerne={os.cpu_count()}")
+    bench_2fa_codes(db_config, user_id, args.codes)
+    asyncio.run(_measure_logins(db_config, "bench_auth", "geheim123", args.logins, use_pool=False))
+    asyncio.run(_measure_logins(db_config, "bench_auth", "geheim123", args.logins, use_pool=True))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
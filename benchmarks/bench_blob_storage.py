@@ -0,0 +1,115 @@
+"""
+Benchmark der GPX-Ablage (blob_storage.py) in einem temporären Verzeichnis: flaches Layout gegen
+Hash-Verzeichnisse bei vielen Dateien - Anlegen, exists() auf vorhandene/fehlende Schlüssel, Auflisten für
+den Konsistenz-Abgleich und die Migration flach -> Hash-Layout.
+
+Mit --s3 (Zugangsdaten aus GPX_S3_ENDPOINT/_BUCKET/_ACCESS_KEY/_SECRET_KEY, z.B. ein lokaler MinIO) werden
+zusätzlich sequenzielle gegen parallele asynchrone Uploads und das Auflisten des Buckets gemessen.
+
+Aufruf:
+    python benchmarks/bench_blob_storage.py [--files 200000] [--probes 20000] [--s3] [--s3-files 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CONTENT = b'<?xml version="1.0"?><gpx version="1.1"><trk><trkseg></trkseg></trk></gpx>\n'
+
+def _timed(label: str, action, count: int = 0):
+    started = time.perf_counter()
+    result = action()
+    elapsed = time.perf_counter() - started
+    rate = f"  ({count / elapsed:,.0f}/s)" if count else ""
+    print(f"  {label:<34}{elapsed * 1000:>10.1f}ms{rate}")
+    return result
+
+def _bench_local(blob_storage, root: Path, files: int, probes: int):
+    flat_dir = root / "flat"; flat_dir.mkdir()
+    keys = [f"20250101{i:012d}_track_{i}.gpx" for i in range(files)]
+    rng = random.Random(1)
+    present = rng.sample(keys, min(probes, files)); missing = [f"fehlt_{i}.gpx" for i in range(probes)]
+
+    print(f"Flaches Layout ({files} Dateien in einem Verzeichnis):")
+    def write_flat():
+        for key in keys: (flat_dir / key).write_bytes(CONTENT)
+    _timed("Anlegen", write_flat, files)
+    flat = blob_storage.LocalShardedStore(flat_dir)
+    _timed("exists() vorhanden", lambda: [flat.exists(k) for k in present], len(present))
+    _timed("exists() fehlend", lambda: [flat.exists(k) for k in missing], len(missing))
+    _timed("list_keys()", flat.list_keys)
+
+    print("Migration flach -> Hash-Layout (gleiches Verzeichnis):")
+    moved, failed = _timed("migrate", lambda: asyncio.run(blob_storage.migrate_flat_layout(flat, source=flat)), files)
+    print(f"  {moved} verschoben, {failed} Fehler; Einträge oberste Ebene: {len(os.listdir(flat_dir))}")
+    _timed("exists() vorhanden", lambda: [flat.exists(k) for k in present], len(present))
+    _timed("exists() fehlend", lambda: [flat.exists(k) for k in missing], len(missing))
+    _timed("list_keys()", flat.list_keys)
+
+    sharded_dir = root / "sharded"; sharded_dir.mkdir()
+    sharded = blob_storage.LocalShardedStore(sharded_dir)
+    incoming = sharded_dir / ".incoming"; incoming.mkdir()
+    print(f"Hash-Layout, neu angelegt über put_file ({files} Dateien):")
+    def write_sharded():
+        for key in keys:
+            temp = incoming / f"{key}.part"; temp.write_bytes(CONTENT); sharded.put_file(key, temp)
+    _timed("Anlegen (Temp-Datei + Rename)", write_sharded, files)
+    largest = max(len(os.listdir(d)) for d in sharded_dir.iterdir() if d.name != ".incoming")
+    print(f"  größtes Verzeichnis der obersten Ebene: {largest} Einträge")
+
+def _bench_s3(blob_storage, settings, files: int, concurrency_levels):
+    store = blob_storage.S3Store(settings.S3_ENDPOINT, settings.S3_BUCKET, settings.S3_ACCESS_KEY, settings.S3_SECRET_KEY,
+                                 region=settings.S3_REGION, prefix=f"bench-{int(time.time())}/",
+                                 max_connections=max(concurrency_levels))
+    keys = [f"bench_{i}.gpx" for i in range(files)]
+    print(f"S3 ({settings.S3_ENDPOINT}, Bucket {settings.S3_BUCKET}, {files} Objekte):")
+    _timed("put_bytes sequenziell (100)", lambda: [store.put_bytes(k, CONTENT) for k in keys[:100]], 100)
+
+    async def upload(concurrency: int):
+        semaphore = asyncio.Semaphore(concurrency)
+        async def one(key):
+            async with semaphore: await store.aput_bytes(key, CONTENT)
+        try: await asyncio.gather(*(one(k) for k in keys))
+        finally: await store.aclose()
+    for concurrency in concurrency_levels:
+        _timed(f"aput_bytes parallel={concurrency}", lambda: asyncio.run(upload(concurrency)), files)
+    listed = _timed("list_keys()", store.list_keys, files)
+    print(f"  {len(listed)} Schlüssel gelistet")
+
+    async def delete_all():
+        semaphore = asyncio.Semaphore(max(concurrency_levels))
+        async def one(key):
+            async with semaphore: await store.adelete(key)
+        try: await asyncio.gather(*(one(k) for k in keys))
+        finally: await store.aclose()
+    _timed("adelete (aufräumen)", lambda: asyncio.run(delete_all()), files)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark der GPX-Ablage")
+    parser.add_argument("--files", type=int, default=200_000)
+    parser.add_argument("--probes", type=int, default=20_000)
+    parser.add_argument("--s3", action="store_true", help="zusätzlich gegen GPX_S3_ENDPOINT messen")
+    parser.add_argument("--s3-files", type=int, default=2000)
+    args = parser.parse_args(argv)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import blob_storage
+    import settings
+
+    root = Path(tempfile.mkdtemp(prefix="bench_blobs_"))
+    try:
+        _bench_local(blob_storage, root, args.files, args.probes)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    if args.s3:
+        if not settings.S3_ENDPOINT:
+            print("--s3: GPX_S3_ENDPOINT ist nicht gesetzt."); return 1
+        _bench_s3(blob_storage, settings, args.s3_files, [1, 8, 32])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Benchmark der Track-Formate (track_formats.py / gpx_utils.py): derselbe synthetische Track als GPX, FIT, TCX
+und GeoJSON, gemessen werden reines Dekodieren zu Punkt-Arrays und der komplette Parse-Pfad des Uploads
+(gpx_utils.parse_gpx_data_from_content inkl. Formaterkennung und Analyse). Die dekodierten Punkte werden
+gegen die Ausgangsdaten geprüft.
+
+Aufruf:
+    python benchmarks/bench_formats.py [--points 20000] [--repeat 5]
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+START_TS = 1_717_225_200  # 2024-06-01T07:00:00Z
+
+def _synthetic_track(points: int):
+    rng = np.random.default_rng(7)
+    heading = np.cumsum(rng.normal(0, 0.05, points))
+    lat = 47.5 + np.cumsum(np.cos(heading)) * 4e-5
+    lon = 11.0 + np.cumsum(np.sin(heading)) * 6e-5
+    ele = 600 + np.cumsum(rng.normal(0, 0.4, points))
+    time_s = START_TS + np.arange(points, dtype=np.float64)
+    return {"lat": lat, "lon": lon, "ele": np.round(ele, 1), "time": time_s}
+
+def _encode_fit(arrays) -> bytes:
+    """Minimaler FIT-Encoder: file_id + record-Nachrichten (Zeit, Position, enhanced_altitude), ohne gültige CRC."""
+    semicircles = 2 ** 31 / 180.0
+    body = bytearray()
+    body += struct.pack("<BBBHB", 0x40, 0, 0, 0, 1) + bytes((4, 4, 0x86))  # Definition file_id: time_created
+    body += struct.pack("<BI", 0x00, START_TS - 631065600)
+    body += struct.pack("<BBBHB", 0x41, 0, 0, 20, 5) + bytes((253, 4, 0x86, 0, 4, 0x85, 1, 4, 0x85, 78, 4, 0x86, 3, 1, 0x02))
+    record = struct.Struct("<BIiiIB")
+    for lat, lon, ele, t in zip(arrays["lat"].tolist(), arrays["lon"].tolist(), arrays["ele"].tolist(), arrays["time"].tolist()):
+        body += record.pack(0x01, int(t) - 631065600, round(lat * semicircles), round(lon * semicircles), round((ele + 500) * 5), 120)
+    header = struct.pack("<BBHI4sH", 14, 0x20, 2132, len(body), b".FIT", 0)
+    return header + bytes(body) + b"\x00\x00"
+
+def _iso(t: float) -> str:
+    return datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _encode_tcx(arrays) -> bytes:
+    trackpoints = "".join(
+        f"<Trackpoint><Time>{_iso(t)}</Time><Position><LatitudeDegrees>{lat:.7f}</LatitudeDegrees>"
+        f"<LongitudeDegrees>{lon:.7f}</LongitudeDegrees></Position><AltitudeMeters>{ele:.1f}</AltitudeMeters>"
+        f"<HeartRateBpm><Value>120</Value></HeartRateBpm></Trackpoint>"
+        for lat, lon, ele, t in zip(arrays["lat"].tolist(), arrays["lon"].tolist(), arrays["ele"].tolist(), arrays["time"].tolist()))
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">'
+            f'<Activities><Activity Sport="Biking"><Id>{_iso(START_TS)}</Id><Lap StartTime="{_iso(START_TS)}">'
+            f'<Track>{trackpoints}</Track></Lap></Activity></Activities></TrainingCenterDatabase>\n').encode("utf-8")
+
+def _encode_geojson(arrays) -> bytes:
+    coordinates = [[round(lon, 7), round(lat, 7), ele] for lat, lon, ele in
+                   zip(arrays["lat"].tolist(), arrays["lon"].tolist(), arrays["ele"].tolist())]
+    times = [_iso(t) for t in arrays["time"].tolist()]
+    return json.dumps({"type": "FeatureCollection", "features": [{
+        "type": "Feature", "properties": {"name": "Benchmark", "coordinateProperties": {"times": times}},
+        "geometry": {"type": "LineString", "coordinates": coordinates}}]}).encode("utf-8")
+
+def _best_of(repeat: int, action):
+    best = float("inf"); result = None
+    for _ in range(repeat):
+        started = time.perf_counter(); result = action(); best = min(best, time.perf_counter() - started)
+    return best, result
+
+def _check(label: str, expected, decoded) -> None:
+    if decoded["lat"].size != expected["lat"].size:
+        print(f"  ! {label}: {decoded['lat'].size} statt {expected['lat'].size} Punkte"); return
+    deviations = {key: float(np.nanmax(np.abs(decoded[key] - expected[key]))) for key in ("lat", "lon", "ele", "time")}
+    if deviations["lat"] > 1e-6 or deviations["lon"] > 1e-6 or deviations["ele"] > 0.21 or deviations["time"] > 0.5:
+        print(f"  ! {label}: Abweichung {deviations}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark der Track-Formate")
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import export
+    import gpx_utils
+    import track_formats
+
+    arrays = _synthetic_track(args.points)
+    payloads = {
+        "gpx": export.gpx_bytes_from_point_arrays("Benchmark", arrays),
+        "fit": _encode_fit(arrays),
+        "tcx": _encode_tcx(arrays),
+        "geojson": _encode_geojson(arrays),
+    }
+
+    def decode(fmt: str, data: bytes):
+        if fmt == "gpx":
+            return gpx_utils.extract_point_arrays(gpx_utils._gpxpy().parse(data.decode("utf-8")))
+        return track_formats.decode_track(fmt, data)[1]
+
+    print(f"{args.points} Punkte, bestes von {args.repeat} Durchläufen")
+    print(f"  {'Format':<9}{'Größe':>10}{'Dekodieren':>13}{'Punkte/s':>13}{'MB/s':>9}{'Upload-Parse':>15}")
+    for fmt, data in payloads.items():
+        detected = track_formats.detect_format(data[:track_formats.SNIFF_BYTES])
+        if detected != fmt:
+            print(f"  ! {fmt}: als {detected} erkannt")
+        decode_s, decoded = _best_of(args.repeat, lambda: decode(fmt, data))
+        _check(fmt, arrays, decoded)
+        parse_s, parsed = _best_of(args.repeat, lambda: gpx_utils.parse_gpx_data_from_content(f"bench.{fmt}", data))
+        size_mb = len(data) / 1e6
+        print(f"  {fmt:<9}{size_mb:>8.2f}MB{decode_s * 1000:>11.1f}ms{args.points / decode_s:>13,.0f}"
+              f"{size_mb / decode_s:>9.1f}{parse_s * 1000:>13.1f}ms  ({parsed['distance_km']} km, +{parsed['total_ascent']} m)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
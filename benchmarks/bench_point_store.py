@@ -0,0 +1,77 @@
+"""
+Benchmark des spaltenorientierten Punktspeichers (point_store.py) gegenüber Punktlisten [[lat, lon], ...].
+
+Aufruf:
+    python benchmarks/bench_point_store.py [--tracks 5000] [--points 1000]
+
+Schreibt einen synthetischen Account in ein temporäres Verzeichnis, öffnet ihn kalt, liest alle Punkte und
+alle Tracks einzeln als Views, ersetzt/löscht Tracks (inkl. Umschreiben) und prüft dabei die Inhalte.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import point_store
+
+USER_ID = 1
+
+def _track(track_id: int, points: int):
+    rng = np.random.default_rng(track_id)
+    return {"lat": 47.0 + np.cumsum(rng.normal(0, 1e-4, points)), "lon": 11.0 + np.cumsum(rng.normal(0, 1e-4, points)),
+            "ele": 600 + np.cumsum(rng.normal(0, 0.5, points)), "time": 1.7e9 + np.arange(points, dtype=np.float64)}
+
+def _timed(label: str, func):
+    t = time.perf_counter(); result = func()
+    print(f"{label:<52}{(time.perf_counter() - t) * 1000:9.1f} ms")
+    return result
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Punktspeicher-Benchmark")
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args(argv)
+    point_store.POINT_STORE_DIR = Path(tempfile.mkdtemp(prefix="bench_points_"))
+    try:
+        track_ids = list(range(1, args.tracks + 1))
+        def write_all():
+            for start in range(0, args.tracks, args.batch):
+                point_store.write_tracks(USER_ID, {i: _track(i, args.points) for i in track_ids[start:start + args.batch]})
+        _timed(f"{args.tracks} Tracks à {args.points} Punkte schreiben", write_all)
+
+        tracemalloc.start()
+        snapshot = _timed("Speicher öffnen (Index + memmap)", lambda: point_store.open_store(USER_ID))
+        total = _timed(f"Summe über alle {snapshot.point_count} Breitengrade", lambda: float(np.sum(snapshot.all_points()["lat"])))
+        views = _timed("Alle Tracks einzeln als Views", lambda: [snapshot.track_arrays(i) for i in track_ids])
+        _, peak = tracemalloc.get_traced_memory(); tracemalloc.stop()
+        print(f"{'Python-Heap-Spitze dabei':<52}{peak / 1e6:9.1f} MB")
+
+        tracemalloc.start()
+        sample = [[float(a), float(b)] for a, b in zip(views[0]["lat"], views[0]["lon"])]
+        list_bytes, _ = tracemalloc.get_traced_memory(); tracemalloc.stop()
+        print(f"{'Zum Vergleich: Punktliste hochgerechnet':<52}{list_bytes / len(sample) * snapshot.point_count / 1e6:9.1f} MB")
+
+        assert np.isfinite(total) and all(v is not None and v["lat"].size == args.points for v in views)
+        assert np.array_equal(views[41]["ele"], _track(42, args.points)["ele"].astype(np.float32))
+
+        replaced = {i: _track(i + 10**6, args.points // 2) for i in track_ids[: args.tracks // 2 + 1]}
+        _timed(f"{len(replaced)} Tracks ersetzen (löst Umschreiben aus)", lambda: point_store.write_tracks(USER_ID, replaced))
+        _timed(f"{args.tracks // 4} Tracks löschen", lambda: point_store.remove_tracks(USER_ID, track_ids[-(args.tracks // 4):]))
+        snapshot = point_store.open_store(USER_ID)
+        assert np.array_equal(snapshot.track_arrays(1)["lat"], replaced[1]["lat"])
+        assert snapshot.track_arrays(track_ids[-1]) is None
+        assert np.array_equal(snapshot.track_arrays(track_ids[-(args.tracks // 4) - 1])["lon"], _track(track_ids[-(args.tracks // 4) - 1], args.points)["lon"])
+        print(f"Stand danach: {len(snapshot.track_ids)} Tracks, {snapshot.point_count} Punkte, Generation {snapshot.index.generation}; Inhalte geprüft.")
+    finally:
+        shutil.rmtree(point_store.POINT_STORE_DIR, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
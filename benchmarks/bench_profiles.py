@@ -0,0 +1,64 @@
+"""
+Benchmark des Höhenprofil-Vergleichs: Profile berechnen/speichern, 20 gespeicherte Profile laden und auf das
+gemeinsame Punktbudget des Diagramms bringen (Dauer und JSON-Größe der Diagrammdaten).
+
+Aufruf:
+    python benchmarks/bench_profiles.py [--tracks 20] [--points 20000] [--repeat 20]
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import db_config
+import elevation_profiles
+import settings
+
+def _synthetic_track(rng: np.random.Generator, points: int):
+    heading = np.cumsum(rng.normal(0, 0.05, points))
+    lat = 47.0 + np.cumsum(np.cos(heading)) * 9e-5
+    lon = 11.0 + np.cumsum(np.sin(heading)) * 1.3e-4
+    ele = 600 + np.cumsum(rng.normal(0, 0.8, points))
+    ele[rng.random(points) < 0.02] = np.nan  # fehlende Höhen wie in echten Aufzeichnungen
+    return lat, lon, ele
+
+def _median_ms(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        t = time.perf_counter(); func(); timings.append(time.perf_counter() - t)
+    return statistics.median(timings) * 1000
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Höhenprofil-Benchmark")
+    parser.add_argument("--tracks", type=int, default=settings.ELEVATION_CHART_MAX_TRACKS)
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    db_config.PROFILE_DIR = Path(tempfile.mkdtemp(prefix="bench_profiles_"))
+    rng = np.random.default_rng(42)
+    tracks = [_synthetic_track(rng, args.points) for _ in range(args.tracks)]
+    track_ids = list(range(1, args.tracks + 1))
+
+    started = time.perf_counter()
+    for track_id, (lat, lon, ele) in zip(track_ids, tracks):
+        elevation_profiles.save_profile(track_id, elevation_profiles.compute_profile(lat, lon, ele))
+    print(f"{args.tracks} Profile à {args.points} Punkte berechnet und gespeichert: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    load_ms = _median_ms(lambda: [elevation_profiles.load_profile(i) for i in track_ids], args.repeat)
+    profiles = [elevation_profiles.load_profile(i) for i in track_ids]
+    resample_ms = _median_ms(lambda: elevation_profiles.chart_series_data(profiles), args.repeat)
+    series = elevation_profiles.chart_series_data(profiles)
+    payload_kb = len(json.dumps(series)) / 1024
+    print(f"{args.tracks} gespeicherte Profile laden:        {load_ms:7.1f} ms (Median)")
+    print(f"Auf gemeinsames Budget bringen:          {resample_ms:7.1f} ms (Median), "
+          f"{sum(len(s) for s in series)} Punkte, {payload_kb:.0f} KiB JSON")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
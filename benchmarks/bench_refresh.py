@@ -0,0 +1,83 @@
+"""
+Simuliert schnelle Filter-/Auswahlfolgen gegen den RefreshScheduler und zählt die ausgeführten Refreshs.
+
+Aufruf:
+    python benchmarks/bench_refresh.py [--refresh-ms 150] [--delay-ms 250]
+
+Jedes Szenario prüft die erwartete Anzahl gestarteter/abgeschlossener Refreshs (Exit-Code 1 bei Abweichung).
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import refresh_scheduler
+from refresh_scheduler import REFRESH_FULL, REFRESH_MAP
+
+class FakePage:
+    """Steht für Tabelle + Karte: ein Refresh 'liest' den aktuellen Zustand und braucht refresh_s."""
+    def __init__(self, refresh_s: float):
+        self.refresh_s = refresh_s
+        self.state = None
+        self.applied = []  # (Stufe, Zustand) abgeschlossener Refreshs
+
+    async def run_refresh(self, level: int):
+        state = self.state
+        await asyncio.sleep(self.refresh_s)
+        self.applied.append((level, state))
+
+async def _scenario(name: str, refresh_s: float, delay_s: float, events, expected_executed: int, expected_applied):
+    page = FakePage(refresh_s)
+    scheduler = refresh_scheduler.RefreshScheduler(page.run_refresh, delay_s)
+    started = time.perf_counter()
+    for pause_s, level, state in events:
+        if pause_s: await asyncio.sleep(pause_s)
+        page.state = state
+        scheduler.request(level)
+    await scheduler.wait_idle()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    stats = scheduler.stats()
+    ok = stats["executed"] == expected_executed and page.applied == expected_applied
+    print(f"{'OK ' if ok else 'FEHLER'} {name:<42} Anforderungen {stats['requested']:>3}  gestartet {stats['executed']:>2}  "
+          f"abgeschlossen {stats['completed']:>2}  abgebrochen {stats['superseded']:>2}  {elapsed_ms:7.0f} ms")
+    if not ok:
+        print(f"       erwartet {expected_executed} gestartet, angewendet {expected_applied}; erhalten {page.applied}")
+    return ok
+
+async def run(refresh_s: float, delay_s: float) -> bool:
+    gap_s = delay_s / 10
+    results = [
+        # Shift-Auswahl von 30 Zeilen: ein Refresh mit der letzten Auswahl
+        await _scenario("30 Auswahländerungen im Abstand von delay/10", refresh_s, delay_s,
+                        [(gap_s, REFRESH_MAP, list(range(i + 1))) for i in range(30)],
+                        1, [(REFRESH_MAP, list(range(30)))]),
+        # Datumsbereich: Von- und Bis-Datum kurz hintereinander
+        await _scenario("Datumsbereich (2 Filteränderungen)", refresh_s, delay_s,
+                        [(0, REFRESH_FULL, "von"), (gap_s, REFRESH_FULL, "von+bis")],
+                        1, [(REFRESH_FULL, "von+bis")]),
+        # Filter, danach Auswahl während der Wartezeit: eine volle Aktualisierung
+        await _scenario("Filter + Auswahl zusammengefasst", refresh_s, delay_s,
+                        [(0, REFRESH_FULL, "filter"), (gap_s, REFRESH_MAP, "filter+auswahl")],
+                        1, [(REFRESH_FULL, "filter+auswahl")]),
+        # Neue Auswahl, während der volle Refresh läuft: der laufende wird abgebrochen, die Stufe bleibt voll
+        await _scenario("Auswahl während laufendem Filter-Refresh", refresh_s, delay_s,
+                        [(0, REFRESH_FULL, "filter"), (delay_s + refresh_s / 2, REFRESH_MAP, "filter+auswahl")],
+                        2, [(REFRESH_FULL, "filter+auswahl")]),
+        # Änderungen mit ausreichendem Abstand laufen einzeln
+        await _scenario("2 Auswahlen mit Abstand > delay + Refresh", refresh_s, delay_s,
+                        [(0, REFRESH_MAP, "a"), (delay_s + refresh_s * 2, REFRESH_MAP, "b")],
+                        2, [(REFRESH_MAP, "a"), (REFRESH_MAP, "b")]),
+    ]
+    return all(results)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="RefreshScheduler-Szenarien")
+    parser.add_argument("--refresh-ms", type=float, default=150)
+    parser.add_argument("--delay-ms", type=float, default=250)
+    args = parser.parse_args(argv)
+    return 0 if asyncio.run(run(args.refresh_ms / 1000, args.delay_ms / 1000)) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Benchmark der Track-Suche (FTS5) gegen eine temporäre Datenbank mit synthetischen Tracks eines Users.
+
+Aufruf:
+    python benchmarks/bench_search.py [--tracks 100000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+WORDS = ["Schluchten", "Weg", "Runde", "Alpen", "Feierabend", "Wandern", "Radtour", "Gipfel", "Seeufer", "Waldweg",
+         "Morgenlauf", "Brücke", "Höhenweg", "Talblick", "Burg", "Mühle", "Kapelle", "Hütte", "Pass", "Klamm"]
+LABELS = ["wandern", "rad", "laufen", "urlaub", "familie", "training", "winter", "sommer"]
+QUERIES = ["s", "sch", "schlucht", "alpen rund", "höhen", "hohenweg", "2023", "gipfel wandern", "klamm urlaub", "xyz"]
+
+def _generate_rows(user_id: int, count: int):
+    rng = random.Random(42)
+    for i in range(count):
+        name = " ".join(rng.sample(WORDS, 3)) + f" {2015 + i % 10}"
+        labels = json.dumps(sorted(rng.sample(LABELS, rng.randint(0, 3))))
+        yield (user_id, name, f"{name.replace(' ', '_')}_{i}.gpx", f"bench_{i}.gpx", rng.uniform(1, 120), labels)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Such-Benchmark")
+    parser.add_argument("--tracks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    os.environ["GPX_DATABASE_PATH"] = str(Path(tempfile.mkdtemp(prefix="bench_search_")) / "bench.db")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import db_config
+    import migrations
+    migrations.migrate()
+
+    db = db_config.SessionLocal()
+    try:
+        user_id = db_config.UserDB.__table__.insert()
+        db.execute(user_id.values(username="bench_search", hashed_password="x", email="bench@example.com"))
+        db.commit()
+        user_id = db_config.get_user_by_username(db, "bench_search").id
+        started = time.perf_counter()
+        raw = db.connection().connection
+        raw.executemany("INSERT INTO tracks (user_id, name, original_filename, stored_filename, distance_km, labels) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", _generate_rows(user_id, args.tracks))
+        db.commit()
+        print(f"{args.tracks} Tracks inkl. FTS-Index angelegt in {time.perf_counter() - started:.1f}s")
+
+        print(f"{'Suche':<18}{'Treffer':>8}{'Median':>10}{'Max':>10}")
+        for search_text in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                result = db_config.get_filtered_tracks(db, user_id, search_text=search_text)
+                timings.append(time.perf_counter() - t)
+                db.expunge_all()
+            print(f"{search_text!r:<18}{len(result):>8}{statistics.median(timings) * 1000:>8.1f}ms{max(timings) * 1000:>8.1f}ms")
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
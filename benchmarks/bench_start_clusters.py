@@ -0,0 +1,78 @@
+"""
+Benchmark der Übersichtskarte: Startpunkt-Cluster (GROUP BY auf dem Zoom-Raster) für verschiedene Ausschnitte
+gegen eine temporäre Datenbank mit synthetischen Tracks eines Users. Gemessen werden Dauer, Zahl der Cluster
+und JSON-Größe der Antwort - letztere soll mit den Clustern wachsen, nicht mit den Tracks.
+
+Aufruf:
+    python benchmarks/bench_start_clusters.py [--tracks 100000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# (Beschreibung, Zoom, Süd, West, Nord, Ost)
+VIEWPORTS = [
+    ("Welt", 2, -85.0, -180.0, 85.0, 180.0),
+    ("Europa", 5, 35.0, -10.0, 60.0, 30.0),
+    ("Alpen", 8, 45.5, 9.0, 48.0, 14.0),
+    ("Region", 11, 47.2, 11.0, 47.5, 11.6),
+    ("Ort", 15, 47.26, 11.38, 47.28, 11.42),
+]
+
+def _generate_rows(user_id: int, count: int):
+    # Startpunkte gehäuft um einige "Wohnorte", wie bei echten Accounts
+    rng = random.Random(42)
+    homes = [(rng.uniform(44, 55), rng.uniform(0, 20)) for _ in range(20)] + [(47.27, 11.4)]
+    for i in range(count):
+        home_lat, home_lon = rng.choice(homes)
+        yield (user_id, f"Track {i}", f"bench_{i}.gpx", f"bench_{i}.gpx", rng.uniform(1, 120), "[]",
+               home_lat + rng.gauss(0, 0.05), home_lon + rng.gauss(0, 0.08))
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Startpunkt-Cluster-Benchmark")
+    parser.add_argument("--tracks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    os.environ["GPX_DATABASE_PATH"] = str(Path(tempfile.mkdtemp(prefix="bench_clusters_")) / "bench.db")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import db_config
+    import migrations
+    import start_clusters
+    migrations.migrate()
+
+    db = db_config.SessionLocal()
+    try:
+        db.execute(db_config.UserDB.__table__.insert().values(username="bench_clusters", hashed_password="x", email="bench@example.com"))
+        db.commit()
+        user_id = db_config.get_user_by_username(db, "bench_clusters").id
+        started = time.perf_counter()
+        db.connection().connection.executemany(
+            "INSERT INTO tracks (user_id, name, original_filename, stored_filename, distance_km, labels, start_lat, start_lon) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _generate_rows(user_id, args.tracks))
+        db.commit()
+        print(f"{args.tracks} Tracks angelegt in {time.perf_counter() - started:.1f}s")
+
+        print(f"{'Ausschnitt':<12}{'Zoom':>5}{'Cluster':>9}{'Tracks':>9}{'JSON':>9}{'Median':>10}{'Max':>10}")
+        for label, zoom, south, west, north, east in VIEWPORTS:
+            timings = []
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                clusters = start_clusters.get_start_clusters(db, user_id, zoom, south, west, north, east)
+                timings.append(time.perf_counter() - t)
+            payload_kb = len(json.dumps(clusters)) / 1024
+            print(f"{label:<12}{zoom:>5}{len(clusters):>9}{sum(c['count'] for c in clusters):>9}{payload_kb:>7.1f}KiB"
+                  f"{statistics.median(timings) * 1000:>8.1f}ms{max(timings) * 1000:>8.1f}ms")
+        naive_kb = len(json.dumps([[47.0, 11.0]] * args.tracks)) / 1024
+        print(f"Zum Vergleich: alle {args.tracks} Startpunkte einzeln wären ~{naive_kb:.0f} KiB JSON.")
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Misst die Startkosten typischer Einstiegspunkte in frischen Python-Prozessen (Median über mehrere Läufe):
+Import der Module, erste DB-Abfrage und Start der CLI-Werkzeuge. Läuft gegen eine temporäre Datenbank.
+
+Aufruf:
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+SCENARIOS = {
+    "import settings": "import settings",
+    "import db_config": "import db_config",
+    "import gpx_utils": "import gpx_utils",
+    "import job_queue": "import job_queue",
+    "import track_processing": "import track_processing",
+    "import ingest": "import ingest",
+    "db_config + 1. Abfrage": "import db_config; db = db_config.SessionLocal(); db.query(db_config.UserDB).first(); db.close()",
+    "reprocess.py --help": None,
+    "bulk_import.py --help": None,
+}
+
+def _run_once(name: str, code, env) -> float:
+    if code is None:
+        script = name.split()[0]
+        timed = (f"import runpy, sys, time; sys.argv = [{script!r}, '--help']; t = time.perf_counter()\n"
+                 f"try: runpy.run_path({script!r}, run_name='__main__')\nexcept SystemExit: pass\n"
+                 f"print('T', time.perf_counter() - t)")
+    else:
+        timed = f"import time; t = time.perf_counter()\n{code}\nprint('T', time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", timed], cwd=str(REPO_DIR), env=env, capture_output=True, text=True, check=True).stdout
+    return float([line for line in out.splitlines() if line.startswith("T ")][-1].split()[1])
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Startzeit-Benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+    temp_dir = Path(tempfile.mkdtemp(prefix="bench_startup_"))
+    env = dict(os.environ, GPX_DATABASE_PATH=str(temp_dir / "bench.db"), PYTHONDONTWRITEBYTECODE="0")
+    # Datenbank einmal anlegen, damit die Läufe nur den Start und nicht die Erstmigration messen
+    subprocess.run([sys.executable, "-c", "import migrations; migrations.migrate()"], cwd=str(REPO_DIR), env=env, capture_output=True, check=True)
+    print(f"{'Szenario':<28}{'Median':>10}{'Min':>10}")
+    for name, code in SCENARIOS.items():
+        timings = [_run_once(name, code, env) for _ in range(max(1, args.runs))]
+        print(f"{name:<28}{statistics.median(timings) * 1000:>8.1f}ms{min(timings) * 1000:>8.1f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
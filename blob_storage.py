@@ -0,0 +1,492 @@
+# projekt_gpx_viewer/blob_storage.py
+"""
+Ablage der GPX-Originaldateien. Schlüssel ist TrackDB.stored_filename; Pfade baut nur noch dieses Modul.
+
+Backends (settings.BLOB_BACKEND):
+  - "local": GPX_UPLOAD_DIR mit Hash-Unterverzeichnissen <sha1[0:2]>/<sha1[2:4]>/<schlüssel>. Kein Verzeichnis
+    wächst so über einige hundert Einträge, auch bei Millionen Dateien. Dateien aus dem alten, flachen Layout
+    werden weiter gefunden, bis sie migriert sind.
+  - "s3": S3-kompatibler Objektspeicher (AWS, MinIO, ...) über httpx mit Signatur V4 und Pfad-Adressierung.
+    Noch nicht hochgeladene Dateien aus GPX_UPLOAD_DIR werden weiter gelesen.
+
+Die synchronen Methoden sind für Threads und Prozess-Pools (Jobs, reprocess.py, Export), die a*-Varianten
+für den Event-Loop und Massenoperationen (Migration, Benchmark). local_file() liefert immer einen lokalen
+Pfad - bei S3 eine Temp-Datei in GPX_INCOMING_DIR, die nach dem with-Block gelöscht wird.
+
+Migration aus dem flachen Layout (idempotent, kann bei laufendem Betrieb erfolgen):
+    python blob_storage.py migrate [--dry-run] [--concurrency 16] [--keep-source]
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, ContextManager, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import db_config
+import settings
+
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2  # Hex-Zeichen pro Ebene -> 256 Verzeichnisse je Ebene
+SCAN_STAT_CHUNK_SIZE = 1000
+TRANSFER_CHUNK_SIZE_BYTES = 1024 * 1024
+S3_NAMESPACE = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+
+class BlobStorageError(OSError):
+    """Fehler des Speicher-Backends (z.B. HTTP-Fehler von S3); OSError, damit bestehende Dateifehler-Behandlung greift."""
+
+class BlobStore(ABC):
+    """Gemeinsame Schnittstelle; die a*-Methoden laufen standardmäßig über asyncio.to_thread."""
+    name = "base"
+
+    @abstractmethod
+    def put_file(self, key: str, source_path: Path):
+        """Übernimmt eine fertig geschriebene Datei (die Quelle ist danach weg); sie sollte in GPX_INCOMING_DIR liegen."""
+
+    def put_bytes(self, key: str, data: bytes):
+        fd, temp_name = tempfile.mkstemp(suffix=".part", dir=db_config.GPX_INCOMING_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data); f.flush(); os.fsync(f.fileno())
+            self.put_file(key, Path(temp_name))
+        finally:
+            Path(temp_name).unlink(missing_ok=True)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        with self.local_file(key) as path:
+            return path.read_bytes() if path is not None else None
+
+    @abstractmethod
+    def local_file(self, key: str) -> ContextManager[Optional[Path]]:
+        """Kontextmanager: lokaler Pfad für die Dauer des with-Blocks, None wenn der Schlüssel fehlt."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """True, wenn der Schlüssel vorhanden ist."""
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """True, wenn etwas gelöscht wurde; fehlende Schlüssel sind kein Fehler."""
+
+    @abstractmethod
+    def list_keys(self, workers: int = settings.FILE_SCAN_WORKERS) -> Dict[str, float]:
+        """Alle Schlüssel mit Änderungszeit (Unix-Sekunden)."""
+
+    async def aput_file(self, key: str, source_path: Path):
+        await asyncio.to_thread(self.put_file, key, source_path)
+
+    async def aput_bytes(self, key: str, data: bytes):
+        await asyncio.to_thread(self.put_bytes, key, data)
+
+    async def aget_bytes(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.get_bytes, key)
+
+    async def aexists(self, key: str) -> bool:
+        return await asyncio.to_thread(self.exists, key)
+
+    async def adelete(self, key: str) -> bool:
+        return await asyncio.to_thread(self.delete, key)
+
+    async def aclose(self):
+        pass
+
+# --- Lokales Dateisystem ---------------------------------------------------------------------------------------
+
+def shard_relpath(key: str) -> str:
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return "/".join([digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)] + [key])
+
+def _check_key(key: str) -> str:
+    if not key or "/" in key or "\\" in key or key.startswith("."):
+        raise ValueError(f"Ungültiger Speicherschlüssel: {key!r}")
+    return key
+
+def _stat_mtimes(paths: List[Path]) -> Dict[str, float]:
+    mtimes = {}
+    for path in paths:
+        try: mtimes[path.name] = path.stat().st_mtime
+        except FileNotFoundError: pass  # inzwischen gelöscht oder verschoben
+    return mtimes
+
+def _walk_subdir(subdir: Path) -> Dict[str, float]:
+    mtimes = {}
+    for dir_path, dir_names, file_names in os.walk(subdir):
+        dir_names[:] = [d for d in dir_names if not d.startswith(".")]
+        mtimes.update(_stat_mtimes([Path(dir_path) / name for name in file_names if not name.startswith(".")]))
+    return mtimes
+
+class LocalShardedStore(BlobStore):
+    name = "local"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / shard_relpath(_check_key(key))
+
+    def legacy_path_for(self, key: str) -> Path:
+        return self.root / _check_key(key)
+
+    def resolve(self, key: str) -> Optional[Path]:
+        """Vorhandene Datei (Hash-Layout oder noch flach), sonst None."""
+        sharded = self.path_for(key)
+        if sharded.exists(): return sharded
+        legacy = self.legacy_path_for(key)
+        if legacy.exists(): return legacy
+        # zwischen beiden Prüfungen kann die Migration die Datei verschoben haben
+        return sharded if sharded.exists() else None
+
+    def put_file(self, key: str, source_path: Path):
+        target = self.path_for(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source_path, target)
+
+    @contextmanager
+    def local_file(self, key: str) -> Iterator[Optional[Path]]:
+        yield self.resolve(key)
+
+    def exists(self, key: str) -> bool:
+        return self.resolve(key) is not None
+
+    def delete(self, key: str) -> bool:
+        removed = False
+        for path in (self.path_for(key), self.legacy_path_for(key)):
+            try:
+                path.unlink(); removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def list_flat_files(self) -> List[Path]:
+        """Dateien im alten, flachen Layout (direkt in root, ohne Punkt-Einträge wie GPX_INCOMING_DIR)."""
+        with os.scandir(self.root) as entries:
+            return [Path(entry.path) for entry in entries
+                    if not entry.name.startswith(".") and entry.is_file(follow_symlinks=False)]
+
+    def list_keys(self, workers: int = settings.FILE_SCAN_WORKERS) -> Dict[str, float]:
+        """Parallel: flache Dateien in Blöcken, jedes Hash-Verzeichnis der obersten Ebene als eigene Aufgabe."""
+        top_files: List[Path] = []; subdirs: List[Path] = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.name.startswith("."): continue
+                if entry.is_dir(follow_symlinks=False): subdirs.append(Path(entry.path))
+                elif entry.is_file(follow_symlinks=False): top_files.append(Path(entry.path))
+        mtimes: Dict[str, float] = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="file-scan") as executor:
+            chunks = [top_files[i:i + SCAN_STAT_CHUNK_SIZE] for i in range(0, len(top_files), SCAN_STAT_CHUNK_SIZE)]
+            futures = [executor.submit(_stat_mtimes, chunk) for chunk in chunks] + [executor.submit(_walk_subdir, d) for d in subdirs]
+            for future in futures: mtimes.update(future.result())
+        return mtimes
+
+# --- S3-kompatibler Objektspeicher -----------------------------------------------------------------------------
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(TRANSFER_CHUNK_SIZE_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _hmac_sha256(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+def sign_v4(method: str, host: str, path: str, query: List[Tuple[str, str]], headers: Dict[str, str], payload_sha256: str,
+            access_key: str, secret_key: str, region: str, now: Optional[datetime] = None, service: str = "s3") -> Dict[str, str]:
+    """
+    AWS Signature Version 4 für eine Anfrage; 'path' ist bereits URL-kodiert. Gibt die Header inkl.
+    Host, x-amz-date, x-amz-content-sha256 und Authorization zurück.
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ"); date_stamp = amz_date[:8]
+    signed = {name.lower(): " ".join(str(value).split()) for name, value in headers.items()}
+    signed.update({"host": host, "x-amz-date": amz_date, "x-amz-content-sha256": payload_sha256})
+    signed_names = ";".join(sorted(signed))
+    canonical_query = "&".join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(query))
+    canonical_request = "\n".join([method, path, canonical_query,
+                                   "".join(f"{name}:{signed[name]}\n" for name in sorted(signed)), signed_names, payload_sha256])
+    scope = f"{date_stamp}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()])
+    signing_key = _hmac_sha256(_hmac_sha256(_hmac_sha256(_hmac_sha256(f"AWS4{secret_key}".encode("utf-8"), date_stamp), region), service), "aws4_request")
+    signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    signed["authorization"] = f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={signed_names}, Signature={signature}"
+    return signed
+
+def _parse_s3_time(value: str) -> float:
+    return datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+
+class S3Store(BlobStore):
+    """
+    Objekte unter <bucket>/<prefix><schlüssel>. 'legacy' ist der lokale Bestand, der noch nicht hochgeladen wurde:
+    Lesen fällt darauf zurück, Löschen entfernt beide Kopien.
+    """
+    name = "s3"
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str, region: str = "us-east-1",
+                 prefix: str = "", timeout_s: float = 30.0, max_connections: int = 32, legacy: Optional[LocalShardedStore] = None):
+        import httpx
+        self._httpx = httpx
+        self.endpoint = endpoint.rstrip("/"); self.bucket = bucket; self.prefix = prefix
+        self.access_key = access_key; self.secret_key = secret_key; self.region = region
+        self.timeout_s = timeout_s; self.max_connections = max_connections; self.legacy = legacy
+        parsed = httpx.URL(self.endpoint)
+        self.host = parsed.netloc.decode("ascii")
+        # threadsicher, Verbindungen werden wiederverwendet
+        self._client = httpx.Client(timeout=httpx.Timeout(timeout_s, pool=None), limits=httpx.Limits(max_connections=max_connections))
+        self._async_client = None; self._async_loop = None
+
+    def _object_path(self, key: str) -> str:
+        return "/" + quote(f"{self.bucket}/{self.prefix}{_check_key(key)}", safe="/-_.~")
+
+    def _request_args(self, method: str, path: str, query: Optional[List[Tuple[str, str]]] = None,
+                      headers: Optional[Dict[str, str]] = None, payload_sha256: Optional[str] = None) -> Tuple[str, Dict[str, str]]:
+        query = query or []
+        signed = sign_v4(method, self.host, path, query, headers or {}, payload_sha256 or hashlib.sha256(b"").hexdigest(),
+                         self.access_key, self.secret_key, self.region)
+        url = self.endpoint + path
+        if query:
+            url += "?" + "&".join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in query)
+        return url, signed
+
+    def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            # Massenoperationen (gather über tausende Schlüssel) warten auf eine freie Verbindung statt abzubrechen
+            self._async_client = self._httpx.AsyncClient(timeout=self._httpx.Timeout(self.timeout_s, pool=None),
+                                                         limits=self._httpx.Limits(max_connections=self.max_connections))
+            self._async_loop = loop
+        return self._async_client
+
+    @staticmethod
+    def _raise_for_status(response, action: str, key: str):
+        if response.status_code >= 300:
+            raise BlobStorageError(f"S3 {action} {key}: HTTP {response.status_code} {response.text[:200]}")
+
+    def _put_headers(self, source_path: Path) -> Tuple[Dict[str, str], str]:
+        return {"content-length": str(source_path.stat().st_size), "content-type": "application/gpx+xml"}, _sha256_file(source_path)
+
+    def put_file(self, key: str, source_path: Path):
+        headers, payload_sha256 = self._put_headers(source_path)
+        url, signed = self._request_args("PUT", self._object_path(key), headers=headers, payload_sha256=payload_sha256)
+        with open(source_path, "rb") as f:
+            response = self._client.put(url, headers=signed, content=iter(lambda: f.read(TRANSFER_CHUNK_SIZE_BYTES), b""))
+        self._raise_for_status(response, "PUT", key)
+        source_path.unlink(missing_ok=True)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        if self.legacy is not None and (legacy_path := self.legacy.resolve(key)) is not None:
+            return legacy_path.read_bytes()
+        url, signed = self._request_args("GET", self._object_path(key))
+        response = self._client.get(url, headers=signed)
+        if response.status_code == 404: return None
+        self._raise_for_status(response, "GET", key)
+        return response.content
+
+    @contextmanager
+    def local_file(self, key: str) -> Iterator[Optional[Path]]:
+        if self.legacy is not None and (legacy_path := self.legacy.resolve(key)) is not None:
+            yield legacy_path
+            return
+        url, signed = self._request_args("GET", self._object_path(key))
+        fd, temp_name = tempfile.mkstemp(suffix=".download", dir=db_config.GPX_INCOMING_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f, self._client.stream("GET", url, headers=signed) as response:
+                if response.status_code == 404:
+                    found = False
+                else:
+                    if response.status_code >= 300:
+                        response.read(); self._raise_for_status(response, "GET", key)
+                    for block in response.iter_bytes(TRANSFER_CHUNK_SIZE_BYTES): f.write(block)
+                    found = True
+            yield Path(temp_name) if found else None
+        finally:
+            Path(temp_name).unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        if self.legacy is not None and self.legacy.exists(key): return True
+        url, signed = self._request_args("HEAD", self._object_path(key))
+        response = self._client.head(url, headers=signed)
+        if response.status_code == 404: return False
+        self._raise_for_status(response, "HEAD", key)
+        return True
+
+    def delete(self, key: str) -> bool:
+        removed = self.legacy.delete(key) if self.legacy is not None else False
+        url, signed = self._request_args("DELETE", self._object_path(key))
+        response = self._client.delete(url, headers=signed)
+        self._raise_for_status(response, "DELETE", key)  # S3 meldet 204 auch für fehlende Objekte
+        return True if response.status_code == 204 else removed
+
+    def list_keys(self, workers: int = settings.FILE_SCAN_WORKERS) -> Dict[str, float]:
+        """ListObjectsV2 seitenweise (je bis zu 1000 Schlüssel) plus noch nicht hochgeladener lokaler Bestand."""
+        mtimes = self.legacy.list_keys(workers) if self.legacy is not None else {}
+        token: Optional[str] = None
+        while True:
+            query = [("list-type", "2"), ("prefix", self.prefix)] + ([("continuation-token", token)] if token else [])
+            url, signed = self._request_args("GET", "/" + quote(self.bucket, safe="-_.~"), query=query)
+            response = self._client.get(url, headers=signed)
+            self._raise_for_status(response, "LIST", self.prefix or "/")
+            root = ET.fromstring(response.content)
+            for item in root.iter(f"{S3_NAMESPACE}Contents"):
+                key = item.findtext(f"{S3_NAMESPACE}Key", "")[len(self.prefix):]
+                if key and "/" not in key:
+                    mtimes[key] = _parse_s3_time(item.findtext(f"{S3_NAMESPACE}LastModified", "1970-01-01T00:00:00"))
+            if root.findtext(f"{S3_NAMESPACE}IsTruncated") != "true": break
+            token = root.findtext(f"{S3_NAMESPACE}NextContinuationToken")
+        return mtimes
+
+    async def aput_file(self, key: str, source_path: Path):
+        headers, payload_sha256 = await asyncio.to_thread(self._put_headers, source_path)
+        url, signed = self._request_args("PUT", self._object_path(key), headers=headers, payload_sha256=payload_sha256)
+        async def body() -> AsyncIterator[bytes]:
+            with open(source_path, "rb") as f:
+                while block := await asyncio.to_thread(f.read, TRANSFER_CHUNK_SIZE_BYTES):
+                    yield block
+        response = await self._get_async_client().put(url, headers=signed, content=body())
+        self._raise_for_status(response, "PUT", key)
+        source_path.unlink(missing_ok=True)
+
+    async def aput_bytes(self, key: str, data: bytes):
+        url, signed = self._request_args("PUT", self._object_path(key), headers={"content-type": "application/gpx+xml"},
+                                         payload_sha256=hashlib.sha256(data).hexdigest())
+        response = await self._get_async_client().put(url, headers=signed, content=data)
+        self._raise_for_status(response, "PUT", key)
+
+    async def aget_bytes(self, key: str) -> Optional[bytes]:
+        if self.legacy is not None and await asyncio.to_thread(self.legacy.exists, key):
+            return await asyncio.to_thread(self.legacy.get_bytes, key)
+        url, signed = self._request_args("GET", self._object_path(key))
+        response = await self._get_async_client().get(url, headers=signed)
+        if response.status_code == 404: return None
+        self._raise_for_status(response, "GET", key)
+        return response.content
+
+    async def aexists(self, key: str) -> bool:
+        if self.legacy is not None and await asyncio.to_thread(self.legacy.exists, key): return True
+        url, signed = self._request_args("HEAD", self._object_path(key))
+        response = await self._get_async_client().head(url, headers=signed)
+        if response.status_code == 404: return False
+        self._raise_for_status(response, "HEAD", key)
+        return True
+
+    async def adelete(self, key: str) -> bool:
+        removed = await asyncio.to_thread(self.legacy.delete, key) if self.legacy is not None else False
+        url, signed = self._request_args("DELETE", self._object_path(key))
+        response = await self._get_async_client().delete(url, headers=signed)
+        self._raise_for_status(response, "DELETE", key)
+        return True if response.status_code == 204 else removed
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None; self._async_loop = None
+
+# --- Zugriff --------------------------------------------------------------------------------------------------
+
+_store: Optional[BlobStore] = None
+_store_pid: Optional[int] = None
+_store_lock = threading.Lock()
+
+def create_store(backend: Optional[str] = None) -> BlobStore:
+    backend = (backend or settings.BLOB_BACKEND).strip().lower()
+    local = LocalShardedStore(db_config.GPX_UPLOAD_DIR)
+    if backend == "local":
+        return local
+    if backend == "s3":
+        if not settings.S3_ENDPOINT:
+            raise ValueError("GPX_BLOB_BACKEND=s3 benötigt GPX_S3_ENDPOINT.")
+        return S3Store(settings.S3_ENDPOINT, settings.S3_BUCKET, settings.S3_ACCESS_KEY, settings.S3_SECRET_KEY,
+                       region=settings.S3_REGION, prefix=settings.S3_PREFIX, timeout_s=settings.S3_TIMEOUT_S,
+                       max_connections=settings.S3_MAX_CONNECTIONS, legacy=local)
+    raise ValueError(f"Unbekanntes Speicher-Backend: {backend!r} (erlaubt: local, s3)")
+
+def get_store() -> BlobStore:
+    """Prozessweite Instanz; nach fork (Prozess-Pools) wird sie neu angelegt, HTTP-Verbindungen werden nicht geteilt."""
+    global _store, _store_pid
+    if _store is None or _store_pid != os.getpid():
+        with _store_lock:
+            if _store is None or _store_pid != os.getpid():
+                _store = create_store(); _store_pid = os.getpid()
+    return _store
+
+# --- Migration aus dem flachen Layout -------------------------------------------------------------------------
+
+async def migrate_flat_layout(target: BlobStore, dry_run: bool = False, concurrency: int = settings.BLOB_MIGRATE_CONCURRENCY,
+                              keep_source: bool = False, source: Optional[LocalShardedStore] = None) -> Tuple[int, int]:
+    """
+    Verschiebt alle Dateien direkt in GPX_UPLOAD_DIR (bzw. source.root) in das Ziel-Backend (lokal: per Rename
+    ins Hash-Layout, S3: Upload, danach wird die lokale Datei gelöscht). Rückgabe: (übernommen, fehlgeschlagen).
+    """
+    source = source or LocalShardedStore(db_config.GPX_UPLOAD_DIR)
+    flat_files = await asyncio.to_thread(source.list_flat_files)
+    print(f"Migration nach '{target.name}': {len(flat_files)} Dateien im flachen Layout.")
+    if dry_run or not flat_files:
+        return len(flat_files) if dry_run else 0, 0
+    pending = iter(flat_files)  # feste Zahl Worker statt einer Aufgabe pro Datei (Hunderttausende)
+    progress_every = max(1000, len(flat_files) // 10)
+    moved = 0; failed = 0; started = time.monotonic()
+
+    async def migrate_one(path: Path):
+        if isinstance(target, LocalShardedStore) or not keep_source:
+            await target.aput_file(path.name, path)
+            return
+        # Kopie hochladen, Original bleibt; gelesen wird dann trotzdem zuerst lokal
+        fd, temp_name = tempfile.mkstemp(suffix=".part", dir=db_config.GPX_INCOMING_DIR)
+        os.close(fd)
+        try:
+            await asyncio.to_thread(shutil.copyfile, path, temp_name)
+            await target.aput_file(path.name, Path(temp_name))
+        finally:
+            Path(temp_name).unlink(missing_ok=True)
+
+    async def worker():
+        nonlocal moved, failed
+        for path in pending:
+            try:
+                await migrate_one(path)
+                moved += 1
+                if moved % progress_every == 0:
+                    print(f"  {moved}/{len(flat_files)} übernommen ({moved / (time.monotonic() - started):.0f} Dateien/s)")
+            except Exception as e:
+                failed += 1
+                print(f"Migration: Fehler bei {path.name}: {e}")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        await target.aclose()
+    print(f"Migration fertig: {moved} übernommen, {failed} Fehler in {time.monotonic() - started:.1f}s.")
+    return moved, failed
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ablage der GPX-Dateien verwalten.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Dateien aus dem flachen Layout in das konfigurierte Backend übernehmen")
+    migrate_parser.add_argument("--backend", choices=["local", "s3"], default=None, help="Ziel (Standard: GPX_BLOB_BACKEND)")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="Nur zählen, nichts verschieben")
+    migrate_parser.add_argument("--concurrency", type=int, default=settings.BLOB_MIGRATE_CONCURRENCY, help="Parallele Übertragungen")
+    migrate_parser.add_argument("--keep-source", action="store_true", help="Bei S3 die lokalen Dateien behalten")
+    args = parser.parse_args(argv)
+    db_config.ensure_storage_dirs()
+    try:
+        target = create_store(args.backend)
+        _, failed = asyncio.run(migrate_flat_layout(target, args.dry_run, args.concurrency, args.keep_source))
+    except Exception as e:
+        print(f"Migration abgebrochen: {e}")
+        traceback.print_exc()
+        return 1
+    return 0 if failed == 0 else 2
+
+if __name__ == "__main__":
+    raise SystemExit(main())
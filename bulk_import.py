@@ -0,0 +1,174 @@
+"""
+Offline-Massenimport von GPX-Dateien für einen Benutzer.
+
+Aufruf:
+    python bulk_import.py <verzeichnis-oder-zip> --user <benutzername> [--workers N] [--chunk-size N]
+
+Die Dateien werden in einem Prozess-Pool geparst und in Blöcken (eine Transaktion pro Block)
+über db_config.add_tracks_bulk gespeichert. Bereits importierte Dateien werden am SHA-256 des
+Inhalts erkannt und übersprungen - ein abgebrochener Import kann daher einfach neu gestartet werden.
+"""
+import argparse
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import db_config
+import gpx_utils
+import migrations
+import track_formats
+import track_processing
+
+# (Anzeigename, Dateipfad, ZIP-Member oder None)
+ImportSource = Tuple[str, str, Optional[str]]
+
+_known_hashes: Set[str] = set()
+# pro Prozess einmal geöffnete ZIP-Archive: das Inhaltsverzeichnis wird nur einmal gelesen, nicht pro Member
+_archives: Dict[str, zipfile.ZipFile] = {}
+
+def _init_worker(known_hashes: Set[str]):
+    global _known_hashes
+    _known_hashes = known_hashes
+    _archives.clear()  # geerbte Handles des Elternprozesses (gemeinsame Dateiposition) nicht verwenden
+
+def _archive(path: str) -> zipfile.ZipFile:
+    archive = _archives.get(path)
+    if archive is None:
+        archive = _archives[path] = zipfile.ZipFile(path)
+    return archive
+
+def _close_archives():
+    for archive in _archives.values():
+        archive.close()
+    _archives.clear()
+
+def _read_source_bytes(source: ImportSource) -> bytes:
+    _, path, member = source
+    if member is None:
+        with open(path, "rb") as f:
+            return f.read()
+    return _archive(path).read(member)
+
+def _parse_source(source: ImportSource) -> Tuple[ImportSource, str, int, Optional[Dict[str, Any]], str]:
+    """Läuft im Worker-Prozess. Rückgabe: (source, status, bytes, parsed_data, content_sha256); status = ok|skipped|failed."""
+    try:
+        content_bytes = _read_source_bytes(source)
+    except Exception as e:
+        print(f"Fehler beim Lesen von {source[0]}: {e}")
+        return source, "failed", 0, None, ""
+    content_sha256 = db_config.compute_content_hash(content_bytes)
+    if content_sha256 in _known_hashes:
+        return source, "skipped", len(content_bytes), None, content_sha256
+    parsed_data = gpx_utils.parse_gpx_data_from_content(os.path.basename(source[0]), content_bytes)
+    if not parsed_data:
+        return source, "failed", len(content_bytes), None, content_sha256
+    parsed_data.pop("points", None)  # Punkte werden für den DB-Eintrag nicht gebraucht und nur teuer zurückgepickelt
+    return source, "ok", len(content_bytes), parsed_data, content_sha256
+
+def iter_import_sources(path: Path) -> Iterator[ImportSource]:
+    """Listet alle Track-Dateien (.gpx, .fit, .tcx, .geojson, .json) eines Verzeichnisses (rekursiv) oder eines ZIP-Archivs in stabiler Reihenfolge."""
+    if path.is_dir():
+        for file_path in sorted(path.rglob("*")):
+            if file_path.is_file() and track_formats.is_supported_filename(file_path.name):
+                yield str(file_path.relative_to(path)), str(file_path), None
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in sorted(zf.infolist(), key=lambda i: i.filename):
+                if not info.is_dir() and track_formats.is_supported_filename(info.filename):
+                    yield info.filename, str(path), info.filename
+    else:
+        raise ValueError(f"{path} ist weder ein Verzeichnis noch ein ZIP-Archiv.")
+
+def _opener(source: ImportSource):
+    _, path, member = source
+    if member is None:
+        return lambda: open(path, "rb")
+    return lambda: _archive(path).open(member)
+
+class _ImportStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imported = 0; self.skipped = 0; self.failed = 0; self.bytes_read = 0
+
+    def line(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        processed = self.imported + self.skipped + self.failed
+        return (f"{processed} Dateien in {elapsed:.1f}s ({processed / elapsed:.1f} Dateien/s, "
+                f"{self.bytes_read / elapsed / 1024 / 1024:.2f} MB/s) - importiert: {self.imported}, "
+                f"übersprungen: {self.skipped}, fehlerhaft: {self.failed}")
+
+def run_import(path: Path, username: str, workers: Optional[int] = None, chunk_size: int = 200) -> int:
+    db = db_config.SessionLocal()
+    try:
+        user = db_config.get_user_by_username(db, username)
+        if not user:
+            print(f"Benutzer '{username}' nicht gefunden.")
+            return 1
+        user_id = user.id
+        known_hashes = db_config.get_existing_content_hashes(db, user_id)
+        sources = list(iter_import_sources(path))
+        print(f"{len(sources)} GPX-Dateien gefunden, {len(known_hashes)} Tracks von '{username}' bereits in der DB.")
+
+        stats = _ImportStats()
+        pending: List[Tuple[Dict[str, Any], str, Any]] = []
+        seen_in_run: Set[str] = set()
+
+        def flush():
+            if not pending: return
+            new_ids = db_config.add_tracks_bulk(db, user_id, pending)
+            if new_ids:
+                stats.imported += len(new_ids)
+                for track_id in new_ids:  # Nachbearbeitung übernimmt die Job-Queue der laufenden App
+                    track_processing.enqueue_track_processing(db, user_id, track_id, commit=False)
+                db.commit()
+            else:
+                stats.failed += len(pending)
+                for _, content_sha256, _ in pending: seen_in_run.discard(content_sha256)
+            pending.clear()
+            print(stats.line())
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(known_hashes,)) as executor:
+            for source, status, size, parsed_data, content_sha256 in executor.map(_parse_source, sources, chunksize=8):
+                stats.bytes_read += size
+                if status == "skipped" or (status == "ok" and content_sha256 in seen_in_run):
+                    stats.skipped += 1
+                    continue
+                if status == "failed":
+                    stats.failed += 1
+                    print(f"Konnte {source[0]} nicht verarbeiten.")
+                    continue
+                seen_in_run.add(content_sha256)
+                track_processing.mark_parse_time_artifacts(parsed_data)
+                pending.append((parsed_data, content_sha256, _opener(source)))
+                if len(pending) >= chunk_size:
+                    flush()
+            flush()
+        print(f"Fertig: {stats.line()}")
+        return 0 if stats.failed == 0 else 2
+    finally:
+        _close_archives()
+        db.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="GPX-Dateien aus einem Verzeichnis oder ZIP-Archiv für einen Benutzer importieren.")
+    parser.add_argument("path", type=Path, help="Verzeichnis (rekursiv) oder ZIP-Datei mit GPX-Dateien")
+    parser.add_argument("--user", required=True, help="Benutzername des Ziel-Accounts")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Parser-Prozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="Tracks pro DB-Transaktion")
+    args = parser.parse_args(argv)
+    if not args.path.exists():
+        print(f"Pfad {args.path} existiert nicht.")
+        return 1
+    migrations.prepare_database()
+    try:
+        return run_import(args.path, args.user, workers=args.workers, chunk_size=max(1, args.chunk_size))
+    except KeyboardInterrupt:
+        print("Import abgebrochen - bereits gespeicherte Blöcke bleiben erhalten, erneuter Aufruf setzt fort.")
+        return 130
+
+if __name__ == "__main__":
+    sys.exit(main())
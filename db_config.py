@@ -1,30 +1,85 @@
 # projekt_gpx_viewer/db_config.py
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, func, event, ForeignKey, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, func, event, ForeignKey, Boolean, LargeBinary, Index, table, column, text, literal_column
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from sqlalchemy.engine import Engine
 from pathlib import Path
 import json
 from datetime import datetime, timedelta # timedelta hinzugefügt
-from typing import List, Optional, Tuple, Any, Dict
+from typing import List, Optional, Tuple, Any, Dict, Callable, BinaryIO, Iterable, Set, NamedTuple
+from collections import OrderedDict
+import threading
+import time
 import traceback
-from passlib.context import CryptContext
+import hashlib
+import shutil
+import tempfile
+import os
+import re
 import secrets # Für sichere Zufallscodes
+import hmac
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+import blob_storage  # nutzt die Pfade unten erst zur Laufzeit, der Rückimport ist unkritisch
 
 BASE_DIR = Path(__file__).resolve().parent
-GPX_UPLOAD_DIR = BASE_DIR / "gpx_uploads"
-GPX_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-DATABASE_URL = f"sqlite:///{BASE_DIR / 'tracks_users_sqlalchemy.db'}"
+GPX_UPLOAD_DIR = BASE_DIR / "gpx_uploads"  # Wurzel des lokalen Backends; Pfade darin baut nur blob_storage.py
+GPX_INCOMING_DIR = GPX_UPLOAD_DIR / ".incoming"  # Temp-Dateien laufender Uploads, gleiches Dateisystem für atomares os.replace
+# Abgeleitete, jederzeit aus der GPX-Datei neu berechenbare Artefakte (siehe track_processing.py)
+DERIVED_DIR = BASE_DIR / "derived"
+PROFILE_DIR = DERIVED_DIR / "profiles"
+THUMBNAIL_DIR = DERIVED_DIR / "thumbnails"
+DATABASE_URL = f"sqlite:///{settings.DATABASE_PATH}"
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt ist bewusst teuer (~0,1-0,6 s CPU) - eigener, begrenzter Pool, damit Logins den Event-Loop nicht blockieren
+_auth_executor = ThreadPoolExecutor(max_workers=max(1, settings.AUTH_THREADS), thread_name_prefix="auth")
+TWO_FA_CODE_HASH_PREFIX = "hmac-sha256$"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Engine, Session-Factory und Passwort-Kontext entstehen erst bei der ersten Nutzung; das Schema legt migrations.py an.
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_pwd_context = None
+_lazy_init_lock = threading.Lock()
 Base = declarative_base()
 
+def get_engine() -> Engine:
+    global _engine, _session_factory
+    if _engine is None:
+        with _lazy_init_lock:
+            if _engine is None:
+                engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+                _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                _engine = engine
+    return _engine
+
+def SessionLocal() -> Session:
+    if _session_factory is None:
+        get_engine()
+    return _session_factory()
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        with _lazy_init_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+                _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+    return _pwd_context
+
+def ensure_storage_dirs():
+    GPX_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    GPX_INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
+    # WAL + busy_timeout: mehrere Worker-Prozesse (serve.py) lesen parallel und warten beim Schreiben statt "database is locked"
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
     cursor.close()
 class UserDB(Base):
     __tablename__ = "users"
@@ -50,18 +105,92 @@ class TrackDB(Base):
     labels = Column(Text, default="[]")
     gpx_parsed_total_ascent = Column(Float, nullable=True)
     gpx_parsed_total_descent = Column(Float, nullable=True)
+    content_sha256 = Column(String(64), index=True, nullable=True)
+    moving_time_s = Column(Float, nullable=True)
+    elapsed_time_s = Column(Float, nullable=True)
+    avg_moving_speed_kmh = Column(Float, nullable=True)
+    max_speed_kmh = Column(Float, nullable=True)
+    smoothed_ascent_m = Column(Float, nullable=True)
+    analytics_json = Column(Text, nullable=True)  # Splits, Steigungsverteilung etc. (track_analytics.analyze_point_arrays)
+    processing_versions = Column(Text, default="{}")  # {"prozessor": version} der zuletzt gelaufenen Nachbearbeitung
+    updated_at = Column(DateTime, nullable=True)  # letzte Änderung, per Trigger gepflegt (migrations.py, Version 3)
+    # Papierkorb: gesetzt = gelöscht, Zeile und Dateien entfernt erst file_gc.py nach Ablauf des Undo-Fensters
+    deleted_at = Column(DateTime, nullable=True, index=True)
+    # erster Punkt, Grundlage der Übersichtskarte (start_clusters.py); per Prozessor 'start_point' nachgetragen
+    start_lat = Column(Float, nullable=True)
+    start_lon = Column(Float, nullable=True)
+    __table_args__ = (Index("ix_tracks_user_start", "user_id", "deleted_at", "start_lat", "start_lon"),)
 
-def create_db_tables():
-    Base.metadata.create_all(bind=engine)
-    print("SQLAlchemy Datenbanktabellen (Users, Tracks) überprüft/erstellt.")
+class JobDB(Base):
+    """Hintergrund-Jobs (siehe job_queue.py). status: pending | running | done | failed"""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, default="{}")
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    track_id = Column(Integer, ForeignKey("tracks.id", ondelete="CASCADE"), nullable=True, index=True)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False, default=func.now())
+    last_error = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+class TrackFingerprintDB(Base):
+    """MinHash-Signatur der vom Track berührten Rasterzellen (siehe fingerprint.py)."""
+    __tablename__ = "track_fingerprints"
+    track_id = Column(Integer, ForeignKey("tracks.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    minhash = Column(LargeBinary, nullable=False)
+    cell_count = Column(Integer, nullable=False, default=0)
+
+class TrackLshBandDB(Base):
+    """LSH-Index: ein Eintrag pro Band und Track, Suche über (user_id, band, bucket)."""
+    __tablename__ = "track_lsh_bands"
+    track_id = Column(Integer, ForeignKey("tracks.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    bucket = Column(Integer, nullable=False)
+    __table_args__ = (Index("ix_track_lsh_bands_lookup", "user_id", "band", "bucket"),)
 
-create_db_tables()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+def verify_password_and_upgrade(db: Session, user: Optional[UserDB], plain_password: str) -> bool:
+    """Prüft das Passwort und ersetzt veraltete Hashes (z.B. nach Erhöhung von GPX_BCRYPT_ROUNDS) direkt durch neue."""
+    if not user:
+        get_pwd_context().dummy_verify()  # gleiche Laufzeit wie bei existierendem User, verrät keine Benutzernamen
+        return False
+    is_valid, new_hash = get_pwd_context().verify_and_update(plain_password, user.hashed_password)
+    if is_valid and new_hash:
+        try:
+            user.hashed_password = new_hash
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Fehler beim Aktualisieren des Passwort-Hashes für User ID {user.id}: {e}")
+    return is_valid
+
+async def run_auth_task(func: Callable, *args) -> Any:
+    """Führt eine bcrypt-lastige Funktion im Auth-Thread-Pool aus."""
+    return await asyncio.get_running_loop().run_in_executor(_auth_executor, func, *args)
+
+def _hash_email_2fa_code(user_id: int, code: str) -> str:
+    # Codes leben nur Minuten und sind an den User gebunden - ein HMAC reicht, bcrypt wäre hier nur Last
+    digest = hmac.new(settings.TWO_FA_SECRET.encode("utf-8"), f"{user_id}:{code}".encode("utf-8"), hashlib.sha256).hexdigest()
+    return TWO_FA_CODE_HASH_PREFIX + digest
+
+def _check_email_2fa_code(user_id: int, code_attempt: str, stored_hash: str) -> bool:
+    if stored_hash.startswith(TWO_FA_CODE_HASH_PREFIX):
+        return hmac.compare_digest(_hash_email_2fa_code(user_id, code_attempt.strip()), stored_hash)
+    return verify_password(code_attempt, stored_hash)  # noch laufende bcrypt-Codes von vor der Umstellung
 
 def generate_email_2fa_code(length: int = 6) -> str:
     return "".join(secrets.choice("0123456789") for _ in range(length))
@@ -77,6 +206,43 @@ def get_user_by_username(db: Session, username: str) -> Optional[UserDB]:
 def get_user_by_id(db: Session, user_id: int) -> Optional[UserDB]:
     return db.query(UserDB).filter(UserDB.id == user_id).first()
 
+class UserRecord(NamedTuple):
+    """Schlanke, unveränderliche Kopie der häufig gelesenen User-Felder (ohne Hashes)."""
+    id: int
+    username: str
+    email: Optional[str]
+    is_2fa_enabled: bool
+
+_user_record_cache: "OrderedDict[int, Tuple[float, UserRecord]]" = OrderedDict()
+_user_record_cache_lock = threading.Lock()
+
+def get_user_record(user_id: int) -> Optional[UserRecord]:
+    """User-Datensatz aus dem LRU/TTL-Cache; bei Fehlschlag eine DB-Abfrage mit eigener Session."""
+    now = time.monotonic()
+    with _user_record_cache_lock:
+        cached = _user_record_cache.get(user_id)
+        if cached and now - cached[0] < settings.USER_CACHE_TTL_S:
+            _user_record_cache.move_to_end(user_id)
+            return cached[1]
+    db = SessionLocal()
+    try:
+        user = get_user_by_id(db, user_id)
+        if not user:
+            return None
+        record = UserRecord(user.id, user.username, user.email, bool(user.is_2fa_enabled))
+    finally:
+        db.close()
+    with _user_record_cache_lock:
+        _user_record_cache[user_id] = (now, record)
+        _user_record_cache.move_to_end(user_id)
+        while len(_user_record_cache) > settings.USER_CACHE_SIZE:
+            _user_record_cache.popitem(last=False)
+    return record
+
+def invalidate_user_record(user_id: int):
+    with _user_record_cache_lock:
+        _user_record_cache.pop(user_id, None)
+
 def create_user(db: Session, username: str, password: str, email: str) -> UserDB: 
     if not email: 
         raise ValueError("Email is required for user creation.")
@@ -87,13 +253,14 @@ def create_user(db: Session, username: str, password: str, email: str) -> UserDB
     db.refresh(db_user)
     return db_user
 
-def set_email_2fa_code_for_user(db: Session, user_id: int, code_lifetime_minutes: int = 10) -> Optional[str]:
+def set_email_2fa_code_for_user(db: Session, user_id: int, code_lifetime_minutes: int = settings.TWO_FA_CODE_LIFETIME_MINUTES) -> Optional[str]:
     user = get_user_by_id(db, user_id)
     if user and user.email: 
         code = generate_email_2fa_code()
-        user.email_2fa_code = get_password_hash(code) 
+        user.email_2fa_code = _hash_email_2fa_code(user.id, code)
         user.email_2fa_code_expires_at = datetime.utcnow() + timedelta(minutes=code_lifetime_minutes)
         db.commit()
+        invalidate_user_record(user_id)
         return code 
     return None
 
@@ -104,14 +271,16 @@ def verify_email_2fa_code(db: Session, user_id: int, code_attempt: str) -> bool:
             user.email_2fa_code = None
             user.email_2fa_code_expires_at = None
             db.commit()
+            invalidate_user_record(user_id)
             return False
         
-        is_valid = verify_password(code_attempt, user.email_2fa_code)
+        is_valid = _check_email_2fa_code(user.id, code_attempt or "", user.email_2fa_code)
         
         if is_valid:
             user.email_2fa_code = None
             user.email_2fa_code_expires_at = None
             db.commit()
+            invalidate_user_record(user_id)
             return True
     return False
 
@@ -122,6 +291,7 @@ def enable_email_2fa(db: Session, user_id: int) -> bool:
         user.email_2fa_code = None
         user.email_2fa_code_expires_at = None
         db.commit()
+        invalidate_user_record(user_id)
         return True
     return False
 
@@ -132,9 +302,52 @@ def disable_email_2fa(db: Session, user_id: int) -> bool:
         user.email_2fa_code = None
         user.email_2fa_code_expires_at = None
         db.commit()
+        invalidate_user_record(user_id)
         return True
     return False
 
+def compute_content_hash(content_bytes: bytes) -> str:
+    return hashlib.sha256(content_bytes).hexdigest()
+
+def _make_stored_filename(original_filename: str) -> str:
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    safe_original_filename = "".join(c if c.isalnum() or c in ('.', '_', '-') else '_' for c in original_filename)
+    stored_filename = f"{timestamp}_{safe_original_filename}"
+    suffix = 1
+    store = blob_storage.get_store()
+    while store.exists(stored_filename):
+        stored_filename = f"{timestamp}_{suffix}_{safe_original_filename}"
+        suffix += 1
+    return stored_filename
+
+def apply_analytics_to_track(track: TrackDB, analytics: Optional[Dict[str, Any]]):
+    analytics = analytics or {}
+    track.moving_time_s = analytics.get("moving_time_s")
+    track.elapsed_time_s = analytics.get("elapsed_time_s")
+    track.avg_moving_speed_kmh = analytics.get("avg_moving_speed_kmh")
+    track.max_speed_kmh = analytics.get("max_speed_kmh")
+    track.smoothed_ascent_m = analytics.get("smoothed_ascent_m")
+    track.analytics_json = json.dumps(analytics) if analytics else None
+
+def _track_row_from_parsed(user_id: int, parsed_gpx_data: Dict[str, Any], stored_filename: str, content_sha256: Optional[str]) -> TrackDB:
+    first_point = (parsed_gpx_data.get("points") or [[None, None]])[0]
+    db_track = TrackDB(
+        user_id=user_id,
+        name=parsed_gpx_data.get("track_name", "Unbenannter Track"),
+        original_filename=parsed_gpx_data.get("original_filename", "unknown.gpx"),
+        stored_filename=stored_filename,
+        distance_km=parsed_gpx_data.get("distance_km"),
+        track_date=parsed_gpx_data.get("track_date"),
+        labels=json.dumps(parsed_gpx_data.get("labels_list", [])),
+        gpx_parsed_total_ascent=parsed_gpx_data.get("total_ascent"),
+        gpx_parsed_total_descent=parsed_gpx_data.get("total_descent"),
+        content_sha256=content_sha256,
+        processing_versions=json.dumps(parsed_gpx_data.get("processing_versions", {})),
+        start_lat=first_point[0], start_lon=first_point[1]
+    )
+    apply_analytics_to_track(db_track, parsed_gpx_data.get("analytics"))
+    return db_track
+
 def add_track(
     db: Session,
     user_id: int, 
@@ -142,24 +355,42 @@ def add_track(
     gpx_file_content_bytes: bytes
 ) -> Optional[int]:
     original_filename = parsed_gpx_data.get("original_filename", "unknown.gpx")
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
-    safe_original_filename = "".join(c if c.isalnum() or c in ('.', '_', '-') else '_' for c in original_filename)
-    stored_filename = f"{timestamp}_{safe_original_filename}"
-    filepath_on_server = GPX_UPLOAD_DIR / stored_filename
+    stored_filename = _make_stored_filename(original_filename)
+    store = blob_storage.get_store()
+    try:
+        store.put_bytes(stored_filename, gpx_file_content_bytes)
+        db_track = _track_row_from_parsed(user_id, parsed_gpx_data, stored_filename, compute_content_hash(gpx_file_content_bytes))
+        db.add(db_track)
+        db.commit()
+        db.refresh(db_track)
+        print(f"Track '{db_track.name}' (ID: {db_track.id}) für User ID {user_id} in DB gespeichert. Datei: {stored_filename}")
+        return db_track.id
+    except Exception as e:
+        db.rollback()
+        print(f"Fehler beim Hinzufügen des Tracks zur DB für User ID {user_id}: {e}")
+        traceback.print_exc()
+        try:
+            store.delete(stored_filename)
+        except Exception as e_file:
+            print(f"Fehler beim Aufräumen der Datei {stored_filename}: {e_file}")
+        return None
+
+def add_track_from_file(
+    db: Session,
+    user_id: int,
+    parsed_gpx_data: Dict[str, Any],
+    temp_filepath: Path,
+    content_sha256: Optional[str] = None
+) -> Optional[int]:
+    """
+    Wie add_track, übergibt die bereits auf Platte liegende Datei aber direkt an den Blob-Speicher (lokal per
+    atomarem Rename) statt den Inhalt erneut zu schreiben. Die Temp-Datei muss in GPX_INCOMING_DIR liegen.
+    """
+    stored_filename = _make_stored_filename(parsed_gpx_data.get("original_filename", "unknown.gpx"))
+    store = blob_storage.get_store()
     try:
-        with open(filepath_on_server, "wb") as f:
-            f.write(gpx_file_content_bytes)
-        db_track = TrackDB(
-            user_id=user_id, 
-            name=parsed_gpx_data.get("track_name", "Unbenannter Track"),
-            original_filename=original_filename,
-            stored_filename=stored_filename,
-            distance_km=parsed_gpx_data.get("distance_km"),
-            track_date=parsed_gpx_data.get("track_date"),
-            labels=json.dumps(parsed_gpx_data.get("labels_list", [])),
-            gpx_parsed_total_ascent=parsed_gpx_data.get("total_ascent"),
-            gpx_parsed_total_descent=parsed_gpx_data.get("total_descent")
-        )
+        store.put_file(stored_filename, temp_filepath)
+        db_track = _track_row_from_parsed(user_id, parsed_gpx_data, stored_filename, content_sha256)
         db.add(db_track)
         db.commit()
         db.refresh(db_track)
@@ -169,22 +400,93 @@ def add_track(
         db.rollback()
         print(f"Fehler beim Hinzufügen des Tracks zur DB für User ID {user_id}: {e}")
         traceback.print_exc()
-        if filepath_on_server.exists():
+        try:
+            store.delete(stored_filename)
+        except Exception as e_file:
+            print(f"Fehler beim Aufräumen der Datei {stored_filename}: {e_file}")
+        return None
+
+def add_tracks_bulk(
+    db: Session,
+    user_id: int,
+    items: List[Tuple[Dict[str, Any], str, Callable[[], BinaryIO]]]
+) -> List[int]:
+    """
+    Speichert mehrere Tracks in einer einzigen Transaktion (gleiche Semantik wie add_track).
+    items: Liste aus (parsed_gpx_data, content_sha256, open_source), open_source liefert die Originaldatei als Binär-Stream.
+    Schlägt der Commit fehl, werden alle geschriebenen Dateien wieder entfernt und [] zurückgegeben.
+    """
+    store = blob_storage.get_store()
+    written_keys: List[str] = []
+    db_tracks: List[TrackDB] = []
+    try:
+        for parsed_gpx_data, content_sha256, open_source in items:
+            stored_filename = _make_stored_filename(parsed_gpx_data.get("original_filename", "unknown.gpx"))
+            fd, temp_name = tempfile.mkstemp(suffix=".part", dir=GPX_INCOMING_DIR)
+            try:
+                with open_source() as src, os.fdopen(fd, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                written_keys.append(stored_filename)
+                store.put_file(stored_filename, Path(temp_name))
+            finally:
+                Path(temp_name).unlink(missing_ok=True)
+            db_track = _track_row_from_parsed(user_id, parsed_gpx_data, stored_filename, content_sha256)
+            db.add(db_track)
+            db_tracks.append(db_track)
+        db.commit()
+        return [t.id for t in db_tracks]
+    except Exception as e:
+        db.rollback()
+        print(f"Fehler beim Massen-Import von {len(items)} Tracks für User ID {user_id}: {e}")
+        traceback.print_exc()
+        for stored_filename in written_keys:
             try:
-                filepath_on_server.unlink()
+                store.delete(stored_filename)
             except Exception as e_file:
-                print(f"Fehler beim Aufräumen der Datei {filepath_on_server}: {e_file}")
-        return None
+                print(f"Fehler beim Aufräumen der Datei {stored_filename}: {e_file}")
+        return []
+
+def get_existing_content_hashes(db: Session, user_id: int, hashes: Optional[Iterable[str]] = None) -> Set[str]:
+    """Liefert die bereits importierten Inhalts-Hashes eines Users (optional eingeschränkt auf 'hashes')."""
+    query = db.query(TrackDB.content_sha256).filter(TrackDB.user_id == user_id, TrackDB.content_sha256.isnot(None), TrackDB.deleted_at.is_(None))
+    if hashes is not None:
+        hashes = list(hashes)
+        if not hashes: return set()
+        query = query.filter(TrackDB.content_sha256.in_(hashes))
+    return {h for (h,) in query.all()}
 
 def get_track_details(db: Session, user_id: int, track_id: int) -> Optional[TrackDB]:
-    return db.query(TrackDB).filter(TrackDB.id == track_id, TrackDB.user_id == user_id).first()
+    return db.query(TrackDB).filter(TrackDB.id == track_id, TrackDB.user_id == user_id, TrackDB.deleted_at.is_(None)).first()
+
+def get_tracks_by_ids(db: Session, user_id: int, track_ids: List[int]) -> List[TrackDB]:
+    if not track_ids: return []
+    return db.query(TrackDB).filter(TrackDB.id.in_(track_ids), TrackDB.user_id == user_id, TrackDB.deleted_at.is_(None)).order_by(TrackDB.track_date.desc().nullslast(), TrackDB.id.desc()).all()
+
+# FTS5-Index über Name, Dateiname und Labels (external content auf 'tracks', per Trigger synchron, siehe migrations.py)
+TRACKS_FTS = table("tracks_fts", column("rowid"))
+SEARCH_RESULT_LIMIT = 200
+SEARCH_BM25_WEIGHTS = (10.0, 2.0, 5.0)  # name, original_filename, labels
+# bm25 kostet pro Treffer; bei sehr allgemeinen Suchen (z.B. "s") werden stattdessen die neuesten Tracks geliefert,
+# diese Reihenfolge liest FTS5 direkt aus dem Index
+SEARCH_RANK_MAX_MATCHES = 2000
+
+def build_fts_query(search_text: Optional[str]) -> Optional[str]:
+    """Freitext -> FTS5-Ausdruck: jedes Wort als Präfix, alle Wörter müssen vorkommen. None bei leerer Eingabe."""
+    words = re.findall(r"\w+", search_text or "")
+    if not words: return None
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in words)
 
 def get_filtered_tracks(
     db: Session, user_id: int, start_date_str: Optional[str] = None,
-    end_date_str: Optional[str] = None, label_filter_list: Optional[List[str]] = None
+    end_date_str: Optional[str] = None, label_filter_list: Optional[List[str]] = None,
+    search_text: Optional[str] = None
 ) -> List[TrackDB]:
-    query = db.query(TrackDB).filter(TrackDB.user_id == user_id)
+    query = db.query(TrackDB).filter(TrackDB.user_id == user_id, TrackDB.deleted_at.is_(None))
+    fts_query = build_fts_query(search_text)
     try:
+        if fts_query:
+            query = query.join(TRACKS_FTS, TRACKS_FTS.c.rowid == TrackDB.id) \
+                .filter(text("tracks_fts MATCH :fts_query").bindparams(fts_query=fts_query))
         if start_date_str:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             query = query.filter(TrackDB.track_date >= start_date)
@@ -194,17 +496,25 @@ def get_filtered_tracks(
         if label_filter_list:
             for label in label_filter_list:
                 query = query.filter(TrackDB.labels.like(f'%"{label}"%'))
+        if fts_query:
+            # Treffer dieses Users nach allen Filtern (ohne gelöschte) - fremde Daten dürfen die Sortierung nicht bestimmen
+            match_count = query.with_entities(func.count(TrackDB.id)).scalar()
+            if match_count <= SEARCH_RANK_MAX_MATCHES:  # nach Relevanz (bm25, kleiner = besser)
+                query = query.order_by(func.bm25(literal_column("tracks_fts"), *SEARCH_BM25_WEIGHTS), TrackDB.id.desc())
+            else:  # über die FTS-rowid sortieren, nicht tracks.id - nur so entfällt die Sortierung aller Treffer
+                query = query.order_by(TRACKS_FTS.c.rowid.desc())
+            return query.limit(SEARCH_RESULT_LIMIT).all()
         return query.order_by(TrackDB.track_date.desc().nullslast(), TrackDB.id.desc()).all()
     except ValueError as ve:
         print(f"Datumsformatfehler im Filter für User ID {user_id}: {ve}")
-        return db.query(TrackDB).filter(TrackDB.user_id == user_id).order_by(TrackDB.track_date.desc().nullslast(), TrackDB.id.desc()).all()
+        return db.query(TrackDB).filter(TrackDB.user_id == user_id, TrackDB.deleted_at.is_(None)).order_by(TrackDB.track_date.desc().nullslast(), TrackDB.id.desc()).all()
     except Exception as e:
         print(f"Fehler beim Filtern von Tracks für User ID {user_id}: {e}")
         traceback.print_exc()
         return []
 
 def update_track_details(db: Session, user_id: int, track_id: int, new_name: str, new_labels_list: List[str]) -> bool:
-    track = db.query(TrackDB).filter(TrackDB.id == track_id, TrackDB.user_id == user_id).first()
+    track = db.query(TrackDB).filter(TrackDB.id == track_id, TrackDB.user_id == user_id, TrackDB.deleted_at.is_(None)).first()
     if track:
         track.name = new_name.strip() if new_name.strip() else "Unbenannter Track"
         track.labels = json.dumps(sorted(list(set(new_labels_list))))
@@ -217,49 +527,45 @@ def update_track_details(db: Session, user_id: int, track_id: int, new_name: str
             return False
     return False
 
-def delete_track_by_id_with_file(db: Session, user_id: int, track_id: int) -> Optional[str]:
-    track = db.query(TrackDB).filter(TrackDB.id == track_id, TrackDB.user_id == user_id).first()
-    if track:
-        track_name_for_notification = track.name
-        filepath_to_delete = GPX_UPLOAD_DIR / track.stored_filename
-        try:
-            db.delete(track); db.commit()
-            if filepath_to_delete.exists(): filepath_to_delete.unlink()
-            return track_name_for_notification
-        except Exception as e:
-            db.rollback()
-            print(f"Fehler beim Löschen von Track ID {track_id} für User ID {user_id}: {e}")
-            traceback.print_exc()
-            return None
-    return None
+def soft_delete_tracks(db: Session, user_id: int, track_ids: List[int], commit: bool = True) -> int:
+    """
+    Markiert Tracks als gelöscht (nur ein UPDATE, keine Dateizugriffe). Sie verschwinden sofort aus Listen und Suche;
+    Dateien, abgeleitete Artefakte und die Zeile selbst entfernt file_gc.py nach Ablauf des Undo-Fensters.
+    Mit commit=False Teil der laufenden Transaktion des Aufrufers; Fehler werden dann weitergereicht.
+    Rückgabe: Anzahl markierter Tracks.
+    """
+    if not track_ids: return 0
+    query = db.query(TrackDB).filter(TrackDB.id.in_(track_ids), TrackDB.user_id == user_id, TrackDB.deleted_at.is_(None))
+    if not commit:
+        return query.update({"deleted_at": datetime.utcnow()}, synchronize_session=False)
+    try:
+        count = query.update({"deleted_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        print(f"{count} Tracks für User ID {user_id} in den Papierkorb verschoben.")
+        return count
+    except Exception as e:
+        db.rollback()
+        print(f"Fehler beim Löschen von Tracks {track_ids} für User ID {user_id}: {e}")
+        traceback.print_exc()
+        return 0
 
-def delete_multiple_tracks_with_files(db: Session, user_id: int, track_ids: List[int]) -> Tuple[int, List[str]]:
-    if not track_ids: return 0, []
-    tracks_to_delete = db.query(TrackDB).filter(TrackDB.id.in_(track_ids), TrackDB.user_id == user_id).all()
-    deleted_count = 0; errors = []
-    files_to_delete_paths = []
-    for track in tracks_to_delete:
-        files_to_delete_paths.append(GPX_UPLOAD_DIR / track.stored_filename)
-        try: db.delete(track)
-        except Exception as e_del_obj:
-            db.rollback()
-            errors.append(f"Fehler beim Vorbereiten des Löschens für Track ID {track.id}: {e_del_obj}")
-            return 0, errors + [f"DB-Vorbereitung fehlgeschlagen für User ID {user_id}, keine Tracks gelöscht."]
+def restore_tracks(db: Session, user_id: int, track_ids: List[int]) -> int:
+    """Macht soft_delete_tracks rückgängig, solange das Undo-Fenster offen ist. Rückgabe: Anzahl wiederhergestellter Tracks."""
+    if not track_ids: return 0
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.TRACK_DELETE_UNDO_WINDOW_S)
     try:
-        db.commit(); deleted_count = len(tracks_to_delete)
-        for f_path in files_to_delete_paths:
-            if f_path.exists():
-                try: f_path.unlink()
-                except Exception as e_file_del: errors.append(f"Konnte Datei {f_path} nicht löschen: {e_file_del}")
-        print(f"{deleted_count} Tracks für User ID {user_id} gelöscht.")
-    except Exception as e_commit:
-        db.rollback(); errors.append(f"Fehler beim finalen DB-Commit für User ID {user_id}: {e_commit}")
+        count = db.query(TrackDB).filter(TrackDB.id.in_(track_ids), TrackDB.user_id == user_id, TrackDB.deleted_at >= cutoff) \
+            .update({"deleted_at": None}, synchronize_session=False)
+        db.commit()
+        return count
+    except Exception as e:
+        db.rollback()
+        print(f"Fehler beim Wiederherstellen von Tracks {track_ids} für User ID {user_id}: {e}")
         traceback.print_exc()
-        return 0, errors + [f"DB-Commit fehlgeschlagen, keine Tracks gelöscht."]
-    return deleted_count, errors
+        return 0
 
 def get_all_unique_labels(db: Session, user_id: int) -> List[str]:
-    all_labels_json_strings = db.query(TrackDB.labels).filter(TrackDB.user_id == user_id).distinct().all()
+    all_labels_json_strings = db.query(TrackDB.labels).filter(TrackDB.user_id == user_id, TrackDB.deleted_at.is_(None)).distinct().all()
     unique_labels_set = set()
     for (labels_json,) in all_labels_json_strings:
         if labels_json and labels_json.strip() and labels_json != "null":
@@ -271,8 +577,15 @@ def get_all_unique_labels(db: Session, user_id: int) -> List[str]:
                 print(f"Warnung: Ungültiger JSON-String für Labels in DB (User ID {user_id}): {labels_json}")
     return sorted(list(unique_labels_set))
 
-def get_gpx_filepath(db: Session, user_id: int, track_id: int) -> Optional[Path]:
+def get_profile_filepath(track_id: int) -> Path:
+    return PROFILE_DIR / f"{track_id}.npy"
+
+def get_thumbnail_filepath(track_id: int) -> Path:
+    return THUMBNAIL_DIR / f"{track_id}.svg"
+
+def get_gpx_storage_key(db: Session, user_id: int, track_id: int) -> Optional[str]:
+    """Schlüssel der GPX-Datei im Blob-Speicher (blob_storage.get_store().local_file(...) liefert den Pfad)."""
     track = db.query(TrackDB).filter(TrackDB.id == track_id, TrackDB.user_id == user_id).first()
     if track and track.stored_filename:
-        return GPX_UPLOAD_DIR / track.stored_filename
+        return track.stored_filename
     return None
\ No newline at end of file
@@ -56,51 +56,41 @@ def apply_design_and_get_header():
         dialog_state.action_button = None  
         dialog_state.is_2fa_currently_enabled = False 
 
-        db_s_init = None
-        try:
-            db_s_init = db_config.SessionLocal()
-            user = db_config.get_user_by_id(db_s_init, current_user_id)
-            if not user:
-                ui.notify("Benutzer nicht gefunden.", type='error')
-                return
-            if not user.email:
-                 ui.notify("Keine E-Mail-Adresse für diesen Account hinterlegt. 2FA nicht möglich.", type='warning')
-                 return
-            dialog_state.is_2fa_currently_enabled = user.is_2fa_enabled
-        finally:
-            if db_s_init: db_s_init.close()
+        user = db_config.get_user_record(current_user_id)
+        if not user:
+            ui.notify("Benutzer nicht gefunden.", type='error')
+            return
+        if not user.email:
+             ui.notify("Keine E-Mail-Adresse für diesen Account hinterlegt. 2FA nicht möglich.", type='warning')
+             return
+        dialog_state.is_2fa_currently_enabled = user.is_2fa_enabled
 
         async def update_dialog_ui_inner():
-            db_s_update = None
-            try:
-                db_s_update = db_config.SessionLocal()
-                user_update = db_config.get_user_by_id(db_s_update, current_user_id)
-                if user_update:
-                    dialog_state.is_2fa_currently_enabled = user_update.is_2fa_enabled
-                    if dialog_state.status_label:
-                        dialog_state.status_label.set_text(f"Status: {'Aktiviert' if dialog_state.is_2fa_currently_enabled else 'Deaktiviert'}")
-                    if dialog_state.action_button:
-                        dialog_state.action_button.set_text('E-Mail 2FA Deaktivieren' if dialog_state.is_2fa_currently_enabled else 'E-Mail 2FA Aktivieren')
-                        dialog_state.action_button.props(remove='color=positive' if not dialog_state.is_2fa_currently_enabled else 'color=negative')
-                        dialog_state.action_button.props(add='color=negative' if dialog_state.is_2fa_currently_enabled else 'color=positive')
-                    
-                    if manage_2fa_button_header_ref := app.storage.client.get('manage_2fa_button'):
-                         manage_2fa_button_header_ref.set_text('2FA Verwalten (Aktiv)' if dialog_state.is_2fa_currently_enabled else '2FA Einrichten')
-                else:
-                     if dialog_state.dialog_instance: dialog_state.dialog_instance.close()
-            finally:
-                if db_s_update: db_s_update.close()
+            user_update = db_config.get_user_record(current_user_id)
+            if user_update:
+                dialog_state.is_2fa_currently_enabled = user_update.is_2fa_enabled
+                if dialog_state.status_label:
+                    dialog_state.status_label.set_text(f"Status: {'Aktiviert' if dialog_state.is_2fa_currently_enabled else 'Deaktiviert'}")
+                if dialog_state.action_button:
+                    dialog_state.action_button.set_text('E-Mail 2FA Deaktivieren' if dialog_state.is_2fa_currently_enabled else 'E-Mail 2FA Aktivieren')
+                    dialog_state.action_button.props(remove='color=positive' if not dialog_state.is_2fa_currently_enabled else 'color=negative')
+                    dialog_state.action_button.props(add='color=negative' if dialog_state.is_2fa_currently_enabled else 'color=positive')
+                
+                if manage_2fa_button_header_ref := app.storage.client.get('manage_2fa_button'):
+                     manage_2fa_button_header_ref.set_text('2FA Verwalten (Aktiv)' if dialog_state.is_2fa_currently_enabled else '2FA Einrichten')
+            else:
+                 if dialog_state.dialog_instance: dialog_state.dialog_instance.close()
 
 
         async def toggle_2fa_status_inner():
             db_s_toggle = None
             try:
-                db_s_toggle = db_config.SessionLocal()
-                user_toggle = db_config.get_user_by_id(db_s_toggle, current_user_id)
+                user_toggle = db_config.get_user_record(current_user_id)
                 if not user_toggle or not user_toggle.email:
                     ui.notify("Benutzer oder E-Mail nicht gefunden. Aktion abgebrochen.", type='error')
                     if dialog_state.dialog_instance: dialog_state.dialog_instance.close()
                     return
+                db_s_toggle = db_config.SessionLocal()
 
                 if dialog_state.is_2fa_currently_enabled:
                     if db_config.disable_email_2fa(db_s_toggle, current_user_id):
@@ -156,14 +146,8 @@ def apply_design_and_get_header():
                         header_button_ref = app.storage.client.get('manage_2fa_button')
                         if not header_button_ref: return
 
-                        db_s_header = None
-                        is_enabled_header = False
-                        try:
-                            db_s_header = db_config.SessionLocal()
-                            user_header = db_config.get_user_by_id(db_s_header, current_user_id_header)
-                            is_enabled_header = user_header.is_2fa_enabled if user_header else False
-                        finally:
-                            if db_s_header: db_s_header.close()
+                        user_header = db_config.get_user_record(current_user_id_header)
+                        is_enabled_header = user_header.is_2fa_enabled if user_header else False
                         
                         try:
                             header_button_ref.set_text('2FA Verwalten (Aktiv)' if is_enabled_header else '2FA Einrichten')
@@ -0,0 +1,106 @@
+# projekt_gpx_viewer/elevation_profiles.py
+"""
+Höhenprofile (Distanz/Höhe) pro Track, berechnet vom Prozessor 'profile' (track_processing.py) und als
+float32-Array der Form (2, n) unter derived/profiles/<track_id>.npy abgelegt. Das Diagramm liest nur diese
+Dateien; fehlt eine (Job noch nicht gelaufen), wird sie einmalig aus der GPX-Datei erzeugt.
+
+Gespeichert wird auf gleichmäßige Distanzschritte mit höchstens settings.ELEVATION_PROFILE_POINTS Punkten;
+für die Anzeige teilen sich alle überlagerten Tracks settings.ELEVATION_CHART_POINT_BUDGET Punkte.
+"""
+import os
+import threading
+import traceback
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import blob_storage
+import db_config
+import gpx_utils
+import point_store
+import settings
+import track_analytics
+
+MIN_CHART_POINTS_PER_TRACK = 100
+
+def compute_profile(lat: np.ndarray, lon: np.ndarray, ele: np.ndarray, max_points: Optional[int] = None) -> np.ndarray:
+    """Distanz (km) und Höhe (m) auf gleichmäßigem Distanzraster; leeres (2, 0)-Array ohne verwertbare Höhen."""
+    if lat.size < 2:
+        return np.empty((2, 0), dtype=np.float32)
+    cumulative_m = np.concatenate(([0.0], np.cumsum(track_analytics.segment_distances_m(lat, lon))))
+    return profile_from_cumulative(cumulative_m, ele, max_points)
+
+def profile_from_cumulative(cumulative_m: np.ndarray, ele: np.ndarray, max_points: Optional[int] = None) -> np.ndarray:
+    """Wie compute_profile, aber auf bereits vorhandener kumulierter Distanz (z.B. Präfixsummen eines Ausschnitts)."""
+    max_points = max_points or settings.ELEVATION_PROFILE_POINTS
+    valid_ele = np.isfinite(ele)
+    if cumulative_m.size < 2 or valid_ele.sum() < 2:
+        return np.empty((2, 0), dtype=np.float32)
+    cumulative_m = cumulative_m - cumulative_m[0]
+    sample_at_m = np.linspace(0.0, cumulative_m[-1], min(cumulative_m.size, max_points))
+    elevation = np.interp(sample_at_m, cumulative_m[valid_ele], ele[valid_ele])
+    return np.vstack((sample_at_m / 1000.0, elevation)).astype(np.float32)
+
+def compute_profile_from_gpx_file(gpx_filepath_str: str) -> Optional[np.ndarray]:
+    point_arrays = gpx_utils.get_point_arrays_from_gpx_file(gpx_filepath_str)
+    if point_arrays is None:
+        return None
+    return compute_profile(point_arrays["lat"], point_arrays["lon"], point_arrays["ele"])
+
+def save_profile(track_id: int, profile: np.ndarray):
+    """Schreibt atomar (Temp-Datei + os.replace), parallele Leser sehen nie eine halbe Datei."""
+    target_path = db_config.get_profile_filepath(track_id)
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = target_path.with_name(f".{target_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(temp_path, "wb") as f:
+        np.save(f, np.asarray(profile, dtype=np.float32))
+    os.replace(temp_path, target_path)
+
+def load_profile(track_id: int) -> Optional[np.ndarray]:
+    try:
+        return np.load(db_config.get_profile_filepath(track_id))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Höhenprofil für Track ID {track_id} unlesbar, wird neu berechnet: {e}")
+        return None
+
+def load_profiles_for_tracks(user_id: int, track_ids: List[int]) -> Dict[int, Optional[np.ndarray]]:
+    """Gespeicherte Profile laden, fehlende aus Punktspeicher bzw. GPX-Datei erzeugen. None = GPX-Datei fehlt/unlesbar."""
+    profiles: Dict[int, Optional[np.ndarray]] = {track_id: load_profile(track_id) for track_id in track_ids}
+    missing_ids = [track_id for track_id, profile in profiles.items() if profile is None]
+    for track_id, arrays in point_store.get_track_point_arrays(user_id, missing_ids).items():
+        profiles[track_id] = compute_profile(arrays["lat"], arrays["lon"], arrays["ele"].astype(np.float64))
+        save_profile(track_id, profiles[track_id])
+    missing_ids = [track_id for track_id in missing_ids if profiles[track_id] is None]
+    if not missing_ids:
+        return profiles
+    db = db_config.SessionLocal()
+    try:
+        tracks = db_config.get_tracks_by_ids(db, user_id, missing_ids)
+    finally: db.close()
+    for track in tracks:
+        try:
+            with blob_storage.get_store().local_file(track.stored_filename) as gpx_file_path:
+                if gpx_file_path is None:
+                    continue
+                profile = compute_profile_from_gpx_file(str(gpx_file_path))
+            if profile is not None:
+                save_profile(track.id, profile)
+            profiles[track.id] = profile
+        except Exception as e:
+            print(f"Fehler beim Berechnen des Höhenprofils für Track ID {track.id}: {e}"); traceback.print_exc()
+    return profiles
+
+def chart_series_data(profiles: List[np.ndarray], point_budget: Optional[int] = None) -> List[List[List[float]]]:
+    """Alle Profile auf einen gemeinsamen Punkt-Etat verteilen und als [[km, m], ...] für eine numerische x-Achse liefern."""
+    point_budget = point_budget or settings.ELEVATION_CHART_POINT_BUDGET
+    points_per_track = max(MIN_CHART_POINTS_PER_TRACK, point_budget // max(1, len(profiles)))
+    series: List[List[List[float]]] = []
+    for profile in profiles:
+        distance_km, elevation_m = profile[0], profile[1]
+        if distance_km.size > points_per_track:
+            sample_at_km = np.linspace(0.0, float(distance_km[-1]), points_per_track)
+            distance_km, elevation_m = sample_at_km, np.interp(sample_at_km, profile[0], profile[1])
+        series.append(np.column_stack((np.round(distance_km, 3), np.round(elevation_m, 1))).tolist())
+    return series
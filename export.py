@@ -0,0 +1,155 @@
+# projekt_gpx_viewer/export.py
+"""
+Streaming-Export ausgewählter Tracks als ZIP der Originaldateien oder als eine zusammengeführte GPX-Datei.
+
+Beide Generatoren liefern die Antwort blockweise und halten höchstens eine Quelldatei gleichzeitig offen
+(bei S3 als Temp-Kopie, siehe blob_storage.local_file), der Speicherbedarf ist daher unabhängig von der
+Anzahl der exportierten Tracks.
+"""
+import traceback
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, TYPE_CHECKING
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+import blob_storage
+import track_formats
+
+if TYPE_CHECKING:
+    import gpxpy.gpx
+
+EXPORT_CHUNK_SIZE_BYTES = 256 * 1024
+
+# (Dateiname im Export, Schlüssel im Blob-Speicher (TrackDB.stored_filename), Trackname)
+ExportItem = Tuple[str, str, str]
+
+class _ChunkSink:
+    """Nicht-seekbares Schreibziel für zipfile; gesammelte Bytes werden vom Generator abgeholt."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_tracks_zip(items: List[ExportItem]) -> Iterator[bytes]:
+    """
+    Erzeugt ein ZIP-Archiv der gespeicherten Originaldateien als Byte-Stream.
+    Die Dateien werden unverändert (ohne erneutes Parsen/Serialisieren) blockweise übernommen.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for arcname, stored_filename, _ in items:
+            try:
+                with blob_storage.get_store().local_file(stored_filename) as filepath:
+                    if filepath is None: raise FileNotFoundError(stored_filename)
+                    zinfo = zipfile.ZipInfo.from_file(filepath, arcname=arcname)
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    with open(filepath, "rb") as src, zf.open(zinfo, mode="w", force_zip64=zinfo.file_size > 0x7FFFFFFF) as dst:
+                        while True:
+                            block = src.read(EXPORT_CHUNK_SIZE_BYTES)
+                            if not block: break
+                            dst.write(block)
+                            data = sink.drain()
+                            if data: yield data
+            except FileNotFoundError:
+                print(f"Export: Datei {stored_filename} nicht gefunden, übersprungen.")
+            data = sink.drain()
+            if data: yield data
+    data = sink.drain()
+    if data: yield data
+
+def _point_xml(tag: str, point: "gpxpy.gpx.GPXTrackPoint") -> str:
+    parts = [f'<{tag} lat="{point.latitude}" lon="{point.longitude}">']
+    if point.elevation is not None:
+        parts.append(f"<ele>{point.elevation}</ele>")
+    if point.time:
+        parts.append(f"<time>{point.time.strftime('%Y-%m-%dT%H:%M:%SZ')}</time>")
+    parts.append(f"</{tag}>")
+    return "".join(parts)
+
+def _tracks_xml_from_file(filepath: Path, fallback_name: str) -> Iterator[str]:
+    track_format = track_formats.detect_file_format(str(filepath))
+    if track_format != track_formats.FORMAT_GPX:  # FIT/TCX/GeoJSON: ein Track aus den Punkt-Arrays
+        track_name, point_arrays = track_formats.decode_track(track_format, filepath.read_bytes())
+        yield f"<trk><name>{escape(track_name or fallback_name)}</name><trkseg>{_trkpts_xml(point_arrays)}</trkseg></trk>"
+        return
+    import gpxpy
+    with open(filepath, "r", encoding="utf-8", errors="replace") as f:
+        gpx = gpxpy.parse(f)
+    for track in gpx.tracks:
+        yield f"<trk><name>{escape(track.name or fallback_name)}</name>"
+        for segment in track.segments:
+            yield "<trkseg>"
+            batch: List[str] = []
+            for point in segment.points:
+                batch.append(_point_xml("trkpt", point))
+                if len(batch) >= 2000:
+                    yield "".join(batch); batch.clear()
+            yield "".join(batch)
+            yield "</trkseg>"
+        yield "</trk>"
+    if not gpx.tracks:
+        for route in gpx.routes:  # Routen werden als Track mit einem Segment übernommen
+            yield f"<trk><name>{escape(route.name or fallback_name)}</name><trkseg>"
+            yield "".join(_point_xml("trkpt", point) for point in route.points)
+            yield "</trkseg></trk>"
+
+def stream_merged_gpx(items: List[ExportItem], export_name: str = "GPX Export") -> Iterator[bytes]:
+    """Führt alle Tracks der Auswahl in einer GPX-1.1-Datei zusammen (ein <trk> pro Quelltrack)."""
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<gpx version="1.1" creator="GPX Track Manager" xmlns="http://www.topografix.com/GPX/1/1">'
+           f"<metadata><name>{escape(export_name)}</name></metadata>\n").encode("utf-8")
+    for _, stored_filename, track_name in items:
+        try:
+            with blob_storage.get_store().local_file(stored_filename) as filepath:
+                if filepath is None: raise FileNotFoundError(stored_filename)
+                buffered: List[str] = []; buffered_len = 0
+                for fragment in _tracks_xml_from_file(filepath, track_name):
+                    buffered.append(fragment); buffered_len += len(fragment)
+                    if buffered_len >= EXPORT_CHUNK_SIZE_BYTES:
+                        yield "".join(buffered).encode("utf-8"); buffered.clear(); buffered_len = 0
+                buffered.append("\n")
+                yield "".join(buffered).encode("utf-8")
+        except FileNotFoundError:
+            print(f"Export: Datei {stored_filename} nicht gefunden, übersprungen.")
+        except Exception as e:
+            print(f"Export: Fehler beim Lesen von {stored_filename}: {e}")
+            traceback.print_exc()
+            yield f"<!-- {escape(track_name).replace('--', '-')}: nicht lesbar -->\n".encode("utf-8")
+    yield b"</gpx>\n"
+
+def _trkpts_xml(point_arrays: Dict[str, np.ndarray]) -> str:
+    times = [datetime.fromtimestamp(t, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ') if np.isfinite(t) else None
+             for t in point_arrays["time"].tolist()]
+    return "".join(
+        f'<trkpt lat="{lat:.7f}" lon="{lon:.7f}">' + (f"<ele>{ele:.2f}</ele>" if ele == ele else "")
+        + (f"<time>{time_str}</time>" if time_str else "") + "</trkpt>"
+        for lat, lon, ele, time_str in zip(point_arrays["lat"].tolist(), point_arrays["lon"].tolist(), point_arrays["ele"].tolist(), times))
+
+def gpx_bytes_from_point_arrays(track_name: str, point_arrays: Dict[str, np.ndarray]) -> bytes:
+    """GPX 1.1 mit einem Track/Segment aus Punkt-Arrays (lat, lon, ele/time mit NaN = fehlt), z.B. nach Bearbeitung."""
+    points_xml = _trkpts_xml(point_arrays)
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<gpx version="1.1" creator="GPX Track Manager" xmlns="http://www.topografix.com/GPX/1/1">'
+            f"<metadata><name>{escape(track_name)}</name></metadata>\n"
+            f"<trk><name>{escape(track_name)}</name><trkseg>{points_xml}</trkseg></trk>\n</gpx>\n").encode("utf-8")
+
+def export_arcname(track_id: int, original_filename: str) -> str:
+    safe_name = "".join(c if c.isalnum() or c in ('.', '_', '-') else '_' for c in (original_filename or "track.gpx"))
+    return f"{track_id}_{safe_name}"
+
+def content_disposition(filename: str) -> str:
+    return f'attachment; filename="{filename}"'
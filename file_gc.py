@@ -0,0 +1,228 @@
+# projekt_gpx_viewer/file_gc.py
+"""
+Hintergrund-Aufräumer für gelöschte Tracks und Dateibestand.
+
+Löschen in der Oberfläche setzt nur TrackDB.deleted_at (db_config.soft_delete_tracks). Dieser Aufräumer
+  - entfernt in Batches Tracks, deren Undo-Fenster abgelaufen ist: erst GPX-Datei, abgeleitete Dateien
+    (DERIVED_FILE_PATHS) und Punktspeicher-Einträge, danach die Zeilen. Bricht er mittendrin ab, bleibt die
+    Zeile im Papierkorb und der nächste Lauf wiederholt das (fehlende Dateien sind kein Fehler);
+  - gleicht periodisch den Blob-Speicher (blob_storage.list_keys, lokal parallel über die Hash-Verzeichnisse,
+    ohne GPX_INCOMING_DIR und andere Punkt-Einträge) mit TrackDB.stored_filename ab.
+    Verwaiste Dateien älter als FILE_SCAN_ORPHAN_MIN_AGE_S werden gelöscht, fehlende Dateien nur gemeldet; verwaiste Profile und Punktspeicher-Einträge werden ebenfalls entfernt.
+
+Läuft im Event-Loop von main.py (start/stop); bei mehreren Worker-Prozessen (serve.py) arbeitet dank
+Dateisperre immer nur einer. Manuell:
+    python file_gc.py [--purge] [--scan] [--dry-run]
+"""
+import argparse
+import asyncio
+import time
+import traceback
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import blob_storage
+import db_config
+import point_store
+import settings
+
+try:
+    import fcntl  # Sperre zwischen Prozessen; ohne fcntl (Windows) läuft der Aufräumer ungesperrt
+except ImportError:
+    fcntl = None
+
+GC_LOCK_PATH = db_config.DERIVED_DIR / ".file_gc.lock"
+# Sicherheitsabstand zum Undo-Fenster, damit ein gerade noch erlaubtes Wiederherstellen nicht mit dem Löschen kollidiert
+PURGE_SAFETY_MARGIN_S = 60
+
+# Pro Track abgeleitete Einzeldateien (track_id -> Pfad); neue Artefakte hier und in DERIVED_FILE_GLOBS ergänzen
+DERIVED_FILE_PATHS: List[Callable[[int], Path]] = [db_config.get_profile_filepath, db_config.get_thumbnail_filepath]
+# Verzeichnisse dieser Dateien (<track_id>.<endung>) für den Abgleich verwaister Einträge
+DERIVED_FILE_GLOBS: List[Tuple[Path, str]] = [(db_config.PROFILE_DIR, "*.npy"), (db_config.THUMBNAIL_DIR, "*.svg")]
+
+_gc_task: Optional[asyncio.Task] = None
+
+class ScanReport(NamedTuple):
+    files_scanned: int
+    orphan_files: List[str]      # Schlüssel im Blob-Speicher ohne Track-Zeile
+    removed_orphans: int
+    missing_files: List[Tuple[int, str]]  # (track_id, stored_filename) ohne Datei
+    removed_derived: int
+
+class _GcLock:
+    """Nicht blockierende Sperre über alle Prozesse; acquired=False, wenn ein anderer Prozess gerade aufräumt."""
+    def __enter__(self):
+        GC_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(GC_LOCK_PATH, "a+b"); self.acquired = True
+        if fcntl:
+            try: fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError: self.acquired = False
+        return self
+
+    def __exit__(self, *_):
+        if fcntl and self.acquired: fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+
+def _unlink(path: Path) -> bool:
+    try:
+        path.unlink(); return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        print(f"Konnte Datei {path} nicht löschen: {e}"); return False
+
+def _delete_blob(store: blob_storage.BlobStore, key: str) -> Optional[bool]:
+    """True = gelöscht, False = nichts (mehr) da bzw. ungültiger Schlüssel, None = Fehler, später erneut versuchen."""
+    if not key:
+        return False
+    try:
+        return store.delete(key)
+    except ValueError as e:  # ungültiger Schlüssel: darunter kann keine Datei liegen
+        print(f"Ungültiger Dateischlüssel {key!r}: {e}"); return False
+    except OSError as e:
+        print(f"Konnte Datei {key} nicht löschen: {e}"); return None
+
+def purge_deleted_tracks(batch_size: int = settings.FILE_GC_BATCH_SIZE, max_batches: Optional[int] = None) -> int:
+    """Entfernt Tracks, deren Undo-Fenster abgelaufen ist, samt Dateien. Rückgabe: Anzahl entfernter Tracks."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.TRACK_DELETE_UNDO_WINDOW_S + PURGE_SAFETY_MARGIN_S)
+    purged = 0; batches = 0
+    failed_ids: Set[int] = set()  # Datei ließ sich nicht löschen: Zeile bleibt für den nächsten Lauf, dieser macht weiter
+    while max_batches is None or batches < max_batches:
+        db = db_config.SessionLocal()
+        try:
+            query = db.query(db_config.TrackDB.id, db_config.TrackDB.user_id, db_config.TrackDB.stored_filename) \
+                .filter(db_config.TrackDB.deleted_at < cutoff)
+            if failed_ids: query = query.filter(db_config.TrackDB.id.notin_(failed_ids))
+            rows = query.order_by(db_config.TrackDB.deleted_at).limit(batch_size).all()
+            if not rows: break
+            ids_by_user: Dict[int, List[int]] = {}
+            store = blob_storage.get_store()
+            for track_id, user_id, stored_filename in rows:
+                if _delete_blob(store, stored_filename) is None:
+                    failed_ids.add(track_id); continue
+                for path_for_track in DERIVED_FILE_PATHS: _unlink(path_for_track(track_id))
+                ids_by_user.setdefault(user_id, []).append(track_id)
+            for user_id, track_ids in ids_by_user.items():
+                point_store.remove_tracks(user_id, track_ids)
+            # nur Zeilen, die noch im Papierkorb liegen (Jobs, Fingerprints usw. folgen per CASCADE)
+            done_ids = [track_id for track_ids in ids_by_user.values() for track_id in track_ids]
+            if done_ids:
+                purged += db.query(db_config.TrackDB).filter(db_config.TrackDB.id.in_(done_ids),
+                                                             db_config.TrackDB.deleted_at < cutoff).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Fehler beim Entfernen gelöschter Tracks: {e}")
+            traceback.print_exc()
+            break
+        finally:
+            db.close()
+        batches += 1
+    if purged: print(f"Aufräumen: {purged} gelöschte Tracks endgültig entfernt.")
+    if failed_ids: print(f"Aufräumen: {len(failed_ids)} Tracks übersprungen (Datei nicht löschbar), nächster Lauf versucht es erneut.")
+    return purged
+
+def _remove_orphaned_derived(tracks_by_user: Dict[int, Set[int]], dry_run: bool) -> int:
+    """Profile/Punktspeicher-Einträge ohne Track-Zeile entfernen (nur IDs bis zur höchsten gelesenen, neuere sind evtl. gerade entstanden)."""
+    all_track_ids = set().union(*tracks_by_user.values()) if tracks_by_user else set()
+    max_track_id = max(all_track_ids, default=0)
+    removed = 0
+    for derived_dir, pattern in DERIVED_FILE_GLOBS:
+        if not derived_dir.exists(): continue
+        for path in derived_dir.glob(pattern):
+            if path.stem.isdigit() and int(path.stem) not in all_track_ids and int(path.stem) <= max_track_id:
+                removed += 1
+                if not dry_run: _unlink(path)
+    if point_store.POINT_STORE_DIR.exists():
+        for user_dir in point_store.POINT_STORE_DIR.iterdir():
+            if not user_dir.name.isdigit(): continue
+            user_id = int(user_dir.name)
+            stale_ids = {track_id for track_id in point_store.open_store(user_id).track_ids
+                         if track_id <= max_track_id and track_id not in tracks_by_user.get(user_id, set())}
+            removed += len(stale_ids)
+            if stale_ids and not dry_run: point_store.remove_tracks(user_id, stale_ids)
+    return removed
+
+def scan_consistency(dry_run: bool = False, orphan_min_age_s: int = settings.FILE_SCAN_ORPHAN_MIN_AGE_S,
+                     workers: int = settings.FILE_SCAN_WORKERS) -> ScanReport:
+    """Gleicht Blob-Speicher und abgeleitete Dateien mit der Tabelle 'tracks' ab (inkl. Papierkorb)."""
+    started = time.monotonic()
+    store = blob_storage.get_store()
+    # Dateiliste vor der DB lesen: eine zwischendurch neu angelegte Datei hat dann schon ihre Zeile oder ist zu jung
+    files = store.list_keys(workers)
+    db = db_config.SessionLocal()
+    try:
+        rows = db.query(db_config.TrackDB.id, db_config.TrackDB.user_id, db_config.TrackDB.stored_filename).all()
+    finally: db.close()
+    stored_filenames = {stored_filename for _, _, stored_filename in rows}
+    tracks_by_user: Dict[int, Set[int]] = {}
+    for track_id, user_id, _ in rows: tracks_by_user.setdefault(user_id, set()).add(track_id)
+    orphan_files = sorted(name for name in files if name not in stored_filenames)
+    now = time.time(); removed_orphans = 0
+    for name in orphan_files:
+        if now - files[name] < orphan_min_age_s: continue
+        if dry_run or _delete_blob(store, name): removed_orphans += 1
+    missing_files = [(track_id, stored_filename) for track_id, _, stored_filename in rows
+                     if stored_filename not in files and not store.exists(stored_filename)]
+    for track_id, stored_filename in missing_files[:20]:
+        print(f"Konsistenz: Datei {stored_filename} von Track ID {track_id} fehlt.")
+    removed_derived = _remove_orphaned_derived(tracks_by_user, dry_run)
+    print(f"Konsistenzprüfung: {len(files)} Dateien, {len(orphan_files)} verwaist ({removed_orphans} "
+          f"{'zu löschen' if dry_run else 'gelöscht'}), {len(missing_files)} fehlend, {removed_derived} abgeleitete Einträge "
+          f"{'zu entfernen' if dry_run else 'entfernt'} - {time.monotonic() - started:.1f}s.")
+    return ScanReport(len(files), orphan_files, removed_orphans, missing_files, removed_derived)
+
+def run_gc_cycle(scan: bool = False) -> bool:
+    """Ein Aufräumlauf (blockierend). Rückgabe: False, wenn ein anderer Prozess gerade aufräumt."""
+    with _GcLock() as lock:
+        if not lock.acquired: return False
+        purge_deleted_tracks()
+        if scan: scan_consistency()
+        return True
+
+async def _gc_loop():
+    last_scan = time.monotonic()  # kein Scan direkt beim Start, der fällt sonst mit dem Hochlaufen zusammen
+    while True:
+        try:
+            scan_due = time.monotonic() - last_scan >= settings.FILE_SCAN_INTERVAL_S
+            if await asyncio.to_thread(run_gc_cycle, scan_due) and scan_due:
+                last_scan = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Fehler im Datei-Aufräumer: {e}")
+            traceback.print_exc()
+        await asyncio.sleep(settings.FILE_GC_INTERVAL_S)
+
+async def start():
+    """Startet den periodischen Aufräumer im laufenden Event-Loop (für app.on_startup)."""
+    global _gc_task
+    if _gc_task is None:
+        _gc_task = asyncio.create_task(_gc_loop())
+
+async def stop():
+    global _gc_task
+    if _gc_task is not None:
+        _gc_task.cancel()
+        await asyncio.gather(_gc_task, return_exceptions=True)
+        _gc_task = None
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gelöschte Tracks endgültig entfernen und Dateibestand prüfen.")
+    parser.add_argument("--purge", action="store_true", help="Tracks mit abgelaufenem Undo-Fenster entfernen")
+    parser.add_argument("--scan", action="store_true", help="Blob-Speicher mit der Datenbank abgleichen")
+    parser.add_argument("--dry-run", action="store_true", help="Beim Abgleich nur berichten, nichts löschen")
+    args = parser.parse_args(argv)
+    import migrations
+    migrations.prepare_database()
+    if not (args.purge or args.scan): args.purge = args.scan = True
+    with _GcLock() as lock:
+        if not lock.acquired:
+            print("Ein anderer Prozess räumt gerade auf."); return 1
+        if args.purge and not args.dry_run: purge_deleted_tracks()
+        if args.scan: scan_consistency(dry_run=args.dry_run)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
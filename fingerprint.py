@@ -0,0 +1,143 @@
+# projekt_gpx_viewer/fingerprint.py
+"""
+Geometrie-Fingerprints zur Erkennung mehrfach hochgeladener Routen.
+
+Die Strecke wird in gleichmäßigen Abständen neu abgetastet und auf ein Raster (~150 m) abgebildet.
+Über die Menge der berührten Zellen wird eine MinHash-Signatur gebildet; deren Bänder (LSH) landen
+in track_lsh_bands. Eine Ähnlichkeitssuche ist damit ein Index-Lookup über (user_id, band, bucket)
+und vergleicht Signaturen nur mit den so gefundenen Kandidaten - nie mit allen Tracks des Users.
+"""
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+import blob_storage
+import db_config
+import gpx_utils
+
+CELL_SIZE_DEG = 0.00135          # ~150 m Nord-Süd
+RESAMPLE_STEP_M = 30.0           # dichter als die Zellgröße, damit keine Zelle übersprungen wird
+NUM_HASHES = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_HASHES // LSH_BANDS
+DEFAULT_MIN_SIMILARITY = 0.7
+_EARTH_RADIUS_M = 6371000.0
+_PRIME = np.int64(2 ** 31 - 1)
+
+_rng = np.random.default_rng(20250603)  # feste Saat: Signaturen müssen über Prozesse/Neustarts hinweg vergleichbar sein
+_HASH_A = _rng.integers(1, _PRIME, size=NUM_HASHES, dtype=np.int64)
+_HASH_B = _rng.integers(0, _PRIME, size=NUM_HASHES, dtype=np.int64)
+
+def _resample(points: np.ndarray) -> np.ndarray:
+    """Tastet die Strecke in RESAMPLE_STEP_M-Abständen neu ab (äquirektangulare Näherung, reicht für ~30 m Schritte)."""
+    lat_rad = np.radians(points[:, 0]); lon_rad = np.radians(points[:, 1])
+    dx = np.diff(lon_rad) * np.cos((lat_rad[1:] + lat_rad[:-1]) / 2) * _EARTH_RADIUS_M
+    dy = np.diff(lat_rad) * _EARTH_RADIUS_M
+    cumulative = np.concatenate(([0.0], np.cumsum(np.hypot(dx, dy))))
+    if cumulative[-1] <= 0:
+        return points[:1]
+    targets = np.arange(0.0, cumulative[-1] + RESAMPLE_STEP_M, RESAMPLE_STEP_M)
+    return np.column_stack((np.interp(targets, cumulative, points[:, 0]), np.interp(targets, cumulative, points[:, 1])))
+
+def grid_cells(points_list: Sequence[Sequence[float]]) -> np.ndarray:
+    """Eindeutige Rasterzellen-IDs (int64) entlang der Strecke."""
+    points = np.asarray(points_list, dtype=np.float64).reshape(-1, 2)
+    points = points[np.isfinite(points).all(axis=1)]
+    if len(points) == 0:
+        return np.empty(0, dtype=np.int64)
+    resampled = _resample(points)
+    # Längengrad-Zellbreite über den Breitengrad des Zellbandes skalieren, damit Zellen etwa quadratisch bleiben
+    lat_idx = np.floor(resampled[:, 0] / CELL_SIZE_DEG).astype(np.int64)
+    lon_scale = np.cos(np.radians((lat_idx + 0.5) * CELL_SIZE_DEG))
+    lon_idx = np.floor(resampled[:, 1] * lon_scale / CELL_SIZE_DEG).astype(np.int64)
+    return np.unique((lat_idx << 32) ^ (lon_idx & 0xFFFFFFFF))
+
+def minhash_signature(cells: np.ndarray) -> Optional[np.ndarray]:
+    if cells.size == 0:
+        return None
+    x = (cells % _PRIME).astype(np.int64)
+    hashed = (np.outer(_HASH_A, x) + _HASH_B[:, None]) % _PRIME
+    return hashed.min(axis=1).astype(np.uint32)
+
+def lsh_buckets(signature: np.ndarray) -> List[int]:
+    """Ein signierter 63-bit Bucket-Wert pro Band (passt in SQLite INTEGER)."""
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+        buckets.append(int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), "big", signed=True) >> 1)
+    return buckets
+
+def compute_fingerprint(points_list: Sequence[Sequence[float]]) -> Optional[Tuple[np.ndarray, int]]:
+    """Rückgabe: (signature, anzahl_zellen) oder None bei zu wenigen Punkten."""
+    cells = grid_cells(points_list)
+    signature = minhash_signature(cells)
+    if signature is None:
+        return None
+    return signature, int(cells.size)
+
+def estimated_similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.mean(sig_a == sig_b))
+
+def store_fingerprint(db: Session, user_id: int, track_id: int, signature: np.ndarray, cell_count: int, commit: bool = True):
+    db.query(db_config.TrackLshBandDB).filter(db_config.TrackLshBandDB.track_id == track_id).delete(synchronize_session=False)
+    db.merge(db_config.TrackFingerprintDB(track_id=track_id, user_id=user_id, minhash=signature.astype(np.uint32).tobytes(), cell_count=cell_count))
+    db.add_all([db_config.TrackLshBandDB(track_id=track_id, band=band, user_id=user_id, bucket=bucket)
+                for band, bucket in enumerate(lsh_buckets(signature))])
+    if commit:
+        db.commit()
+
+def load_signature(db: Session, user_id: int, track_id: int) -> Optional[np.ndarray]:
+    row = db.query(db_config.TrackFingerprintDB).filter(db_config.TrackFingerprintDB.track_id == track_id,
+                                                        db_config.TrackFingerprintDB.user_id == user_id).first()
+    return np.frombuffer(row.minhash, dtype=np.uint32) if row else None
+
+def find_similar_tracks(
+    db: Session, user_id: int, signature: np.ndarray, exclude_track_id: Optional[int] = None,
+    min_similarity: float = DEFAULT_MIN_SIMILARITY, limit: int = 10
+) -> List[Tuple[int, float]]:
+    """
+    Sucht Tracks mit ähnlicher Geometrie über den LSH-Index.
+    Rückgabe: [(track_id, geschätzte_jaccard_ähnlichkeit)], absteigend sortiert.
+    """
+    conditions = [
+        (db_config.TrackLshBandDB.band == band) & (db_config.TrackLshBandDB.bucket == bucket)
+        for band, bucket in enumerate(lsh_buckets(signature))
+    ]
+    # Tracks im Papierkorb behalten ihren Fingerprint bis zum endgültigen Löschen, zählen aber nicht als Treffer
+    candidate_rows = db.query(db_config.TrackLshBandDB.track_id) \
+        .join(db_config.TrackDB, db_config.TrackDB.id == db_config.TrackLshBandDB.track_id) \
+        .filter(db_config.TrackLshBandDB.user_id == user_id, db_config.TrackDB.deleted_at.is_(None), or_(*conditions)).distinct().all()
+    candidate_ids = [track_id for (track_id,) in candidate_rows if track_id != exclude_track_id]
+    if not candidate_ids:
+        return []
+    rows = db.query(db_config.TrackFingerprintDB.track_id, db_config.TrackFingerprintDB.minhash).filter(
+        db_config.TrackFingerprintDB.track_id.in_(candidate_ids)).all()
+    scored = [(track_id, estimated_similarity(signature, np.frombuffer(minhash, dtype=np.uint32))) for track_id, minhash in rows]
+    scored = [item for item in scored if item[1] >= min_similarity]
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:limit]
+
+def ensure_fingerprint_for_track(db: Session, user_id: int, track_id: int) -> Optional[np.ndarray]:
+    """Lädt die Signatur oder berechnet sie aus der gespeicherten GPX-Datei (für Tracks von vor der Einführung)."""
+    signature = load_signature(db, user_id, track_id)
+    if signature is not None:
+        return signature
+    stored_filename = db_config.get_gpx_storage_key(db, user_id, track_id)
+    if not stored_filename:
+        return None
+    with blob_storage.get_store().local_file(stored_filename) as gpx_file_path:
+        if gpx_file_path is None:
+            return None
+        fingerprint = compute_fingerprint(gpx_utils.get_points_from_gpx_file(str(gpx_file_path)))
+    if not fingerprint:
+        return None
+    store_fingerprint(db, user_id, track_id, *fingerprint)
+    return fingerprint[0]
+
+def similar_track_hints(db: Session, user_id: int, track_ids_with_similarity: List[Tuple[int, float]]) -> List[Dict[str, object]]:
+    tracks = {t.id: t for t in db_config.get_tracks_by_ids(db, user_id, [tid for tid, _ in track_ids_with_similarity])}
+    return [{"track_id": tid, "name": tracks[tid].name, "similarity": round(sim, 2)}
+            for tid, sim in track_ids_with_similarity if tid in tracks]
@@ -1,8 +1,26 @@
-from typing import Optional, Dict, Any, List, Tuple
-from datetime import datetime
-import gpxpy
-import gpxpy.gpx 
+from typing import Optional, Dict, Any, List, Tuple, TYPE_CHECKING
+from datetime import datetime, timezone
 import traceback 
+import numpy as np
+
+import track_analytics
+import track_formats
+
+if TYPE_CHECKING:
+    import gpxpy.gpx
+
+def _gpxpy():
+    """gpxpy erst beim ersten Parsen importieren - Prozesse ohne GPX-Zugriff (Worker-Start, CLI --help) sparen den Import."""
+    import gpxpy.gpx
+    return gpxpy
+
+def _stored_track_format(gpx_filepath_str: str) -> Optional[str]:
+    """FIT/TCX/GeoJSON-Format einer gespeicherten Datei; None für GPX oder wenn sie nicht lesbar ist (Fehler meldet dann der GPX-Pfad)."""
+    try:
+        track_format = track_formats.detect_file_format(gpx_filepath_str)
+    except OSError:
+        return None
+    return None if track_format == track_formats.FORMAT_GPX else track_format
 
 def _get_time_from_gpx_element(element: Any) -> Optional[datetime]:
     """Extrahiert und konvertiert Zeitstempel sicher."""
@@ -17,72 +35,16 @@ def parse_gpx_data_from_content(original_filename: str, file_content_bytes: byte
     Beinhaltet: track_name, distance_km, track_date (datetime), total_ascent, total_descent,
                  original_filename, points (List[List[float]]).
     Das Feld 'elevation_data' für das Chart wird separat über get_elevation_data_for_chart geholt.
+    FIT-, TCX- und GeoJSON-Inhalte werden an den ersten Bytes erkannt und über track_formats gelesen.
     """
+    track_format = track_formats.detect_format(file_content_bytes[:track_formats.SNIFF_BYTES])
+    if track_format != track_formats.FORMAT_GPX:
+        return track_formats.parse_track_content(track_format, original_filename, file_content_bytes)
+    gpxpy = _gpxpy()
     try:
         gpx_content_str = file_content_bytes.decode('utf-8', errors='replace') 
         gpx = gpxpy.parse(gpx_content_str)
-
-        if not gpx.tracks and not gpx.routes:
-            print(f"Warnung: Keine Tracks oder Routen in Datei {original_filename} gefunden.")
-            return None
-        
-        track_name = gpx.name
-        if not track_name and gpx.tracks and gpx.tracks[0].name:
-            track_name = gpx.tracks[0].name
-        if not track_name and gpx.routes and gpx.routes[0].name:
-            track_name = gpx.routes[0].name
-        if not track_name: 
-            track_name = original_filename.rsplit('.', 1)[0] if '.' in original_filename else original_filename
-        
-        distance_m = gpx.length_3d() if gpx.length_3d() is not None else (gpx.length_2d() if gpx.length_2d() is not None else 0.0)
-        distance_km = distance_m / 1000.0
-        
-        track_date_obj: Optional[datetime] = None
-        if gpx.time:
-            track_date_obj = _get_time_from_gpx_element(gpx)
-        if not track_date_obj: 
-            point_sources = gpx.tracks + gpx.routes
-            for item in point_sources:
-                if hasattr(item, 'segments'): 
-                    for segment in item.segments:
-                        if segment.points:
-                            track_date_obj = _get_time_from_gpx_element(segment.points[0])
-                            if track_date_obj: break
-                    if track_date_obj: break
-                elif hasattr(item, 'points') and item.points: 
-                    track_date_obj = _get_time_from_gpx_element(item.points[0])
-                    if track_date_obj: break
-        
-        uphill, downhill = 0.0, 0.0
-        try:
-            
-            raw_uphill, raw_downhill = gpx.get_uphill_downhill()
-            uphill = raw_uphill if raw_uphill is not None else 0.0
-            downhill = raw_downhill if raw_downhill is not None else 0.0
-        except Exception as e_ele:
-            print(f"Warnung: Konnte Anstieg/Abstieg für {original_filename} nicht berechnen: {e_ele}")
-        
-        points_list: List[List[float]] = []
-        for track in gpx.tracks:
-            for segment in track.segments:
-                for point in segment.points:
-                    points_list.append([point.latitude, point.longitude])
-        if not points_list and gpx.routes: 
-            for route in gpx.routes:
-                for point in route.points:
-                    points_list.append([point.latitude, point.longitude])
-        
-        parsed_result = {
-            "original_filename": original_filename,
-            "track_name": track_name or "Unbenannter Track",
-            "distance_km": round(distance_km, 2),
-            "track_date": track_date_obj, 
-            "total_ascent": round(uphill, 2),
-            "total_descent": round(downhill, 2),
-            "points": points_list, 
-        }
-        return parsed_result
-
+        return _build_parsed_result(original_filename, gpx)
     except gpxpy.gpx.GPXXMLSyntaxException as e_gpx_syntax:
         print(f"GPX Syntax Fehler in Datei {original_filename}: {e_gpx_syntax}")
         
@@ -92,8 +54,130 @@ def parse_gpx_data_from_content(original_filename: str, file_content_bytes: byte
         traceback.print_exc()
         return None
 
+def parse_gpx_data_from_file(original_filename: str, gpx_filepath_str: str) -> Optional[Dict[str, Any]]:
+    """
+    Wie parse_gpx_data_from_content, liest die GPX-Daten aber direkt aus einer Datei.
+    Der Inhalt wird dabei nur einmal (als dekodierter Text für gpxpy) im Speicher gehalten.
+    """
+    track_format = _stored_track_format(gpx_filepath_str)
+    if track_format:
+        with open(gpx_filepath_str, 'rb') as f:
+            return track_formats.parse_track_content(track_format, original_filename, f.read())
+    gpxpy = _gpxpy()
+    try:
+        with open(gpx_filepath_str, 'r', encoding='utf-8', errors='replace') as f:
+            gpx = gpxpy.parse(f)
+        return _build_parsed_result(original_filename, gpx)
+    except gpxpy.gpx.GPXXMLSyntaxException as e_gpx_syntax:
+        print(f"GPX Syntax Fehler in Datei {original_filename}: {e_gpx_syntax}")
+        return None
+    except Exception as e:
+        print(f"Allgemeiner Fehler beim Parsen von GPX {original_filename}: {e}")
+        traceback.print_exc()
+        return None
+
+def _build_parsed_result(original_filename: str, gpx: "gpxpy.gpx.GPX") -> Optional[Dict[str, Any]]:
+    if not gpx.tracks and not gpx.routes:
+        print(f"Warnung: Keine Tracks oder Routen in Datei {original_filename} gefunden.")
+        return None
+    
+    track_name = gpx.name
+    if not track_name and gpx.tracks and gpx.tracks[0].name:
+        track_name = gpx.tracks[0].name
+    if not track_name and gpx.routes and gpx.routes[0].name:
+        track_name = gpx.routes[0].name
+    if not track_name: 
+        track_name = original_filename.rsplit('.', 1)[0] if '.' in original_filename else original_filename
+    
+    distance_m = gpx.length_3d() if gpx.length_3d() is not None else (gpx.length_2d() if gpx.length_2d() is not None else 0.0)
+    distance_km = distance_m / 1000.0
+    
+    track_date_obj: Optional[datetime] = None
+    if gpx.time:
+        track_date_obj = _get_time_from_gpx_element(gpx)
+    if not track_date_obj: 
+        point_sources = gpx.tracks + gpx.routes
+        for item in point_sources:
+            if hasattr(item, 'segments'): 
+                for segment in item.segments:
+                    if segment.points:
+                        track_date_obj = _get_time_from_gpx_element(segment.points[0])
+                        if track_date_obj: break
+                if track_date_obj: break
+            elif hasattr(item, 'points') and item.points: 
+                track_date_obj = _get_time_from_gpx_element(item.points[0])
+                if track_date_obj: break
+    
+    uphill, downhill = 0.0, 0.0
+    try:
+        
+        raw_uphill, raw_downhill = gpx.get_uphill_downhill()
+        uphill = raw_uphill if raw_uphill is not None else 0.0
+        downhill = raw_downhill if raw_downhill is not None else 0.0
+    except Exception as e_ele:
+        print(f"Warnung: Konnte Anstieg/Abstieg für {original_filename} nicht berechnen: {e_ele}")
+    
+    point_arrays = extract_point_arrays(gpx)
+    points_list: List[List[float]] = np.column_stack((point_arrays["lat"], point_arrays["lon"])).tolist()
+    analytics: Optional[Dict[str, Any]] = None
+    try:
+        analytics = track_analytics.analyze_point_arrays(point_arrays["lat"], point_arrays["lon"], point_arrays["ele"], point_arrays["time"])
+    except Exception as e_analytics:
+        print(f"Warnung: Analyse für {original_filename} fehlgeschlagen: {e_analytics}")
+    
+    parsed_result = {
+        "original_filename": original_filename,
+        "track_name": track_name or "Unbenannter Track",
+        "distance_km": round(distance_km, 2),
+        "track_date": track_date_obj, 
+        "total_ascent": round(uphill, 2),
+        "total_descent": round(downhill, 2),
+        "points": points_list, 
+        "analytics": analytics,
+    }
+    return parsed_result
+
+def extract_point_arrays(gpx: "gpxpy.gpx.GPX") -> Dict[str, np.ndarray]:
+    """
+    Einmaliger Durchlauf über die gpxpy-Punkte (Trackpunkte, sonst Routenpunkte) in flache NumPy-Arrays:
+    lat, lon (float64), ele (float64, NaN = fehlt), time (Unix-Sekunden float64, NaN = fehlt).
+    """
+    gpx_points = [point for track in gpx.tracks for segment in track.segments for point in segment.points]
+    if not gpx_points and gpx.routes:
+        gpx_points = [point for route in gpx.routes for point in route.points]
+    nan = float("nan")
+    lat = np.fromiter((p.latitude for p in gpx_points), dtype=np.float64, count=len(gpx_points))
+    lon = np.fromiter((p.longitude for p in gpx_points), dtype=np.float64, count=len(gpx_points))
+    ele = np.fromiter((p.elevation if p.elevation is not None else nan for p in gpx_points), dtype=np.float64, count=len(gpx_points))
+    time_s = np.fromiter(
+        (p.time.replace(tzinfo=p.time.tzinfo or timezone.utc).timestamp() if p.time else nan for p in gpx_points),
+        dtype=np.float64, count=len(gpx_points))
+    return {"lat": lat, "lon": lon, "ele": ele, "time": time_s}
+
+def get_point_arrays_from_gpx_file(gpx_filepath_str: str) -> Optional[Dict[str, np.ndarray]]:
+    """Liest eine GPX-Datei (oder FIT/TCX/GeoJSON) und liefert die Punkt-Arrays (siehe extract_point_arrays) oder None bei Fehlern."""
+    track_format = _stored_track_format(gpx_filepath_str)
+    if track_format:
+        return track_formats.load_point_arrays(track_format, gpx_filepath_str)
+    gpxpy = _gpxpy()
+    try:
+        with open(gpx_filepath_str, 'r', encoding='utf-8', errors='replace') as f:
+            gpx = gpxpy.parse(f)
+        return extract_point_arrays(gpx)
+    except FileNotFoundError:
+        print(f"Fehler: GPX-Datei nicht gefunden unter {gpx_filepath_str}")
+        return None
+    except gpxpy.gpx.GPXXMLSyntaxException as e_gpx_syntax:
+        print(f"GPX Syntax Fehler beim Lesen der Punkte aus {gpx_filepath_str}: {e_gpx_syntax}")
+        return None
+
 def get_points_from_gpx_file(gpx_filepath_str: str) -> List[List[float]]:
-    """Extrahiert alle geographischen Punkte [[lat, lon], ...] aus einer GPX-Datei."""
+    """Extrahiert alle geographischen Punkte [[lat, lon], ...] aus einer GPX-Datei (oder FIT/TCX/GeoJSON)."""
+    track_format = _stored_track_format(gpx_filepath_str)
+    if track_format:
+        arrays = track_formats.load_point_arrays(track_format, gpx_filepath_str)
+        return np.column_stack((arrays["lat"], arrays["lon"])).tolist() if arrays is not None else []
+    gpxpy = _gpxpy()
     points = []
     try:
         with open(gpx_filepath_str, 'r', encoding='utf-8') as f:
@@ -160,6 +244,19 @@ def get_elevation_data_for_chart(gpx_filepath_str: str) -> Optional[Dict[str, An
     Extrahiert Höhendaten entlang der Strecke für ein Chart.
     Gibt ein Dict zurück: {"categories": [distanzen_km], "series_data": [höhen_m]}
     """
+    track_format = _stored_track_format(gpx_filepath_str)
+    if track_format:
+        arrays = track_formats.load_point_arrays(track_format, gpx_filepath_str)
+        if arrays is None or arrays["lat"].size == 0:
+            return None
+        # Wie unten: 2D-Distanz über alle Punkte, ausgegeben an den Punkten mit Höhe
+        metrics = track_analytics.cumulative_track_metrics(arrays["lat"], arrays["lon"], arrays["ele"])
+        has_ele = np.isfinite(arrays["ele"])
+        if not has_ele.any():
+            return None
+        return {"categories": np.round(metrics["cum_2d_m"][has_ele] / 1000.0, 3).tolist(),
+                "series_data": np.round(arrays["ele"][has_ele], 2).tolist()}
+    gpxpy = _gpxpy()
     categories_dist_km: List[float] = []
     series_elev_m: List[float] = []
     current_total_distance_km = 0.0
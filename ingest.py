@@ -0,0 +1,256 @@
+# projekt_gpx_viewer/ingest.py
+"""
+Streaming-Ingest für hochgeladene GPX-Dateien.
+
+Der Upload wird blockweise in eine Temp-Datei in GPX_INCOMING_DIR kopiert (mit Größenlimit und SHA-256),
+aus dieser Datei geparst und anschließend an den Blob-Speicher übergeben (lokal per atomarem Rename).
+So liegt der Dateiinhalt nie mehrfach vollständig im Speicher.
+FIT-, TCX- und GeoJSON-Dateien laufen denselben Weg (Formaterkennung in gpx_utils).
+ZIP- und .gpx.gz-Archive werden Member für Member entpackt und mit begrenzter Parallelität importiert.
+UploadSizeLimitMiddleware begrenzt die Upload-Route schon während des Empfangs, bevor Starlette den Body puffert.
+"""
+import asyncio
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import traceback
+import zipfile
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import db_config
+import gpx_utils
+import settings
+import tile_cache
+import track_formats
+import track_processing
+
+# Archive: ZIP sowie einzeln gepackte Track-Dateien (.gpx.gz, .fit.gz, ...)
+ARCHIVE_SUFFIXES = (".zip",) + tuple(f"{extension}.gz" for extension in track_formats.SUPPORTED_EXTENSIONS)
+UPLOAD_ROUTE_PREFIX = "/_nicegui/client/"  # ui.upload: /_nicegui/client/<client_id>/upload/<element_id>
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # Boundary und Teil-Köpfe zusätzlich zur Datei
+MULTIPART_HEAD_MAX_BYTES = 16 * 1024  # so weit wird nach dem Dateinamen des ersten Teils gesucht
+_MULTIPART_FILENAME = re.compile(rb'filename="([^"]*)"')
+
+class UploadTooLargeError(Exception):
+    """Der Upload überschreitet das Limit seines Typs (settings.MAX_UPLOAD_SIZE_BYTES bzw. MAX_ARCHIVE_UPLOAD_SIZE_BYTES)."""
+
+def spool_to_incoming_file(source: BinaryIO, max_bytes: int = settings.MAX_UPLOAD_SIZE_BYTES) -> Tuple[Path, str, int]:
+    """
+    Kopiert 'source' blockweise in eine Temp-Datei in GPX_INCOMING_DIR.
+    Rückgabe: (temp_pfad, content_sha256, größe_bytes). Wirft UploadTooLargeError, sobald max_bytes überschritten wird.
+    """
+    fd, temp_path_str = tempfile.mkstemp(dir=db_config.GPX_INCOMING_DIR, suffix=".part")
+    temp_path = Path(temp_path_str)
+    hasher = hashlib.sha256()
+    total_bytes = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(settings.UPLOAD_CHUNK_SIZE_BYTES)
+                if not chunk: break
+                total_bytes += len(chunk)
+                if total_bytes > max_bytes:
+                    raise UploadTooLargeError(f"Datei größer als {max_bytes // (1024 * 1024)} MB.")
+                hasher.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return temp_path, hasher.hexdigest(), total_bytes
+
+def ingest_spooled_file(user_id: int, original_filename: str, temp_path: Path, content_sha256: str) -> Optional[Dict[str, Any]]:
+    """
+    Parst eine bereits gespoolte Temp-Datei, übernimmt sie als Track und reiht die Nachbearbeitung ein (blockierend).
+    Gibt die geparsten Daten inkl. 'track_id' zurück oder None. Die Temp-Datei ist danach in jedem Fall weg.
+    """
+    try:
+        parsed_data = gpx_utils.parse_gpx_data_from_file(original_filename, str(temp_path))
+        if not parsed_data:
+            return None
+        parsed_data.pop('labels_list', None)
+        track_processing.mark_parse_time_artifacts(parsed_data)
+        db = db_config.SessionLocal()
+        try:
+            new_track_id = db_config.add_track_from_file(db, user_id, parsed_data, temp_path, content_sha256)
+            if not new_track_id:
+                return None
+            parsed_data["track_id"] = new_track_id
+            # abgeleitete Artefakte (Fingerprint, ...) laufen als Hintergrund-Jobs und verzögern den Upload nicht
+            track_processing.enqueue_track_processing(db, user_id, new_track_id)
+            tile_cache.enqueue_seed_tiles(db, user_id, new_track_id, gpx_utils.get_bounds_for_points(parsed_data.get("points") or []))
+        finally:
+            db.close()
+        return parsed_data
+    except Exception as e:
+        print(f"Fehler beim Ingest von {original_filename} für User ID {user_id}: {e}")
+        traceback.print_exc()
+        return None
+    finally:
+        temp_path.unlink(missing_ok=True)  # nach erfolgreichem Rename existiert die Temp-Datei nicht mehr
+
+def ingest_gpx_stream(user_id: int, original_filename: str, source: BinaryIO) -> Optional[Dict[str, Any]]:
+    """
+    Kompletter Upload-Pfad für eine GPX-Datei (blockierend, für run.io_bound gedacht).
+    Gibt die geparsten Daten inkl. 'track_id' zurück oder None, wenn Parsen/Speichern fehlschlägt.
+    Wirft UploadTooLargeError bei zu großen Dateien.
+    """
+    temp_path, content_sha256, _ = spool_to_incoming_file(source, max_upload_bytes_for(original_filename))
+    return ingest_spooled_file(user_id, original_filename, temp_path, content_sha256)
+
+def is_archive_filename(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+def is_supported_upload(filename: str) -> bool:
+    return is_archive_filename(filename) or track_formats.is_supported_filename(filename)
+
+def max_upload_bytes_for(filename: str) -> int:
+    """Archive dürfen bis MAX_ARCHIVE_UPLOAD_SIZE_BYTES groß sein, einzelne Track-Dateien nur bis MAX_UPLOAD_SIZE_BYTES."""
+    return settings.MAX_ARCHIVE_UPLOAD_SIZE_BYTES if is_archive_filename(filename) else settings.MAX_UPLOAD_SIZE_BYTES
+
+def check_upload_size(filename: str, source: BinaryIO):
+    """Wirft UploadTooLargeError, wenn ein bereits empfangener (seekbarer) Upload das Limit seines Typs überschreitet."""
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END) - position
+    source.seek(position)
+    limit = max_upload_bytes_for(filename)
+    if size > limit:
+        raise UploadTooLargeError(f"Datei größer als {limit // (1024 * 1024)} MB.")
+
+class _UploadBodyTooLarge(Exception):
+    pass
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI-Middleware für die Upload-Route von ui.upload: prüft Content-Length vorab und zählt die Bytes während des
+    Empfangs, damit zu große Uploads abgebrochen werden (413), bevor Starlette den Body vollständig puffert. Bis der
+    Dateiname im ersten Multipart-Kopf gelesen ist, gilt das Archiv-Limit, danach das Limit des Dateityps
+    (max_upload_bytes_for). check_upload_size prüft danach jede empfangene Datei einzeln.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(UPLOAD_ROUTE_PREFIX) \
+                or "/upload/" not in scope["path"]:
+            await self.app(scope, receive, send); return
+        limit = settings.MAX_ARCHIVE_UPLOAD_SIZE_BYTES + MULTIPART_OVERHEAD_BYTES
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, settings.MAX_ARCHIVE_UPLOAD_SIZE_BYTES); return
+        received = 0
+        head = b""
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, head, limit
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                received += len(body)
+                if head is not None and len(head) < MULTIPART_HEAD_MAX_BYTES:
+                    head += body[:MULTIPART_HEAD_MAX_BYTES]
+                    match = _MULTIPART_FILENAME.search(head)
+                    if match:
+                        filename = match.group(1).decode("utf-8", errors="replace")
+                        limit = max_upload_bytes_for(filename) + MULTIPART_OVERHEAD_BYTES
+                        head = None
+                if received > limit:
+                    raise _UploadBodyTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _UploadBodyTooLarge:
+            print(f"Upload abgebrochen: mehr als {limit // (1024 * 1024)} MB ({scope['path']}).")
+            if not response_started:
+                await self._reject(send, limit - MULTIPART_OVERHEAD_BYTES)
+
+    @staticmethod
+    async def _reject(send, limit_bytes: int):
+        body = f"Datei größer als {limit_bytes // (1024 * 1024)} MB.".encode("utf-8")
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode()),
+                                (b"connection", b"close")]})
+        await send({"type": "http.response.body", "body": body})
+
+def iter_archive_members(original_filename: str, source: BinaryIO) -> Iterator[Tuple[str, Optional[Path], str]]:
+    """
+    Entpackt ein ZIP- oder .gz-Archiv Member für Member in Temp-Dateien (blockierend).
+    Liefert (member_name, temp_pfad, content_sha256); bei einem fehlerhaften/zu großen Member ist temp_pfad None
+    und an dritter Stelle steht die Fehlermeldung. 'source' muss für ZIP-Archive seekable sein.
+    """
+    if original_filename.lower().endswith(".gz"):
+        member_name = os.path.basename(original_filename)[:-3] or "archiv.gpx"
+        try:
+            with gzip.GzipFile(fileobj=source, mode="rb") as gz_stream:
+                temp_path, content_sha256, _ = spool_to_incoming_file(gz_stream)
+            yield member_name, temp_path, content_sha256
+        except (UploadTooLargeError, OSError, EOFError) as e:
+            yield member_name, None, str(e)
+        return
+    with zipfile.ZipFile(source) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or not track_formats.is_supported_filename(info.filename):
+                continue
+            member_name = os.path.basename(info.filename)
+            if info.file_size > settings.MAX_UPLOAD_SIZE_BYTES:
+                yield member_name, None, f"Datei größer als {settings.MAX_UPLOAD_SIZE_MB} MB."
+                continue
+            try:
+                with zf.open(info) as member_stream:
+                    temp_path, content_sha256, _ = spool_to_incoming_file(member_stream)
+                yield member_name, temp_path, content_sha256
+            except (UploadTooLargeError, zipfile.BadZipFile, OSError) as e:
+                yield member_name, None, str(e)
+
+async def ingest_archive(
+    user_id: int,
+    original_filename: str,
+    source: BinaryIO,
+    on_member_done: Callable[[str, Optional[Dict[str, Any]], Optional[str]], Any],
+    concurrency: int = settings.ARCHIVE_INGEST_CONCURRENCY
+) -> List[int]:
+    """
+    Importiert alle GPX-Member eines Archivs. Entpacken und Parsen laufen in Threads, höchstens 'concurrency'
+    Member sind gleichzeitig in Arbeit (und damit als Temp-Datei auf Platte).
+    on_member_done(member_name, parsed_data_oder_None, fehlermeldung_oder_None) wird pro Member im Event-Loop aufgerufen.
+    Rückgabe: IDs der neu angelegten Tracks in Archiv-Reihenfolge.
+    """
+    check_upload_size(original_filename, source)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    members = iter_archive_members(original_filename, source)
+
+    async def process_member(member_name: str, temp_path: Path, content_sha256: str) -> Optional[int]:
+        try:
+            parsed_data = await asyncio.to_thread(ingest_spooled_file, user_id, member_name, temp_path, content_sha256)
+        finally:
+            semaphore.release()
+        on_member_done(member_name, parsed_data, None if parsed_data else "Konnte GPX-Daten nicht verarbeiten.")
+        return parsed_data["track_id"] if parsed_data else None
+
+    tasks: List[asyncio.Task] = []
+    try:
+        while True:
+            await semaphore.acquire()
+            item = await asyncio.to_thread(next, members, None)
+            if item is None:
+                semaphore.release()
+                break
+            member_name, temp_path, sha_or_error = item
+            if temp_path is None:
+                semaphore.release()
+                on_member_done(member_name, None, sha_or_error)
+                continue
+            tasks.append(asyncio.create_task(process_member(member_name, temp_path, sha_or_error)))
+    finally:
+        track_ids = await asyncio.gather(*tasks)
+    return [track_id for track_id in track_ids if track_id]
@@ -0,0 +1,199 @@
+# projekt_gpx_viewer/job_queue.py
+"""
+Prozessinterne Job-Queue auf Basis der Tabelle 'jobs' (SQLite).
+
+Jobs werden mit enqueue_job angelegt und von Worker-Tasks im Event-Loop abgearbeitet; die eigentlichen
+Handler laufen blockierend in Threads. Fehlgeschlagene Jobs werden mit exponentiellem Backoff bis
+max_attempts wiederholt. Da der Zustand in der DB liegt, überleben offene Jobs einen Neustart
+(beim Start werden 'running'-Jobs eines abgebrochenen Prozesses wieder auf 'pending' gesetzt; bei mehreren
+Worker-Prozessen übernimmt das serve.py einmalig vor deren Start).
+Das Beanspruchen eines Jobs ist ein bedingtes UPDATE und damit auch bei mehreren Prozessen eindeutig.
+
+UI-Clients können sich per subscribe(user_id, callback) über fertige/fehlgeschlagene Jobs informieren lassen.
+"""
+import asyncio
+import json
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+import db_config
+
+JobHandler = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+JobListener = Callable[[Dict[str, Any]], Any]
+
+RETRY_BASE_DELAY_S = 5.0
+IDLE_POLL_INTERVAL_S = 2.0
+FINISHED_JOB_RETENTION_DAYS = 7
+
+_handlers: Dict[str, JobHandler] = {}
+_listeners: Dict[int, List[JobListener]] = {}
+_worker_tasks: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def register_job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Decorator: registriert einen blockierenden Handler handler(job_dict) -> optionales Ergebnis-Dict."""
+    def decorator(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+    return decorator
+
+def enqueue_job(
+    db: Session, kind: str, payload: Optional[Dict[str, Any]] = None, user_id: Optional[int] = None,
+    track_id: Optional[int] = None, max_attempts: int = 3, commit: bool = True
+) -> db_config.JobDB:
+    job = db_config.JobDB(kind=kind, payload=json.dumps(payload or {}), user_id=user_id, track_id=track_id,
+                          status="pending", max_attempts=max_attempts, run_after=datetime.utcnow())
+    db.add(job)
+    if commit:
+        db.commit()
+        notify_new_jobs()
+    return job
+
+def notify_new_jobs():
+    """Weckt wartende Worker auf; darf aus beliebigen Threads aufgerufen werden."""
+    if _loop and _wakeup and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+def get_job_status(db: Session, job_id: int) -> Optional[Dict[str, Any]]:
+    job = db.query(db_config.JobDB).filter(db_config.JobDB.id == job_id).first()
+    return _job_to_dict(job) if job else None
+
+def subscribe(user_id: int, listener: JobListener) -> Callable[[], None]:
+    """Registriert einen Listener für Job-Ereignisse eines Users. Rückgabe: Funktion zum Abmelden."""
+    _listeners.setdefault(user_id, []).append(listener)
+    def unsubscribe():
+        listeners = _listeners.get(user_id, [])
+        if listener in listeners: listeners.remove(listener)
+        if not listeners: _listeners.pop(user_id, None)
+    return unsubscribe
+
+def _job_to_dict(job: db_config.JobDB) -> Dict[str, Any]:
+    return {
+        "id": job.id, "kind": job.kind, "payload": json.loads(job.payload or "{}"), "user_id": job.user_id,
+        "track_id": job.track_id, "status": job.status, "attempts": job.attempts, "last_error": job.last_error,
+        "result": json.loads(job.result) if job.result else None,
+    }
+
+def _claim_next_job() -> Optional[Dict[str, Any]]:
+    db = db_config.SessionLocal()
+    try:
+        now = datetime.utcnow()
+        for _ in range(5):  # bei Konkurrenz durch andere Worker/Prozesse erneut versuchen
+            candidate = db.query(db_config.JobDB.id).filter(
+                db_config.JobDB.status == "pending", db_config.JobDB.run_after <= now
+            ).order_by(db_config.JobDB.id).first()
+            if not candidate:
+                return None
+            claimed = db.query(db_config.JobDB).filter(
+                db_config.JobDB.id == candidate.id, db_config.JobDB.status == "pending"
+            ).update({"status": "running", "attempts": db_config.JobDB.attempts + 1, "updated_at": now}, synchronize_session=False)
+            db.commit()
+            if claimed == 1:
+                job = db.query(db_config.JobDB).filter(db_config.JobDB.id == candidate.id).first()
+                return _job_to_dict(job)
+        return None
+    finally:
+        db.close()
+
+def _finish_job(job_id: int, result: Optional[Dict[str, Any]], error: Optional[str]) -> Optional[Dict[str, Any]]:
+    db = db_config.SessionLocal()
+    try:
+        job = db.query(db_config.JobDB).filter(db_config.JobDB.id == job_id).first()
+        if not job:
+            return None  # Track (und damit der Job per CASCADE) wurde zwischenzeitlich gelöscht
+        if error is None:
+            job.status = "done"
+            job.result = json.dumps(result) if result else None
+            job.last_error = None
+        elif job.attempts < job.max_attempts:
+            job.status = "pending"
+            job.last_error = error
+            job.run_after = datetime.utcnow() + timedelta(seconds=RETRY_BASE_DELAY_S * 2 ** (job.attempts - 1))
+        else:
+            job.status = "failed"
+            job.last_error = error
+        db.commit()
+        return _job_to_dict(job)
+    finally:
+        db.close()
+
+def _dispatch_event(job: Dict[str, Any]):
+    if job["status"] == "pending" or not job.get("user_id"):
+        return
+    for listener in list(_listeners.get(job["user_id"], [])):
+        try:
+            result = listener(job)
+            if asyncio.iscoroutine(result):
+                asyncio.create_task(result)
+        except Exception as e:
+            print(f"Fehler in Job-Listener für User ID {job['user_id']}: {e}")
+            traceback.print_exc()
+
+async def _worker_loop(worker_number: int):
+    while True:
+        try:
+            job = await asyncio.to_thread(_claim_next_job)
+            if not job:
+                _wakeup.clear()
+                try: await asyncio.wait_for(_wakeup.wait(), timeout=IDLE_POLL_INTERVAL_S)
+                except asyncio.TimeoutError: pass
+                continue
+            handler = _handlers.get(job["kind"])
+            result, error = None, None
+            if not handler:
+                error = f"Kein Handler für Job-Typ '{job['kind']}' registriert."
+            else:
+                try:
+                    result = await asyncio.to_thread(handler, job)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    print(f"Job {job['id']} ({job['kind']}) fehlgeschlagen (Versuch {job['attempts']}): {error}")
+                    traceback.print_exc()
+            finished = await asyncio.to_thread(_finish_job, job["id"], result, error)
+            if finished:
+                _dispatch_event(finished)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Job-Worker {worker_number}: unerwarteter Fehler: {e}")
+            traceback.print_exc()
+            await asyncio.sleep(IDLE_POLL_INTERVAL_S)
+
+def recover_and_prune():
+    """Setzt 'running'-Jobs abgebrochener Prozesse zurück und löscht alte Jobs. Nur aufrufen, solange kein anderer Prozess Jobs abarbeitet."""
+    db = db_config.SessionLocal()
+    try:
+        recovered = db.query(db_config.JobDB).filter(db_config.JobDB.status == "running").update(
+            {"status": "pending", "run_after": datetime.utcnow()}, synchronize_session=False)
+        pruned = db.query(db_config.JobDB).filter(
+            db_config.JobDB.status.in_(["done", "failed"]),
+            db_config.JobDB.updated_at < datetime.utcnow() - timedelta(days=FINISHED_JOB_RETENTION_DAYS)
+        ).delete(synchronize_session=False)
+        db.commit()
+        if recovered or pruned:
+            print(f"Job-Queue: {recovered} unterbrochene Jobs wieder eingereiht, {pruned} alte Jobs entfernt.")
+    finally:
+        db.close()
+
+async def start_workers(num_workers: int = 2, recover: bool = True):
+    """Startet die Worker-Tasks im laufenden Event-Loop (für app.on_startup)."""
+    global _wakeup, _loop
+    if _worker_tasks:
+        return
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    if recover:
+        await asyncio.to_thread(recover_and_prune)
+    for worker_number in range(max(1, num_workers)):
+        _worker_tasks.append(asyncio.create_task(_worker_loop(worker_number)))
+    print(f"Job-Queue: {len(_worker_tasks)} Worker gestartet.")
+
+async def stop_workers():
+    for task in _worker_tasks:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
@@ -1,19 +1,41 @@
-from nicegui import ui, app, Client
+from nicegui import ui, app, Client, run
 from datetime import datetime
 import json
 from typing import List, Dict, Any, Optional, Tuple, Set
 import asyncio
 import traceback
+import numpy as np
 from pathlib import Path
 from functools import wraps
 from types import SimpleNamespace
+from fastapi import Request
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
 
 import db_config
+import blob_storage
 import gpx_utils
 import design
+import ingest
+import settings
+import export
+import fingerprint
+import job_queue
+import track_processing
+import session_store
+import migrations
+import tile_cache
+import refresh_scheduler
+import elevation_profiles
+import point_store
+import track_editing
+import file_gc
+import thumbnails
+import start_clusters
 
 ui.add_head_html('<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" integrity="sha256-p4NxAoJBhIIN+hmNHrzRCf9tD/miZyoHS5obTRR9BMY=" crossorigin=""/>')
 dynamic_header_renderer = design.apply_design_and_get_header()
+app.add_static_files('/static', str(settings.BASE_DIR / 'static'))
+app.add_middleware(ingest.UploadSizeLimitMiddleware)  # Größenlimit schon beim Empfang, nicht erst nach dem Puffern
 
 def get_current_user_id() -> Optional[int]:
     return app.storage.user.get('authenticated_user_id')
@@ -33,6 +55,7 @@ async def init_user_specific_app_storage():
     app.storage.user.setdefault('map_needs_initial_fit', True)
     app.storage.user.setdefault('filter_date_from_str', None)
     app.storage.user.setdefault('filter_date_to_str', None)
+    app.storage.user.setdefault('filter_search_str', None)
     app.storage.user.setdefault('splitter_value', 50)
     app.storage.user.pop('filter_labels_list', None)
     print(f"INFO: User storage for user {user_id} after init: {app.storage.user}")
@@ -40,6 +63,7 @@ async def init_user_specific_app_storage():
 
 @ui.page('/login')
 async def login_page(client: Client):
+    await session_store.refresh_user_storage()
     if get_current_user_id(): ui.navigate.to('/'); return
     s = SimpleNamespace(); s.username_input = None; s.password_input = None
     async def handle_login_attempt():
@@ -47,7 +71,7 @@ async def login_page(client: Client):
         db = db_config.SessionLocal()
         try:
             user = db_config.get_user_by_username(db, s.username_input.value)
-            if user and db_config.verify_password(s.password_input.value, user.hashed_password):
+            if await db_config.run_auth_task(db_config.verify_password_and_upgrade, db, user, s.password_input.value or ""):
                 app.storage.user['authenticated_user_id'] = user.id
                 app.storage.user['authenticated_username'] = user.username
                 await init_user_specific_app_storage()
@@ -76,6 +100,7 @@ async def login_page(client: Client):
 
 @ui.page('/verify_2fa_email')
 async def verify_2fa_email_page(client: Client):
+    await session_store.refresh_user_storage()
     pending_user_id = app.storage.user.get('pending_2fa_user_id_for_email')
     if not pending_user_id:
         ui.notify("Kein aktiver 2FA-Vorgang.", type='warning'); ui.navigate.to('/login'); return
@@ -104,6 +129,7 @@ async def verify_2fa_email_page(client: Client):
 
 @ui.page('/register')
 async def register_page(client: Client):
+    await session_store.refresh_user_storage()
     if get_current_user_id(): ui.navigate.to('/'); return
     s = SimpleNamespace(); s.reg_username_input = None; s.reg_email_input = None
     s.reg_password_input = None; s.reg_password_confirm_input = None
@@ -118,7 +144,7 @@ async def register_page(client: Client):
         db = db_config.SessionLocal()
         try:
             if db_config.get_user_by_username(db, s.reg_username_input.value): ui.notify('Benutzername bereits vergeben.', type='negative'); return
-            db_config.create_user(db, s.reg_username_input.value, s.reg_password_input.value, s.reg_email_input.value)
+            await db_config.run_auth_task(db_config.create_user, db, s.reg_username_input.value, s.reg_password_input.value, s.reg_email_input.value)
             ui.notify('Registrierung erfolgreich! Login möglich.', type='positive'); ui.navigate.to('/login')
         except ValueError as ve: ui.notify(str(ve), type='negative')
         except Exception as e: print(f"Registrierungsfehler: {e}"); traceback.print_exc(); ui.notify('Registrierung fehlgeschlagen.', type='negative')
@@ -135,6 +161,7 @@ async def register_page(client: Client):
 
 @ui.page('/')
 async def main_page(client: Client):
+    await session_store.refresh_user_storage()
     user_id = get_current_user_id()
     if not user_id:
         ui.navigate.to('/login')
@@ -145,6 +172,8 @@ async def main_page(client: Client):
         await init_user_specific_app_storage()
 
     dynamic_header_renderer()
+    ui.add_head_html('<script src="/static/track_layers.js"></script>')
+    ui.add_head_html('<script src="/static/start_clusters.js"></script>')
 
     with ui.column().classes('w-full p-2 md:p-4 items-center gap-4'):
         with ui.row().classes('w-full max-w-7xl justify-center items-stretch gap-4'):
@@ -153,10 +182,13 @@ async def main_page(client: Client):
                     with ui.card_section(): ui.label('GPX Hochladen').classes('text-lg font-semibold')
                     ui.separator()
                     with ui.card_section():
-                        ui.upload(label='GPX-Datei(en) auswählen',
+                        ui.upload(label='GPX/FIT/TCX/GeoJSON-Datei(en) oder ZIP auswählen',
                                    on_upload=lambda e: handle_gpx_upload(user_id, e),
+                                   on_rejected=lambda: ui.notify(f"Datei abgelehnt (max. {settings.MAX_ARCHIVE_UPLOAD_SIZE_MB} MB).", type='warning'),
+                                   # nur Vorfilter im Browser (Archiv-Limit); das Limit je Dateityp setzen UploadSizeLimitMiddleware und handle_gpx_upload durch
+                                   max_file_size=max(settings.MAX_UPLOAD_SIZE_BYTES, settings.MAX_ARCHIVE_UPLOAD_SIZE_BYTES),
                                    multiple=True, auto_upload=True) \
-                            .props('accept=".gpx" flat bordered').classes('w-full')
+                            .props('accept=".gpx,.fit,.tcx,.geojson,.json,.zip,.gz" flat bordered').classes('w-full')
 
             with ui.column().classes('col-12 col-md-8'):
                 with ui.card().classes('w-full shadow-lg h-full'):
@@ -185,9 +217,18 @@ async def main_page(client: Client):
                 with ui.card().classes('w-full h-full p-0 m-0 overflow-hidden'):
                     map_view_ui = ui.leaflet(center=(50.0, 10.0), zoom=5, draw_control=False) \
                                     .classes('w-full h-full min-h-[250px]')
+                    # Standard-Kachellayer (direkt OSM) durch den eigenen Kachel-Proxy ersetzen - einmal pro Seite
+                    for default_layer in list(map_view_ui.layers): map_view_ui.remove_layer(default_layer)
+                    map_view_ui.tile_layer(url_template='/tiles/{z}/{x}/{y}.png',
+                                           options={'attribution': '© OpenStreetMap contributors', 'maxZoom': settings.TILE_MAX_ZOOM})
                     with ui.element('div').style('position: absolute; bottom: 10px; left: 10px; background-color: rgba(255,255,255,0.8); padding: 5px; border-radius: 3px; z-index: 1000; box-shadow: 0 0 5px rgba(0,0,0,0.3); font-size: 0.8rem;'):
                         stats_total_distance_ui = ui.label("Gesamtstrecke: 0.00 km")
                         stats_total_ascent_ui = ui.label("Gesamtanstieg: 0 m")
+                    with ui.element('div').style('position: absolute; top: 10px; right: 10px; background-color: rgba(255,255,255,0.8); padding: 0 6px; border-radius: 3px; z-index: 1000; box-shadow: 0 0 5px rgba(0,0,0,0.3);'):
+                        ui.switch('Übersicht', value=False,
+                                  on_change=lambda e: map_view_ui.client.run_javascript(
+                                      f"gpxStartClusters.enable({map_view_ui.id}, {json.dumps(bool(e.value))})")) \
+                            .props('dense').tooltip('Startpunkte aller Tracks gruppiert anzeigen')
 
             with main_splitter.after, ui.column().classes('w-full h-full overflow-auto'):
                 with ui.card().classes('w-full h-full flex flex-col'):
@@ -199,12 +240,35 @@ async def main_page(client: Client):
                                                                  color='negative') \
                                 .props('flat dense round').tooltip('Ausgewählte Tracks löschen')
                             delete_selected_button_ui.bind_enabled_from(app.storage.user, 'selected_track_ids_list', backward=bool)
+                            export_selected_button_ui = ui.button(icon='download', on_click=lambda: open_export_dialog(user_id)) \
+                                .props('flat dense round').tooltip('Ausgewählte Tracks exportieren')
+                            export_selected_button_ui.bind_enabled_from(app.storage.user, 'selected_track_ids_list', backward=bool)
+                            similar_button_ui = ui.button(icon='difference', on_click=lambda: select_similar_tracks(user_id)) \
+                                .props('flat dense round').tooltip('Ähnliche Routen zum ausgewählten Track auswählen')
+                            similar_button_ui.bind_enabled_from(app.storage.user, 'selected_track_ids_list', backward=lambda ids: len(ids or []) == 1)
+                            edit_button_ui = ui.button(icon='content_cut', on_click=lambda: open_edit_track_dialog(user_id)) \
+                                .props('flat dense round').tooltip('Ausgewählten Track zuschneiden oder teilen')
+                            edit_button_ui.bind_enabled_from(app.storage.user, 'selected_track_ids_list', backward=lambda ids: len(ids or []) == 1)
+                            merge_button_ui = ui.button(icon='call_merge', on_click=lambda: confirm_merge_selected_tracks(user_id)) \
+                                .props('flat dense round').tooltip('Ausgewählte Tracks zusammenführen')
+                            merge_button_ui.bind_enabled_from(app.storage.user, 'selected_track_ids_list', backward=lambda ids: len(ids or []) >= 2)
+                        with ui.row().classes('w-full items-center justify-between bg-grey-2 rounded px-2') as undo_delete_row_ui:
+                            undo_delete_label_ui = ui.label().classes('text-sm')
+                            ui.button('Rückgängig', icon='undo', on_click=lambda: undo_last_delete(user_id)).props('flat dense color=primary')
+                        undo_delete_row_ui.set_visibility(False)
+                        ui.input(placeholder='Suche in Name, Dateiname, Labels',
+                                 value=app.storage.user.get('filter_search_str') or '',
+                                 on_change=lambda e: update_filter_settings(user_id, 'search', e.value)) \
+                            .props('dense outlined clearable debounce=300').classes('w-full mt-1') \
+                            .add_slot('prepend', '<q-icon name="search" />')
 
                     columns_def = [
+                        {'name': 'thumbnail', 'label': '', 'field': 'thumbnail_url', 'align': 'center', 'style': 'width: 1%; padding: 2px 4px;'},
                         {'name': 'id', 'label': 'ID', 'field': 'id', 'sortable': True, 'align': 'left', 'style': 'width: 10%; font-size: 0.75rem; padding: 2px 4px;'},
                         {'name': 'name', 'label': 'Name', 'field': 'name', 'sortable': True, 'align': 'left', 'style': 'min-width: 120px; font-size: 0.8rem; padding: 2px 4px; white-space: normal;'},
                         {'name': 'distance', 'label': 'Distanz', 'field': 'distance_str', 'sortable': True, 'align': 'right', 'style': 'font-size: 0.8rem; padding: 2px 4px;'},
                         {'name': 'date', 'label': 'Datum', 'field': 'track_date_str', 'sortable': True, 'align': 'left', 'style': 'font-size: 0.8rem; padding: 2px 4px;'},
+                        {'name': 'moving_time', 'label': 'Zeit', 'field': 'moving_time_str', 'sortable': True, 'align': 'right', 'style': 'font-size: 0.8rem; padding: 2px 4px;'},
                     ]
                     
                     with ui.element('div').classes('w-full flex-grow overflow-auto relative'):
@@ -214,6 +278,10 @@ async def main_page(client: Client):
                                                on_select=lambda e: handle_table_selection_change(user_id, e),
                                                pagination={'rowsPerPage': 15, 'sortBy': 'track_date', 'descending': True}) \
                             .classes('min-w-full h-full').props('flat dense bordered virtual-scroll')
+                        # Vorschaubilder statt Geometrie: je ein gecachtes SVG pro Zeile, erst beim Einblenden geladen
+                        track_table_ui.add_slot('body-cell-thumbnail', f'''
+                            <q-td :props="props"><img :src="props.value" loading="lazy" alt=""
+                                width="{settings.THUMBNAIL_SIZE_PX}" height="{settings.THUMBNAIL_SIZE_PX}" style="display: block;"/></q-td>''')
 
                     ui.separator().classes('my-1 md:my-2')
                     elevation_chart_container_ui = ui.column().classes('w-full min-h-[100px] h-32 md:min-h-[150px] md:h-40')
@@ -223,6 +291,28 @@ async def main_page(client: Client):
     app.storage.client['ui_stats_dist'] = stats_total_distance_ui
     app.storage.client['ui_stats_asc'] = stats_total_ascent_ui
     app.storage.client['ui_elevation_chart_container'] = elevation_chart_container_ui
+    app.storage.client['ui_undo_delete_row'] = undo_delete_row_ui
+    app.storage.client['ui_undo_delete_label'] = undo_delete_label_ui
+
+    def on_job_event(job: Dict[str, Any]):
+        if job['kind'] == tile_cache.JOB_KIND_SEED_TILES: return  # Vorladen läuft still im Hintergrund
+        with client:
+            if job['status'] == 'failed':
+                processors = ", ".join(job['payload'].get('processors') or [job['payload'].get('processor', job['kind'])])
+                ui.notify(f"Nachbearbeitung '{processors}' für Track {job['track_id']} fehlgeschlagen.", type='warning')
+            elif job['result']:
+                notify_similar_routes(job['result'].get('similar_tracks'))
+    client.on_disconnect(job_queue.subscribe(user_id, on_job_event))
+
+    ui.on('start_clusters_viewport', lambda e: send_start_clusters(user_id, e.args))
+    ui.on('start_clusters_select', lambda e: select_start_cluster_tracks(user_id, e.args))
+
+    async def run_ui_refresh(level: int):
+        with client:
+            if level >= refresh_scheduler.REFRESH_FULL: await load_tracks_from_db_and_refresh_ui(user_id)
+            else: await update_map_and_related_stats(user_id, is_initial_map_fit=False)
+    ui_refresh = app.storage.client['refresh_scheduler'] = refresh_scheduler.RefreshScheduler(run_ui_refresh, settings.UI_REFRESH_DEBOUNCE_S)
+    client.on_disconnect(ui_refresh.cancel)
 
     async def do_initial_load():
         print(f"DEBUG: main_page - User {user_id} - Starting initial data load.")
@@ -240,28 +330,69 @@ def format_track_for_display(track_db_obj: db_config.TrackDB) -> Dict[str, Any]:
         'labels_list': labels_list_internal,
         'labels_str': ", ".join(labels_list_internal) if labels_list_internal else "",
         'stored_filename': track_db_obj.stored_filename, 'total_ascent': track_db_obj.gpx_parsed_total_ascent,
+        'moving_time_s': track_db_obj.moving_time_s, 'avg_moving_speed_kmh': track_db_obj.avg_moving_speed_kmh,
+        'moving_time_str': format_duration(track_db_obj.moving_time_s),
+        'thumbnail_url': thumbnails.thumbnail_url(track_db_obj),
     }
 
+def format_duration(seconds: Optional[float]) -> str:
+    if not seconds: return "–"
+    minutes_total = int(round(seconds / 60))
+    return f"{minutes_total // 60}:{minutes_total % 60:02d} h"
+
 async def handle_gpx_upload(user_id: int, e: Any):
     user_id_check = get_current_user_id()
     if not user_id_check or user_id_check != user_id:
         ui.notify("Benutzer-ID stimmt nicht überein oder nicht eingeloggt.", type='error'); return
 
-    filename = e.name; content_bytes = e.content.read()
-    parsed_data = gpx_utils.parse_gpx_data_from_content(filename, content_bytes)
-    if not parsed_data: ui.notify(f"Konnte GPX-Daten aus {filename} nicht verarbeiten.", type='negative'); return
-    db = db_config.SessionLocal()
+    filename = e.name
+    if not ingest.is_supported_upload(filename):
+        ui.notify(f"{filename} abgelehnt: Dateityp wird nicht unterstützt.", type='warning'); return
     try:
-        if 'labels_list' in parsed_data: parsed_data.pop('labels_list')
-        new_track_id = db_config.add_track(db=db, user_id=user_id, parsed_gpx_data=parsed_data, gpx_file_content_bytes=content_bytes)
-        if new_track_id:
-            ui.notify(f"Track '{parsed_data.get('track_name', filename)}' hochgeladen.", type='positive')
-            app.storage.user['selected_track_ids_list'] = [new_track_id]; app.storage.user['map_needs_initial_fit'] = True
-            await load_tracks_from_db_and_refresh_ui(user_id)
-        else: ui.notify("Fehler beim Speichern des Tracks.", type='negative')
+        ingest.check_upload_size(filename, e.content)  # ui.upload kennt nur ein Limit (das für Archive)
+    except ingest.UploadTooLargeError as ex_size:
+        ui.notify(f"{filename} abgelehnt: {ex_size}", type='warning'); return
+    if ingest.is_archive_filename(filename):
+        await handle_archive_upload(user_id, filename, e.content); return
+    try:
+        parsed_data = await run.io_bound(ingest.ingest_gpx_stream, user_id, filename, e.content)
+        if not parsed_data: ui.notify(f"Konnte GPX-Daten aus {filename} nicht verarbeiten.", type='negative'); return
+        ui.notify(f"Track '{parsed_data.get('track_name', filename)}' hochgeladen.", type='positive')
+        app.storage.user['selected_track_ids_list'] = [parsed_data['track_id']]; app.storage.user['map_needs_initial_fit'] = True
+        request_ui_refresh(delay_s=0)
+    except ingest.UploadTooLargeError as ex_size:
+        ui.notify(f"{filename} abgelehnt: {ex_size}", type='warning')
     except Exception as ex_upload:
         traceback.print_exc(); ui.notify(f"Schwerer Fehler beim Upload: {ex_upload}", type='negative', multi_line=True)
-    finally: db.close()
+
+def notify_similar_routes(similar_tracks: Optional[List[Dict[str, Any]]]):
+    if not similar_tracks: return
+    best = similar_tracks[0]
+    more = f" (+{len(similar_tracks) - 1} weitere)" if len(similar_tracks) > 1 else ""
+    ui.notify(f"Diese Route hast du vermutlich schon: '{best['name']}' ({best['similarity'] * 100:.0f} % Übereinstimmung){more}.", type='info', multi_line=True)
+
+async def handle_archive_upload(user_id: int, filename: str, content: Any):
+    progress = ui.notification(f"{filename}: entpacke...", type='ongoing', spinner=True, timeout=None, multi_line=True)
+    counts = SimpleNamespace(done=0, failed=0)
+
+    def on_member_done(member_name: str, parsed_data: Optional[Dict[str, Any]], error: Optional[str]):
+        if parsed_data: counts.done += 1
+        else:
+            counts.failed += 1
+            print(f"Archiv {filename}: {member_name} übersprungen: {error}")
+        progress.message = f"{filename}: {counts.done + counts.failed} verarbeitet ({counts.failed} fehlerhaft) - zuletzt {member_name}"
+
+    try:
+        new_track_ids = await ingest.ingest_archive(user_id, filename, content, on_member_done)
+    except Exception as ex_archive:
+        traceback.print_exc(); progress.dismiss()
+        ui.notify(f"Archiv {filename} konnte nicht gelesen werden: {ex_archive}", type='negative', multi_line=True); return
+    progress.dismiss()
+    if not new_track_ids:
+        ui.notify(f"Keine GPX-Tracks aus {filename} importiert ({counts.failed} fehlerhaft).", type='warning'); return
+    ui.notify(f"{len(new_track_ids)} Tracks aus {filename} importiert" + (f", {counts.failed} fehlerhaft." if counts.failed else "."), type='positive')
+    app.storage.user['selected_track_ids_list'] = new_track_ids; app.storage.user['map_needs_initial_fit'] = True
+    request_ui_refresh(delay_s=0)
 
 async def load_tracks_from_db_and_refresh_ui(user_id: int, is_initial_load: bool = False):
     current_user_id_check = get_current_user_id()
@@ -273,7 +404,8 @@ async def load_tracks_from_db_and_refresh_ui(user_id: int, is_initial_load: bool
     db = db_config.SessionLocal()
     try:
         date_from = app.storage.user.get('filter_date_from_str'); date_to = app.storage.user.get('filter_date_to_str')
-        tracks_from_db = db_config.get_filtered_tracks(db, user_id, date_from, date_to, None)
+        search_text = app.storage.user.get('filter_search_str')
+        tracks_from_db = db_config.get_filtered_tracks(db, user_id, date_from, date_to, None, search_text=search_text)
         formatted_tracks = [format_track_for_display(t) for t in tracks_from_db]
         app.storage.user['tracks_in_table_data'] = formatted_tracks
         print(f"DEBUG: Fetched {len(formatted_tracks)} tracks for user {user_id}. Data in user_storage: {app.storage.user['tracks_in_table_data']}")
@@ -297,11 +429,18 @@ async def load_tracks_from_db_and_refresh_ui(user_id: int, is_initial_load: bool
         traceback.print_exc(); ui.notify(f"Fehler beim Laden/Aktualisieren der Tracks: {e_load}", type='negative')
     finally: db.close()
 
+def request_ui_refresh(level: int = refresh_scheduler.REFRESH_FULL, delay_s: Optional[float] = None):
+    """Refresh über den Scheduler der Seite anfordern (entprellt, ersetzt überholte Refreshs, siehe refresh_scheduler.py)."""
+    scheduler: Optional[refresh_scheduler.RefreshScheduler] = app.storage.client.get('refresh_scheduler')
+    if scheduler: scheduler.request(level, delay_s)
+    else: print("WARN: request_ui_refresh - kein RefreshScheduler für diesen Client.")
+
 async def update_filter_settings(user_id: int, filter_type: str, value: Any):
     if filter_type == 'date_from': app.storage.user['filter_date_from_str'] = value
     elif filter_type == 'date_to': app.storage.user['filter_date_to_str'] = value
+    elif filter_type == 'search': app.storage.user['filter_search_str'] = (value or '').strip() or None
     app.storage.user['map_needs_initial_fit'] = True
-    await load_tracks_from_db_and_refresh_ui(user_id)
+    request_ui_refresh()
 
 async def reset_date_filters(user_id: int, date_from_ui: ui.date, date_to_ui: ui.date):
     app.storage.user['filter_date_from_str'] = None
@@ -309,12 +448,12 @@ async def reset_date_filters(user_id: int, date_from_ui: ui.date, date_to_ui: ui
     date_from_ui.set_value(None)
     date_to_ui.set_value(None)
     app.storage.user['map_needs_initial_fit'] = True
-    await load_tracks_from_db_and_refresh_ui(user_id)
+    request_ui_refresh()
 
 async def handle_table_selection_change(user_id: int, e: Any):
     selected_ids_set = {item['id'] for item in e.selection} if e.selection else set()
     app.storage.user['selected_track_ids_list'] = list(selected_ids_set)
-    await update_map_and_related_stats(user_id, is_initial_map_fit=False)
+    request_ui_refresh(refresh_scheduler.REFRESH_MAP)
 
 async def update_map_and_related_stats(user_id: int, is_initial_map_fit: bool = False):
     map_view = app.storage.client.get('ui_map_view'); stats_dist = app.storage.client.get('ui_stats_dist')
@@ -331,87 +470,212 @@ async def update_map_and_related_stats(user_id: int, is_initial_map_fit: bool =
 
     selected_ids_list = app.storage.user.get('selected_track_ids_list', [])
     selected_ids_set: Set[int] = set(selected_ids_list)
-
-    map_view.clear_layers()
-    map_view.tile_layer(url_template='https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', options={'attribution': '© OpenStreetMap contributors'})
-    if chart_container: chart_container.clear()
-
-    if not selected_ids_set:
-        stats_dist.set_text("Gesamtstrecke: 0.00 km")
-        stats_asc.set_text("Gesamtanstieg: 0 m")
-        if is_initial_map_fit:
-             map_view.set_center((50.0, 10.0)); map_view.set_zoom(5)
-        return
-
     tracks_in_table_data = app.storage.user.get('tracks_in_table_data', [])
     selected_track_display_data = [t for t in tracks_in_table_data if t['id'] in selected_ids_set]
 
-    if not selected_track_display_data and selected_ids_set:
+    if selected_ids_set and not selected_track_display_data:
         print(f"WARN: Tracks selected {selected_ids_set} but no matching data found in user_storage. Potentially stale selection.")
         stats_dist.set_text("Gesamtstrecke: 0.00 km (Datenproblem?)")
         stats_asc.set_text("Gesamtanstieg: 0 m (Datenproblem?)")
-        if is_initial_map_fit:
-             map_view.set_center((50.0, 10.0)); map_view.set_zoom(5)
-        return
+    else:
+        total_dist_km = sum(t.get('distance_km', 0.0) or 0 for t in selected_track_display_data)
+        total_asc_m = sum(t.get('total_ascent', 0.0) or 0 for t in selected_track_display_data)
+        stats_dist.set_text(f"Gesamtstrecke: {total_dist_km:.2f} km")
+        stats_asc.set_text(f"Gesamtanstieg: {total_asc_m:.0f} m")
+
+    # Geometrie liegt im Browser (static/track_layers.js); nachgeladen werden nur Tracks, die dieser Client noch nicht kennt
+    track_ids_to_show = [t['id'] for t in selected_track_display_data]
+    await send_missing_track_layers(user_id, map_view, track_ids_to_show)
+    default_view = {'center': [50.0, 10.0], 'zoom': 5} if is_initial_map_fit else None
+    map_view.client.run_javascript(
+        f"gpxTrackLayers.show({map_view.id}, {json.dumps(track_ids_to_show)}, true, {json.dumps(default_view)})")
+
+    if selected_track_display_data and chart_container:
+        await update_elevation_chart(user_id, chart_container, selected_track_display_data)
+    elif chart_container: chart_container.clear()
 
-    total_dist_km = 0.0; total_asc_m = 0.0; all_track_points_for_bounds = []
+async def update_elevation_chart(user_id: int, chart_container: ui.column, selected_track_display_data: List[Dict[str, Any]]):
+    """Höhenprofil eines Tracks bzw. Überlagerung von bis zu ELEVATION_CHART_MAX_TRACKS Tracks auf gemeinsamer Distanzachse."""
+    tracks_for_chart = selected_track_display_data[:settings.ELEVATION_CHART_MAX_TRACKS]
+    try:
+        profiles = await get_elevation_profiles_cached(user_id, [t['id'] for t in tracks_for_chart])
+        charted = [(t, profiles[t['id']]) for t in tracks_for_chart if profiles.get(t['id']) is not None and profiles[t['id']].size]
+        with chart_container:
+            chart_container.clear()
+            if not charted:
+                if all(profiles.get(t['id']) is None for t in tracks_for_chart):
+                    ui.label("GPX-Datei für Höhenprofil nicht gefunden.").classes('p-2 text-center text-grey w-full')
+                else:
+                    ui.label("Keine Höhendaten verfügbar.").classes('p-2 text-center text-grey w-full')
+                return
+            series_data = elevation_profiles.chart_series_data([profile for _, profile in charted])
+            if len(charted) == 1:
+                title = f"Höhenprofil: {charted[0][0].get('name', 'Unbenannt')}"
+                series = [{"name": "Höhe", "type": 'line', "smooth": True, "showSymbol": False, "data": series_data[0],
+                           "lineStyle": {"color": design.PRIMARY_COLOR_HEX}, "areaStyle": {"color": design.SECONDARY_COLOR_HEX, "opacity": 0.3}}]
+            else:
+                title = f"Höhenprofile: {len(charted)} Tracks"
+                if len(selected_track_display_data) > len(tracks_for_chart):
+                    title += f" (erste {len(tracks_for_chart)} von {len(selected_track_display_data)} ausgewählten)"
+                series = [{"name": f"{track.get('name', 'Unbenannt')} (#{track['id']})", "type": 'line', "showSymbol": False,
+                           "data": data, "lineStyle": {"width": 1.5}}
+                          for (track, _), data in zip(charted, series_data)]
+            ui.echart({
+                "title": {"text": title, "left": 'center', "textStyle": {"fontSize": 14}},
+                "animation": len(charted) == 1,
+                "legend": {"show": len(charted) > 1, "type": 'scroll', "bottom": 0},
+                "grid": {"left": '60px', "right": '30px', "bottom": '50px', "top": '50px', "containLabel": False},
+                "tooltip": {"trigger": 'axis', "axisPointer": {"type": 'cross'}},
+                "xAxis": {"type": 'value', "min": 0, "max": 'dataMax', "name": "Distanz (km)", "nameLocation": "middle", "nameGap": 25},
+                "yAxis": {"type": 'value', "scale": True, "name": "Höhe (m)", "axisLabel": {"formatter": '{value} m'}},
+                "series": series,
+            }).classes('w-full h-full')
+    except Exception as e_chart:
+        print(f"Fehler beim Erstellen des Höhenprofils: {e_chart}"); traceback.print_exc()
+        with chart_container: chart_container.clear(); ui.label("Fehler beim Laden des Höhenprofils.").classes('p-2 text-center text-red-500 w-full')
+
+def load_track_geometries(user_id: int, track_ids: List[int]) -> Dict[int, List[List[float]]]:
+    """Liest die Punkte der angegebenen Tracks (auf ~1 m gerundet, spart Übertragung). Fehlende Dateien ergeben []."""
+    geometries: Dict[int, List[List[float]]] = {track_id: [] for track_id in track_ids}
+    for track_id, arrays in point_store.get_track_point_arrays(user_id, track_ids).items():
+        geometries[track_id] = np.round(np.column_stack((arrays["lat"], arrays["lon"])), 5).tolist()
+    missing_ids = [track_id for track_id in track_ids if not geometries[track_id]]
+    if not missing_ids: return geometries
+    db = db_config.SessionLocal()  # noch nicht im Punktspeicher (Job 'points' läuft noch): aus der GPX-Datei
+    try:
+        tracks = db_config.get_tracks_by_ids(db, user_id, missing_ids)
+    finally: db.close()
+    for track in tracks:
+        if not track.stored_filename: continue
+        with blob_storage.get_store().local_file(track.stored_filename) as gpx_file_path:
+            if gpx_file_path is not None:
+                geometries[track.id] = [[round(lat, 5), round(lon, 5)] for lat, lon in gpx_utils.get_points_from_gpx_file(str(gpx_file_path))]
+    return geometries
+
+async def send_missing_track_layers(user_id: int, map_view: ui.leaflet, track_ids: List[int]):
+    known_track_ids: Set[int] = app.storage.client.setdefault('client_track_layer_ids', set())
+    missing_track_ids = [track_id for track_id in track_ids if track_id not in known_track_ids]
+    if not missing_track_ids: return
+    geometries = await run.io_bound(load_track_geometries, user_id, missing_track_ids)
+    map_view.client.run_javascript(
+        f"gpxTrackLayers.add({map_view.id}, {json.dumps(geometries)}, {json.dumps({'color': design.PRIMARY_COLOR_HEX, 'weight': 3})})")
+    known_track_ids.update(geometries)  # auch Tracks ohne Punkte, damit sie nicht bei jedem Klick erneut gelesen werden
+
+def forget_client_track_data(track_ids: List[int]):
+    """Verwirft Layer und Höhenprofil dieser Tracks im aktuellen Client (nach Löschen oder Änderung der Geometrie)."""
+    map_view = app.storage.client.get('ui_map_view')
+    app.storage.client.get('client_track_layer_ids', set()).difference_update(track_ids)
+    profile_cache = app.storage.client.get('elevation_profile_cache', {})
+    for track_id in track_ids: profile_cache.pop(track_id, None)
+    if map_view: map_view.client.run_javascript(f"gpxTrackLayers.forget({map_view.id}, {json.dumps(list(track_ids))})")
+
+async def get_elevation_profiles_cached(user_id: int, track_ids: List[int]) -> Dict[int, Optional[Any]]:
+    """Profile (siehe elevation_profiles.py) pro Client zwischenspeichern. None = GPX-Datei fehlt, wird nicht gecacht."""
+    profile_cache: Dict[int, Any] = app.storage.client.setdefault('elevation_profile_cache', {})
+    missing_ids = [track_id for track_id in track_ids if track_id not in profile_cache]
+    if missing_ids:
+        loaded = await run.io_bound(elevation_profiles.load_profiles_for_tracks, user_id, missing_ids)
+        profile_cache.update({track_id: profile for track_id, profile in loaded.items() if profile is not None})
+    return {track_id: profile_cache.get(track_id) for track_id in track_ids}
+
+
+async def select_similar_tracks(user_id: int):
+    selected_ids_list = app.storage.user.get('selected_track_ids_list', [])
+    if len(selected_ids_list) != 1: return
+    track_id = selected_ids_list[0]
     db = db_config.SessionLocal()
     try:
-        for track_data in selected_track_display_data:
-            total_dist_km += track_data.get('distance_km', 0.0) or 0
-            total_asc_m += track_data.get('total_ascent', 0.0) or 0
-            gpx_file_path = db_config.get_gpx_filepath(db, user_id, track_data['id'])
-            if gpx_file_path and gpx_file_path.exists():
-                points = gpx_utils.get_points_from_gpx_file(str(gpx_file_path))
-                if points:
-                    map_view.generic_layer(name='polyline', args=[points, {'color': design.PRIMARY_COLOR_HEX, 'weight': 3}])
-                    all_track_points_for_bounds.extend(points)
+        signature = await run.io_bound(fingerprint.ensure_fingerprint_for_track, db, user_id, track_id)
+        similar = fingerprint.find_similar_tracks(db, user_id, signature, exclude_track_id=track_id) if signature is not None else []
     finally: db.close()
+    if not similar: ui.notify("Keine ähnlichen Routen gefunden.", type='info'); return
+    visible_ids = {t['id'] for t in app.storage.user.get('tracks_in_table_data', [])}
+    hidden_count = sum(1 for tid, _ in similar if tid not in visible_ids)
+    ui.notify(f"{len(similar)} ähnliche Route(n) gefunden" + (f", {hidden_count} davon durch den Filter ausgeblendet." if hidden_count else "."), type='positive')
+    app.storage.user['selected_track_ids_list'] = [track_id] + [tid for tid, _ in similar]
+    app.storage.user['map_needs_initial_fit'] = True
+    request_ui_refresh(delay_s=0)
 
-    stats_dist.set_text(f"Gesamtstrecke: {total_dist_km:.2f} km")
-    stats_asc.set_text(f"Gesamtanstieg: {total_asc_m:.0f} m")
-
-    if all_track_points_for_bounds:
-        bounds = gpx_utils.get_bounds_for_points(all_track_points_for_bounds)
-        if bounds and (is_initial_map_fit or len(selected_ids_set) > 0):
-            try:
-                map_view.run_method('fitBounds', [[bounds[0][0], bounds[0][1]], [bounds[1][0], bounds[1][1]]], timeout=2.0)
-            except Exception as e_fit:
-                print(f"ERROR calling fitBounds: {e_fit}")
-    elif is_initial_map_fit :
-        map_view.set_center((50.0, 10.0)); map_view.set_zoom(5)
-
-    if len(selected_track_display_data) == 1 and chart_container:
-        track_for_profile = selected_track_display_data[0]
-        db_chart = db_config.SessionLocal()
-        try:
-            gpx_file_path_chart = db_config.get_gpx_filepath(db_chart, user_id, track_for_profile['id'])
-            if gpx_file_path_chart and gpx_file_path_chart.exists():
-                elevation_chart_data = gpx_utils.get_elevation_data_for_chart(str(gpx_file_path_chart))
-                if elevation_chart_data:
-                    with chart_container:
-                        chart_container.clear()
-                        ui.echart({
-                            "title": {"text": f"Höhenprofil: {track_for_profile.get('name', 'Unbenannt')}", "left": 'center', "textStyle": {"fontSize": 14}},
-                            "grid": {"left": '60px', "right": '30px', "bottom": '50px', "top": '50px', "containLabel": False},
-                            "tooltip": {"trigger": 'axis', "axisPointer": {"type": 'cross'}},
-                            "xAxis": {"type": 'category', "boundaryGap": False, "data": elevation_chart_data["categories"], "name": "Distanz (km)", "nameLocation": "middle", "nameGap": 25},
-                            "yAxis": {"type": 'value', "name": "Höhe (m)", "axisLabel": {"formatter": '{value} m'}},
-                            "series": [{"name": "Höhe", "type": 'line', "smooth": True, "data": elevation_chart_data["series_data"],
-                                        "lineStyle": {"color": design.PRIMARY_COLOR_HEX}, "areaStyle": {"color": design.SECONDARY_COLOR_HEX, "opacity": 0.3}}]
-                        }).classes('w-full h-full')
-                else:
-                    with chart_container: chart_container.clear(); ui.label("Keine Höhendaten verfügbar.").classes('p-2 text-center text-grey w-full')
-            else:
-                with chart_container: chart_container.clear(); ui.label("GPX-Datei für Höhenprofil nicht gefunden.").classes('p-2 text-center text-grey w-full')
-        except Exception as e_chart:
-            print(f"Fehler beim Erstellen des Höhenprofils: {e_chart}"); traceback.print_exc()
-            if chart_container:
-                with chart_container: chart_container.clear(); ui.label("Fehler beim Laden des Höhenprofils.").classes('p-2 text-center text-red-500 w-full')
-        finally:
-            if 'db_chart' in locals() and hasattr(db_chart, 'is_active') and db_chart.is_active: db_chart.close()
-    elif chart_container: chart_container.clear()
+async def send_start_clusters(user_id: int, viewport: Dict[str, Any]):
+    map_view = app.storage.client.get('ui_map_view')
+    if not map_view or viewport.get('map_id') != map_view.id: return
+    db = db_config.SessionLocal()
+    try:
+        clusters = await run.io_bound(start_clusters.get_start_clusters, db, user_id, int(viewport['zoom']),
+                                      float(viewport['south']), float(viewport['west']), float(viewport['north']), float(viewport['east']))
+    finally: db.close()
+    map_view.client.run_javascript(f"gpxStartClusters.set({map_view.id}, {int(viewport['seq'])}, {json.dumps(clusters)})")
 
+async def select_start_cluster_tracks(user_id: int, args: Dict[str, Any]):
+    (south, west), (north, east) = args['bounds']
+    db = db_config.SessionLocal()
+    try: track_ids = await run.io_bound(start_clusters.get_track_ids_in_bounds, db, user_id, south, west, north, east)
+    finally: db.close()
+    if not track_ids: return
+    visible_ids = {t['id'] for t in app.storage.user.get('tracks_in_table_data', [])}
+    hidden_count = sum(1 for tid in track_ids if tid not in visible_ids)
+    ui.notify(f"{len(track_ids)} Track(s) ausgewählt" + (f", {hidden_count} davon durch den Filter ausgeblendet." if hidden_count else "."), type='info')
+    app.storage.user['selected_track_ids_list'] = track_ids
+    app.storage.user['map_needs_initial_fit'] = True
+    request_ui_refresh(delay_s=0)
+
+@app.get('/export/tracks')
+def export_tracks_route(request: Request, ids: str = '', fmt: str = 'zip'):
+    user_id = get_current_user_id()
+    if not user_id: return PlainTextResponse("Nicht eingeloggt.", status_code=401)
+    try: track_ids = [int(i) for i in ids.split(',') if i.strip()]
+    except ValueError: return PlainTextResponse("Ungültige Track-IDs.", status_code=400)
+    db = db_config.SessionLocal()
+    try:
+        items = [(export.export_arcname(t.id, t.original_filename), t.stored_filename, t.name or "Unbenannt")
+                 for t in db_config.get_tracks_by_ids(db, user_id, track_ids)]
+    finally: db.close()
+    if not items: return PlainTextResponse("Keine Tracks gefunden.", status_code=404)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if fmt == 'gpx':
+        return StreamingResponse(export.stream_merged_gpx(items, f"GPX Export {timestamp}"), media_type='application/gpx+xml',
+                                 headers={'Content-Disposition': export.content_disposition(f"tracks_{timestamp}.gpx")})
+    return StreamingResponse(export.stream_tracks_zip(items), media_type='application/zip',
+                             headers={'Content-Disposition': export.content_disposition(f"tracks_{timestamp}.zip")})
+
+@app.get('/tiles/{z}/{x}/{y}.png')
+async def tile_route(z: int, x: int, y: int):
+    if not get_current_user_id(): return PlainTextResponse("Nicht eingeloggt.", status_code=401)  # kein offener Proxy
+    if not tile_cache.is_valid_tile(z, x, y): return PlainTextResponse("Ungültige Kachel.", status_code=404)
+    tile = await run.io_bound(tile_cache.get_tile, z, x, y)
+    if not tile: return PlainTextResponse("Kachel nicht verfügbar.", status_code=502)
+    content, max_age_s = tile
+    return Response(content, media_type='image/png', headers={'Cache-Control': f'private, max-age={max_age_s}'})
+
+@app.get('/thumbnails/{track_id}.svg')
+async def thumbnail_route(track_id: int, v: str = ''):
+    user_id = get_current_user_id()
+    if not user_id: return PlainTextResponse("Nicht eingeloggt.", status_code=401)
+    db = db_config.SessionLocal()
+    try: track = await run.io_bound(db_config.get_track_details, db, user_id, track_id)
+    finally: db.close()
+    if not track: return PlainTextResponse("Track nicht gefunden.", status_code=404)
+    # veraltete URL (Track inzwischen bearbeitet): nichts ausliefern, was dann dauerhaft unter ihr im Cache läge
+    if v != thumbnails.thumbnail_key(track): return PlainTextResponse("Vorschaubild veraltet.", status_code=404)
+    svg = await run.io_bound(thumbnails.load_or_render_thumbnail, track)
+    if svg is None: return PlainTextResponse("Vorschaubild nicht verfügbar.", status_code=404)
+    # URL und Datei tragen denselben Schlüssel aus Version und Inhalts-Hash, ein Bild unter einer URL ändert sich also nie
+    return Response(svg, media_type='image/svg+xml',
+                    headers={'Cache-Control': f'private, max-age={settings.THUMBNAIL_CACHE_MAX_AGE_S}, immutable'})
+
+async def open_export_dialog(user_id: int):
+    selected_ids_list = app.storage.user.get('selected_track_ids_list', [])
+    if not selected_ids_list: return
+    ids_param = ','.join(str(i) for i in selected_ids_list)
+    with ui.dialog() as export_dialog, ui.card():
+        ui.label(f"{len(selected_ids_list)} ausgewählte Tracks exportieren").classes('m-4 text-lg')
+        with ui.row().classes('w-full justify-end gap-2 p-2'):
+            ui.button("Abbrechen", on_click=export_dialog.close).props('flat')
+            ui.button("ZIP (Originaldateien)", icon='folder_zip',
+                      on_click=lambda: (ui.download(f'/export/tracks?ids={ids_param}&fmt=zip'), export_dialog.close()))
+            ui.button("Eine GPX-Datei", icon='merge',
+                      on_click=lambda: (ui.download(f'/export/tracks?ids={ids_param}&fmt=gpx'), export_dialog.close()))
+    await export_dialog
 
 async def confirm_delete_selected_tracks(user_id: int):
     selected_ids_list = app.storage.user.get('selected_track_ids_list', [])
@@ -427,15 +691,141 @@ async def delete_multiple_tracks_confirmed(user_id: int, track_ids_to_delete: Li
     dialog_ref.close()
     if not track_ids_to_delete: return
     db = db_config.SessionLocal()
+    try: num_deleted = db_config.soft_delete_tracks(db, user_id, track_ids_to_delete)
+    finally: db.close()
+    if num_deleted == 0: ui.notify("Keine Tracks gelöscht.", type='info'); return
+    # Dateien und abgeleitete Artefakte entfernt file_gc.py nach Ablauf des Undo-Fensters
+    show_undo_delete(track_ids_to_delete, f"{num_deleted} Tracks gelöscht.")
+    forget_client_track_data(track_ids_to_delete)
+    app.storage.user['selected_track_ids_list'] = []
+    app.storage.user['map_needs_initial_fit'] = True
+    request_ui_refresh(delay_s=0)
+
+def show_undo_delete(track_ids: List[int], message: str):
+    undo_row, undo_label = app.storage.client.get('ui_undo_delete_row'), app.storage.client.get('ui_undo_delete_label')
+    if not undo_row: return
+    previous_timer = app.storage.client.pop('undo_delete_timer', None)
+    if previous_timer: previous_timer.cancel()
+    app.storage.client['undo_delete_track_ids'] = list(track_ids)
+    undo_label.text = message
+    undo_row.set_visibility(True)
+    def hide_undo():
+        app.storage.client.pop('undo_delete_track_ids', None)
+        undo_row.set_visibility(False)
+    with undo_row:
+        app.storage.client['undo_delete_timer'] = ui.timer(settings.TRACK_DELETE_UNDO_WINDOW_S, hide_undo, once=True)
+
+async def undo_last_delete(user_id: int):
+    track_ids = app.storage.client.pop('undo_delete_track_ids', None)
+    undo_row = app.storage.client.get('ui_undo_delete_row')
+    if undo_row: undo_row.set_visibility(False)
+    if not track_ids: return
+    db = db_config.SessionLocal()
+    try: num_restored = db_config.restore_tracks(db, user_id, track_ids)
+    finally: db.close()
+    if num_restored == 0: ui.notify("Wiederherstellen nicht mehr möglich.", type='warning'); return
+    ui.notify(f"{num_restored} Tracks wiederhergestellt.", type='positive')
+    app.storage.user['selected_track_ids_list'] = track_ids
+    app.storage.user['map_needs_initial_fit'] = True
+    request_ui_refresh(delay_s=0)
+
+def describe_track_point(series: track_editing.TrackSeries, index: int) -> str:
+    label = f"Punkt {index}: {series.cum_2d_m[index] / 1000.0:.2f} km"
+    time_s = series.arrays["time"][index]
+    if np.isfinite(time_s): label += f", {datetime.fromtimestamp(float(time_s)).strftime('%H:%M:%S')}"
+    return label
+
+async def open_edit_track_dialog(user_id: int):
+    selected_ids_list = app.storage.user.get('selected_track_ids_list', [])
+    if len(selected_ids_list) != 1: return
+    track_id = selected_ids_list[0]
+    db = db_config.SessionLocal()
     try:
-        num_deleted, errors = db_config.delete_multiple_tracks_with_files(db, user_id, track_ids_to_delete)
-        if num_deleted > 0: ui.notify(f"{num_deleted} Tracks gelöscht.", type='positive')
-        if errors: ui.notify(f"{len(errors)} Fehler beim Löschen: {', '.join(errors)}", type='warning', multi_line=True)
-        if num_deleted == 0 and not errors: ui.notify("Keine Tracks gelöscht.", type='info')
-        app.storage.user['selected_track_ids_list'] = []
-        app.storage.user['map_needs_initial_fit'] = True
-        await load_tracks_from_db_and_refresh_ui(user_id)
+        track = db_config.get_track_details(db, user_id, track_id)
+        series = await run.io_bound(track_editing.load_track_series, user_id, track) if track else None
     finally: db.close()
+    if series is None or series.size < 2 * track_editing.MIN_POINTS_PER_TRACK:
+        ui.notify("Track kann nicht bearbeitet werden (zu wenige oder unlesbare Punkte).", type='warning'); return
+    last_index = series.size - 1
+    with ui.dialog() as edit_dialog, ui.card().classes('w-[32rem] max-w-full'):
+        ui.label(f"Track bearbeiten: {track.name}").classes('text-lg')
+        with ui.tabs().classes('w-full') as edit_tabs:
+            crop_tab = ui.tab('Zuschneiden'); split_tab = ui.tab('Teilen')
+        with ui.tab_panels(edit_tabs, value=crop_tab).classes('w-full'):
+            with ui.tab_panel(crop_tab):
+                crop_range = ui.range(min=0, max=last_index, value={'min': 0, 'max': last_index}).props('label')
+                crop_label = ui.label().classes('text-sm')
+                def update_crop_label():
+                    start, end = crop_range.value['min'], crop_range.value['max']
+                    stats = series.range_stats(start, end + 1)
+                    crop_label.text = (f"{describe_track_point(series, start)} bis {describe_track_point(series, end)} "
+                                       f"- {stats['distance_km']:.2f} km, {stats['total_ascent']:.0f} m Anstieg")
+                crop_range.on_value_change(update_crop_label); update_crop_label()
+                ui.button("Zuschneiden", icon='content_cut',
+                          on_click=lambda: apply_track_edit(user_id, edit_dialog, 'crop', track_id,
+                                                            crop_range.value['min'], crop_range.value['max'] + 1))
+            with ui.tab_panel(split_tab):
+                split_slider = ui.slider(min=1, max=last_index - 1, value=series.size // 2).props('label')
+                split_label = ui.label().classes('text-sm')
+                split_slider.on_value_change(lambda: split_label.set_text(describe_track_point(series, split_slider.value)))
+                split_label.set_text(describe_track_point(series, split_slider.value))
+                ui.button("Teilen", icon='call_split',
+                          on_click=lambda: apply_track_edit(user_id, edit_dialog, 'split', track_id, split_slider.value))
+        with ui.row().classes('w-full justify-end'):
+            ui.button("Abbrechen", on_click=edit_dialog.close).props('flat')
+    await edit_dialog
+
+async def confirm_merge_selected_tracks(user_id: int):
+    selected_ids_list = app.storage.user.get('selected_track_ids_list', [])
+    if len(selected_ids_list) < 2: return
+    with ui.dialog() as merge_dialog, ui.card():
+        ui.label(f"{len(selected_ids_list)} ausgewählte Tracks zu einem Track zusammenführen?").classes('m-4 text-lg')
+        ui.label("Die Tracks werden zeitlich sortiert aneinandergehängt, die übrigen Tracks danach gelöscht.").classes('mx-4 text-sm')
+        with ui.row().classes('w-full justify-end gap-2 p-2'):
+            ui.button("Abbrechen", on_click=merge_dialog.close).props('flat')
+            ui.button("Zusammenführen", icon='call_merge',
+                      on_click=lambda: apply_track_edit(user_id, merge_dialog, 'merge', list(selected_ids_list)))
+    await merge_dialog
 
-app.storage.secret = "MEIN_SUPER_GEHEIMER_STORAGE_KEY_UNBEDINGT_AENDERN"
-ui.run(title="GPX Track Manager", storage_secret=app.storage.secret, reload=True, port=8081, show=False)
\ No newline at end of file
+async def apply_track_edit(user_id: int, dialog_ref: ui.dialog, operation: str, *args: Any):
+    dialog_ref.close()
+    db = db_config.SessionLocal()
+    try:
+        if operation == 'crop':
+            result = await run.io_bound(track_editing.crop_track, db, user_id, args[0], args[1], args[2])
+            affected_ids, selected_ids = [args[0]], [args[0]]
+        elif operation == 'split':
+            result = await run.io_bound(track_editing.split_track, db, user_id, args[0], args[1])
+            affected_ids = selected_ids = result or []
+        else:
+            result = await run.io_bound(track_editing.merge_tracks, db, user_id, args[0])
+            affected_ids, selected_ids = args[0], [result]
+    finally: db.close()
+    if result is None:
+        ui.notify("Bearbeitung fehlgeschlagen.", type='negative'); return
+    ui.notify({'crop': "Track zugeschnitten.", 'split': "Track geteilt.", 'merge': "Tracks zusammengeführt."}[operation], type='positive')
+    forget_client_track_data(affected_ids)
+    app.storage.user['selected_track_ids_list'] = selected_ids
+    app.storage.user['map_needs_initial_fit'] = True
+    request_ui_refresh(delay_s=0)
+
+async def start_background_workers():
+    await job_queue.start_workers(settings.JOB_WORKERS, recover=settings.JOB_RECOVER_ON_START)
+    await file_gc.start()
+
+app.on_startup(start_background_workers)
+app.on_shutdown(job_queue.stop_workers)
+app.on_shutdown(file_gc.stop)
+app.on_shutdown(tile_cache.close)
+
+if settings.STORAGE_SECRET:
+    app.storage.secret = settings.STORAGE_SECRET
+elif settings.DEV_MODE:
+    print("WARNUNG: GPX_STORAGE_SECRET nicht gesetzt - verwende den unsicheren Entwicklungs-Schlüssel.")
+    app.storage.secret = settings.DEV_STORAGE_SECRET
+else:
+    raise SystemExit("GPX_STORAGE_SECRET muss im Produktionsmodus (GPX_MODE=prod) gesetzt sein.")
+migrations.prepare_database(auto_migrate=settings.DEV_MODE)
+session_store.install()
+ui.run(title="GPX Track Manager", storage_secret=app.storage.secret, reload=settings.DEV_MODE,
+       host=settings.HOST, port=settings.PORT, show=False)
\ No newline at end of file
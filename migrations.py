@@ -0,0 +1,164 @@
+# projekt_gpx_viewer/migrations.py
+"""
+Versionierte Schema-Migrationen der SQLite-Datenbank.
+
+Die aktuelle Schema-Version steht in PRAGMA user_version. Jede Migration hebt sie um genau eins an und
+muss idempotent sein (SQLite führt DDL nicht zuverlässig transaktional aus; ein abgebrochener Lauf wird
+beim nächsten Aufruf einfach wiederholt). Neue Spalten/Indizes/Tabellen kommen als neue Migration ans
+Ende von MIGRATIONS - Modelländerungen in db_config.py allein erreichen bestehende Datenbanken nicht.
+
+Aufruf (einmal pro Deployment, vor dem Start von serve.py):
+    python migrations.py            # ausstehende Migrationen anwenden
+    python migrations.py --status   # nur anzeigen
+
+Im Entwicklungsmodus (GPX_MODE=dev) migrieren main.py und die CLI-Werkzeuge automatisch, im
+Produktionsmodus brechen sie bei veraltetem Schema mit einem Hinweis ab.
+"""
+import argparse
+import sys
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+import db_config
+import settings
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+def add_column_if_missing(conn: Connection, table_name: str, column_name: str):
+    """Ergänzt eine Spalte des Modells, falls sie in der bestehenden Tabelle fehlt."""
+    existing_columns = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    if column_name in existing_columns:
+        return
+    column = db_config.Base.metadata.tables[table_name].columns[column_name]
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+    print(f"Spalte {table_name}.{column_name} ergänzt.")
+
+def create_indexes(conn: Connection, table_name: str):
+    for index in db_config.Base.metadata.tables[table_name].indexes:
+        index.create(bind=conn, checkfirst=True)
+
+def _m001_baseline(conn: Connection):
+    # Bestandsdatenbanken stammen aus create_all + automatischem Spaltenabgleich beim Import von db_config;
+    # dieser Abgleich wird hier ein letztes Mal ausgeführt, danach gilt nur noch die Versionsnummer.
+    db_config.Base.metadata.create_all(bind=conn)
+    for table in db_config.Base.metadata.sorted_tables:
+        for column in table.columns:
+            add_column_if_missing(conn, table.name, column.name)
+        create_indexes(conn, table.name)
+
+def _m002_track_search(conn: Connection):
+    # Volltextindex als external-content-Tabelle: speichert nur den Index, die Texte bleiben in 'tracks'.
+    # Trigger halten ihn bei jedem INSERT/UPDATE/DELETE (auch Massenimport und CASCADE) synchron.
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5("
+        "name, original_filename, labels, content='tracks', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS tracks_fts_ai AFTER INSERT ON tracks BEGIN "
+        "INSERT INTO tracks_fts(rowid, name, original_filename, labels) VALUES (new.id, new.name, new.original_filename, new.labels); END"))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS tracks_fts_ad AFTER DELETE ON tracks BEGIN "
+        "INSERT INTO tracks_fts(tracks_fts, rowid, name, original_filename, labels) "
+        "VALUES ('delete', old.id, old.name, old.original_filename, old.labels); END"))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS tracks_fts_au AFTER UPDATE OF name, original_filename, labels ON tracks BEGIN "
+        "INSERT INTO tracks_fts(tracks_fts, rowid, name, original_filename, labels) "
+        "VALUES ('delete', old.id, old.name, old.original_filename, old.labels); "
+        "INSERT INTO tracks_fts(rowid, name, original_filename, labels) VALUES (new.id, new.name, new.original_filename, new.labels); END"))
+    conn.execute(text("INSERT INTO tracks_fts(tracks_fts) VALUES ('rebuild')"))
+
+def _m003_track_updated_at(conn: Connection):
+    # Millisekunden, damit inkrementelle Exporte (analytics_export.py) auch Änderungen in derselben Sekunde erkennen.
+    # Trigger statt ORM-onupdate: erfasst auch Massenimport und direkte SQL-Updates. exec_driver_sql, weil text() ":%M" als Parameter läse.
+    add_column_if_missing(conn, "tracks", "updated_at")
+    now_ms = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    conn.exec_driver_sql(f"UPDATE tracks SET updated_at = COALESCE(strftime('%Y-%m-%d %H:%M:%f', upload_date), {now_ms}) WHERE updated_at IS NULL")
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS tracks_updated_at_ai AFTER INSERT ON tracks WHEN new.updated_at IS NULL BEGIN "
+        f"UPDATE tracks SET updated_at = {now_ms} WHERE id = new.id; END")
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS tracks_updated_at_au AFTER UPDATE ON tracks WHEN new.updated_at IS old.updated_at BEGIN "
+        f"UPDATE tracks SET updated_at = {now_ms} WHERE id = new.id; END")
+
+def _m004_track_soft_delete(conn: Connection):
+    add_column_if_missing(conn, "tracks", "deleted_at")
+    create_indexes(conn, "tracks")
+
+def _m005_track_start_point(conn: Connection):
+    # Werte trägt der Prozessor 'start_point' nach (python reprocess.py --processor start_point)
+    add_column_if_missing(conn, "tracks", "start_lat")
+    add_column_if_missing(conn, "tracks", "start_lon")
+    create_indexes(conn, "tracks")
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Basisschema (Users, Tracks, Jobs, Fingerprints)", _m001_baseline),
+    Migration(2, "Volltextsuche tracks_fts (FTS5) mit Sync-Triggern", _m002_track_search),
+    Migration(3, "tracks.updated_at mit Änderungs-Triggern", _m003_track_updated_at),
+    Migration(4, "tracks.deleted_at (Papierkorb) mit Index", _m004_track_soft_delete),
+    Migration(5, "tracks.start_lat/start_lon für die Übersichtskarte", _m005_track_start_point),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+def pending_migrations(current_version: int) -> List[Migration]:
+    return [m for m in MIGRATIONS if m.version > current_version]
+
+def migrate(target_version: Optional[int] = None) -> int:
+    """Wendet alle ausstehenden Migrationen an. Rückgabe: Schema-Version danach."""
+    db_config.ensure_storage_dirs()
+    target_version = LATEST_VERSION if target_version is None else target_version
+    engine = db_config.get_engine()
+    with engine.connect() as conn:
+        current_version = get_schema_version(conn)
+    for migration in pending_migrations(current_version):
+        if migration.version > target_version:
+            break
+        with engine.begin() as conn:
+            if get_schema_version(conn) >= migration.version:
+                continue  # parallel von einem anderen Prozess erledigt
+            migration.apply(conn)
+            conn.execute(text(f"PRAGMA user_version = {int(migration.version)}"))
+        print(f"Migration {migration.version} angewendet: {migration.description}")
+        current_version = migration.version
+    return current_version
+
+def prepare_database(auto_migrate: bool = settings.DEV_MODE):
+    """Für Einstiegspunkte: Verzeichnisse anlegen und Schema-Version prüfen (im Dev-Modus migrieren)."""
+    db_config.ensure_storage_dirs()
+    with db_config.get_engine().connect() as conn:
+        current_version = get_schema_version(conn)
+    if current_version > LATEST_VERSION:
+        raise SystemExit(f"Datenbank-Schema Version {current_version} ist neuer als dieser Code ({LATEST_VERSION}).")
+    if current_version == LATEST_VERSION:
+        return
+    if not auto_migrate:
+        raise SystemExit(f"Datenbank-Schema veraltet (Version {current_version}, benötigt {LATEST_VERSION}). "
+                         f"Bitte zuerst 'python migrations.py' ausführen.")
+    migrate()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Datenbank-Schema migrieren.")
+    parser.add_argument("--status", action="store_true", help="Nur aktuelle und ausstehende Versionen anzeigen")
+    args = parser.parse_args(argv)
+    with db_config.get_engine().connect() as conn:
+        current_version = get_schema_version(conn)
+    pending = pending_migrations(current_version)
+    print(f"Datenbank {settings.DATABASE_PATH}: Schema-Version {current_version}, aktuell {LATEST_VERSION}.")
+    for migration in pending:
+        print(f"  ausstehend: {migration.version} - {migration.description}")
+    if args.status:
+        return 0 if not pending else 1
+    if pending:
+        print(f"Schema jetzt auf Version {migrate()}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
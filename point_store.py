@@ -0,0 +1,222 @@
+# projekt_gpx_viewer/point_store.py
+"""
+Spaltenorientierter Punktspeicher pro User, gelesen über np.memmap (ohne Python-Objekte pro Punkt).
+
+Layout unter derived/points/<user_id>/:
+    g<gen>.lat / g<gen>.lon / g<gen>.time   float64, fortlaufend alle Punkte aller Tracks
+    g<gen>.ele                              float32 (NaN = keine Höhe; Zeit ebenso)
+    index.npz                               entries (track_id, offset, count), generation, length
+
+Geschrieben wird nur angehängt (Prozessor 'points', track_processing.py), unter einer Dateisperre, damit
+Job-Worker mehrerer Prozesse sich nicht überschreiben. Die Spaltendaten stehen vor dem Index auf der Platte,
+der Index wird atomar ersetzt - Leser sehen also immer einen vollständigen Stand. Ersetzte oder gelöschte
+Tracks bleiben als Lücke stehen, bis compact() in eine neue Generation umschreibt; Leser mit einem alten
+Snapshot behalten ihre Abbildung der alten Dateien.
+"""
+import os
+import threading
+import traceback
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import db_config
+
+try:
+    import fcntl  # Dateisperre zwischen Prozessen (serve.py); unter Windows nur innerhalb des Prozesses gesperrt
+except ImportError:
+    fcntl = None
+
+POINT_STORE_DIR = db_config.DERIVED_DIR / "points"
+COLUMNS: Dict[str, np.dtype] = {"lat": np.dtype("<f8"), "lon": np.dtype("<f8"), "ele": np.dtype("<f4"), "time": np.dtype("<f8")}
+INDEX_DTYPE = np.dtype([("track_id", "<i8"), ("offset", "<i8"), ("count", "<i8")])
+# umschreiben, sobald die Lücken die lebenden Punkte übersteigen (und mindestens so viele Punkte ausmachen)
+COMPACT_MIN_GARBAGE_POINTS = 500_000
+
+_write_lock = threading.Lock()
+_snapshot_cache: Dict[int, Tuple[Tuple[int, int], "PointStoreSnapshot"]] = {}
+_snapshot_cache_lock = threading.Lock()
+
+def user_store_dir(user_id: int) -> Path:
+    return POINT_STORE_DIR / str(int(user_id))
+
+def _column_path(store_dir: Path, generation: int, column: str) -> Path:
+    return store_dir / f"g{generation}.{column}"
+
+class _StoreIndex(NamedTuple):
+    entries: np.ndarray
+    generation: int
+    length: int  # gültige Punkte in den Spaltendateien dieser Generation (inkl. Lücken)
+
+def _read_index(store_dir: Path) -> _StoreIndex:
+    try:
+        with np.load(store_dir / "index.npz") as data:
+            return _StoreIndex(data["entries"].astype(INDEX_DTYPE), int(data["generation"]), int(data["length"]))
+    except FileNotFoundError:
+        return _StoreIndex(np.empty(0, dtype=INDEX_DTYPE), 0, 0)
+
+def _write_index(store_dir: Path, index: _StoreIndex):
+    temp_path = store_dir / f".index.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        np.savez(f, entries=index.entries, generation=np.int64(index.generation), length=np.int64(index.length))
+        f.flush(); os.fsync(f.fileno())
+    os.replace(temp_path, store_dir / "index.npz")
+
+class _StoreLock:
+    """Sperrt den Speicher eines Users für Schreiber (Threads dieses Prozesses und andere Prozesse)."""
+    def __init__(self, store_dir: Path):
+        self.store_dir = store_dir; self._file = None
+
+    def __enter__(self):
+        _write_lock.acquire()
+        try:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.store_dir / ".lock", "a+b")
+            if fcntl: fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except Exception:
+            _write_lock.release(); raise
+        return self
+
+    def __exit__(self, *_):
+        try:
+            if fcntl: fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+        finally:
+            _write_lock.release()
+
+def _append_columns(store_dir: Path, index: _StoreIndex, columns: Dict[str, np.ndarray]):
+    """Hängt Spalten an Position index.length an (Reste eines abgebrochenen Schreibvorgangs werden überschrieben)."""
+    for name, dtype in COLUMNS.items():
+        path = _column_path(store_dir, index.generation, name)
+        with open(path, "r+b" if path.exists() else "w+b") as f:
+            f.seek(index.length * dtype.itemsize)
+            f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+            f.truncate()
+            f.flush(); os.fsync(f.fileno())
+
+def write_tracks(user_id: int, tracks: Dict[int, Dict[str, np.ndarray]]):
+    """Schreibt/ersetzt die Punkt-Arrays (lat, lon, ele, time wie gpx_utils.extract_point_arrays) mehrerer Tracks."""
+    if not tracks: return
+    store_dir = user_store_dir(user_id)
+    with _StoreLock(store_dir):
+        index = _read_index(store_dir)
+        keep = ~np.isin(index.entries["track_id"], list(tracks))
+        counts = np.array([len(arrays["lat"]) for arrays in tracks.values()], dtype="<i8")
+        added = np.empty(len(tracks), dtype=INDEX_DTYPE)
+        added["track_id"] = list(tracks); added["count"] = counts
+        added["offset"] = index.length + np.concatenate(([0], np.cumsum(counts)[:-1]))
+        _append_columns(store_dir, index, {name: np.concatenate([arrays[name] for arrays in tracks.values()]) for name in COLUMNS})
+        index = _StoreIndex(np.concatenate((index.entries[keep], added)), index.generation, index.length + int(counts.sum()))
+        _write_index(store_dir, index)
+        _compact_if_needed(store_dir, index)
+
+def write_track(user_id: int, track_id: int, arrays: Dict[str, np.ndarray]):
+    write_tracks(user_id, {track_id: arrays})
+
+def remove_tracks(user_id: int, track_ids: Iterable[int]):
+    store_dir = user_store_dir(user_id)
+    if not (store_dir / "index.npz").exists(): return
+    with _StoreLock(store_dir):
+        index = _read_index(store_dir)
+        keep = ~np.isin(index.entries["track_id"], list(track_ids))
+        if keep.all(): return
+        index = index._replace(entries=index.entries[keep])
+        _write_index(store_dir, index)
+        _compact_if_needed(store_dir, index)
+
+def _compact_if_needed(store_dir: Path, index: _StoreIndex, force: bool = False):
+    live_points = int(index.entries["count"].sum())
+    garbage_points = index.length - live_points
+    if not force and (garbage_points < COMPACT_MIN_GARBAGE_POINTS or garbage_points < live_points):
+        return
+    snapshot = PointStoreSnapshot(store_dir, index)
+    new_generation = index.generation + 1
+    new_offsets = np.concatenate(([0], np.cumsum(index.entries["count"])[:-1])).astype("<i8") if index.entries.size else np.empty(0, "<i8")
+    for name, dtype in COLUMNS.items():
+        with open(_column_path(store_dir, new_generation, name), "wb") as f:
+            for entry in index.entries:
+                f.write(np.ascontiguousarray(snapshot.columns[name][entry["offset"]:entry["offset"] + entry["count"]], dtype=dtype).tobytes())
+            f.flush(); os.fsync(f.fileno())
+    new_entries = index.entries.copy(); new_entries["offset"] = new_offsets
+    _write_index(store_dir, _StoreIndex(new_entries, new_generation, live_points))
+    del snapshot
+    for old_file in store_dir.glob("g*.*"):
+        if not old_file.name.startswith(f"g{new_generation}."):
+            try: old_file.unlink()
+            except OSError: pass  # unter Windows noch von einem Leser abgebildet, beim nächsten Umschreiben erneut versucht
+    print(f"Punktspeicher {store_dir.name}: {garbage_points} Lückenpunkte entfernt, {live_points} Punkte in Generation {new_generation}.")
+
+def compact(user_id: int):
+    store_dir = user_store_dir(user_id)
+    with _StoreLock(store_dir):
+        _compact_if_needed(store_dir, _read_index(store_dir), force=True)
+
+class PointStoreSnapshot:
+    """Unveränderlicher Lesestand: Spalten als np.memmap, Track-Zugriffe liefern Views ohne Kopie."""
+    def __init__(self, store_dir: Path, index: _StoreIndex):
+        self.index = index
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, dtype in COLUMNS.items():
+            if index.length == 0:
+                self.columns[name] = np.empty(0, dtype=dtype)
+            else:
+                # np.asarray: gewöhnliches ndarray auf der Abbildung - Slices davon sind deutlich billiger als memmap-Slices
+                self.columns[name] = np.asarray(np.memmap(_column_path(store_dir, index.generation, name), dtype=dtype, mode="r", shape=(index.length,)))
+        entries = index.entries
+        self._ranges: Dict[int, Tuple[int, int]] = dict(zip(entries["track_id"].tolist(),
+                                                            zip(entries["offset"].tolist(), (entries["offset"] + entries["count"]).tolist())))
+
+    @property
+    def track_ids(self) -> List[int]:
+        return list(self._ranges)
+
+    @property
+    def point_count(self) -> int:
+        return int(self.index.entries["count"].sum())
+
+    def __contains__(self, track_id: int) -> bool:
+        return track_id in self._ranges
+
+    def track_arrays(self, track_id: int) -> Optional[Dict[str, np.ndarray]]:
+        point_range = self._ranges.get(track_id)
+        if point_range is None:
+            return None
+        start, end = point_range
+        return {name: column[start:end] for name, column in self.columns.items()}
+
+    def all_points(self) -> Dict[str, np.ndarray]:
+        """Alle Spalten inkl. eventueller Lücken ersetzter Tracks; für exakte Track-Zuordnung track_arrays/entries nutzen."""
+        return dict(self.columns)
+
+def open_store(user_id: int) -> PointStoreSnapshot:
+    """Aktuellen Lesestand liefern; pro Prozess zwischengespeichert, bis sich der Index ändert."""
+    store_dir = user_store_dir(user_id)
+    try:
+        index_stat = (store_dir / "index.npz").stat()
+        index_version = (index_stat.st_ino, index_stat.st_mtime_ns)  # os.replace erzeugt jeweils eine neue Datei
+    except FileNotFoundError:
+        index_version = (0, 0)
+    with _snapshot_cache_lock:
+        cached = _snapshot_cache.get(user_id)
+        if cached and cached[0] == index_version:
+            return cached[1]
+    try:
+        snapshot = PointStoreSnapshot(store_dir, _read_index(store_dir))
+    except Exception as e:
+        print(f"Punktspeicher für User ID {user_id} nicht lesbar: {e}"); traceback.print_exc()
+        snapshot = PointStoreSnapshot(store_dir, _StoreIndex(np.empty(0, dtype=INDEX_DTYPE), 0, 0))
+        return snapshot  # nicht cachen, beim nächsten Aufruf erneut versuchen
+    with _snapshot_cache_lock:
+        _snapshot_cache[user_id] = (index_version, snapshot)
+    return snapshot
+
+def get_track_point_arrays(user_id: int, track_ids: List[int]) -> Dict[int, Dict[str, np.ndarray]]:
+    """Views der gespeicherten Tracks; Tracks, die (noch) nicht im Speicher liegen, fehlen im Ergebnis."""
+    snapshot = open_store(user_id)
+    result = {}
+    for track_id in track_ids:
+        arrays = snapshot.track_arrays(track_id)
+        if arrays is not None:
+            result[track_id] = arrays
+    return result
@@ -0,0 +1,79 @@
+# projekt_gpx_viewer/refresh_scheduler.py
+"""
+Bündelt UI-Aktualisierungen eines Clients (eine Instanz pro geöffneter Seite).
+
+Schnelle Folgen von Filter- oder Auswahländerungen (Datumsbereich wählen, 30 Zeilen per Shift markieren) lösen
+nicht mehr je einen vollständigen Refresh aus: request() wartet delay_s ab, neue Anforderungen verschieben den
+Start, und ein bereits laufender Refresh wird abgebrochen, wenn eine neuere Anforderung eintrifft. Der Refresh
+liest den Zustand erst beim Start (app.storage.user), wendet also immer nur den neuesten an.
+
+Stufen: REFRESH_MAP aktualisiert Karte/Statistik/Höhenprofil, REFRESH_FULL lädt zusätzlich die Trackliste.
+Zusammengefasste Anforderungen laufen mit der höchsten angeforderten Stufe - auch die eines abgebrochenen
+Refreshs geht nicht verloren.
+"""
+import asyncio
+import traceback
+from typing import Awaitable, Callable, Dict, Optional
+
+REFRESH_MAP = 1
+REFRESH_FULL = 2
+
+class RefreshScheduler:
+    def __init__(self, run_refresh: Callable[[int], Awaitable[None]], delay_s: float = 0.25):
+        self._run_refresh = run_refresh
+        self.delay_s = delay_s
+        self._task: Optional[asyncio.Task] = None
+        self._pending_level = 0
+        self._running_level = 0
+        self._running_task: Optional[asyncio.Task] = None  # Task, zu der _running_level gehört
+        self.requested_count = 0
+        self.executed_count = 0  # gestartete Refreshs
+        self.completed_count = 0
+        self.superseded_count = 0  # laufende Refreshs, die für eine neuere Anforderung abgebrochen wurden
+
+    def request(self, level: int = REFRESH_FULL, delay_s: Optional[float] = None):
+        """Refresh anfordern; ersetzt einen wartenden und bricht einen laufenden ab. delay_s=0 für Benutzeraktionen ohne Folgeeingaben."""
+        self.requested_count += 1
+        level = max(level, self._pending_level)
+        if self._task is not None and not self._task.done():
+            if self._running_level:
+                level = max(level, self._running_level)
+                self.superseded_count += 1
+            self._task.cancel()
+        self._pending_level = level
+        self._task = asyncio.get_running_loop().create_task(self._run_after_delay(self.delay_s if delay_s is None else delay_s))
+
+    async def _run_after_delay(self, delay_s: float):
+        await asyncio.sleep(delay_s)
+        level, self._pending_level = self._pending_level, 0
+        self._running_level = level; self._running_task = asyncio.current_task()
+        self.executed_count += 1
+        try:
+            await self._run_refresh(level)
+            self.completed_count += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Fehler beim Aktualisieren der Oberfläche: {e}")
+            traceback.print_exc()
+        finally:
+            # auch im abgebrochenen Task zurücksetzen, sonst erbt jede spätere Anforderung dessen Stufe
+            if self._running_task is asyncio.current_task():
+                self._running_level = 0; self._running_task = None
+
+    async def wait_idle(self):
+        """Wartet, bis keine Anforderung mehr aussteht (auch auf Nachfolger abgebrochener Refreshs)."""
+        while self._task is not None and not self._task.done():
+            try: await asyncio.shield(self._task)
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling(): raise
+
+    def cancel(self):
+        """Bei Verbindungsabbruch: wartende und laufende Refreshs verwerfen."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._pending_level = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"requested": self.requested_count, "executed": self.executed_count,
+                "completed": self.completed_count, "superseded": self.superseded_count}
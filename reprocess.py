@@ -0,0 +1,150 @@
+"""
+Nachbearbeitung (Backfill) bestehender Tracks mit den registrierten Prozessoren aus track_processing.py.
+
+Aufruf:
+    python reprocess.py [--processor NAME ...] [--user-id ID] [--batch-size 200] [--workers N]
+                        [--max-rate TRACKS_PRO_S] [--pause S] [--nice 10] [--force] [--restart]
+
+Die Tracks werden in ID-Reihenfolge blockweise gelesen; pro Track laufen nur die Prozessoren, deren
+Version in TrackDB.processing_versions veraltet ist (mit --force alle), die Datei wird dafür einmal geladen und
+geparst. Die Berechnung läuft in einem
+Prozess-Pool, das Schreiben in einer Transaktion pro Block. Nach jedem Block wird die zuletzt
+bearbeitete Track-ID in .reprocess_checkpoint.json festgehalten, ein Neustart setzt dort fort.
+Mit --max-rate, --pause und --nice lässt sich der Lauf neben dem Live-Betrieb drosseln.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import db_config
+import migrations
+import track_processing
+
+CHECKPOINT_FILE = db_config.BASE_DIR / ".reprocess_checkpoint.json"
+
+# (track_id, prozessoren, schlüssel im Blob-Speicher)
+ComputeTask = Tuple[int, List[str], str]
+
+def _init_worker(niceness: int):
+    if niceness and hasattr(os, "nice"):
+        try: os.nice(niceness)
+        except OSError: pass
+
+def _compute_task(task: ComputeTask) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+    """Rückgabe: (track_id, ergebnisse, fehlermeldungen) je Prozessorname."""
+    track_id, processor_names, stored_filename = task
+    try:
+        return (track_id, *track_processing.compute_processors(track_processing.load_point_arrays(stored_filename), processor_names))
+    except Exception as e:
+        return track_id, {}, {name: f"{type(e).__name__}: {e}" for name in processor_names}
+
+def _checkpoint_key(processor_names: List[str], user_id: Optional[int], force: bool) -> str:
+    versions = {name: track_processing.TRACK_PROCESSORS[name].version for name in sorted(processor_names)}
+    return json.dumps({"processors": versions, "user_id": user_id, "force": force}, sort_keys=True)
+
+def load_checkpoint(key: str) -> int:
+    try:
+        data = json.loads(CHECKPOINT_FILE.read_text(encoding="utf-8"))
+        return int(data["last_track_id"]) if data.get("key") == key else 0
+    except (FileNotFoundError, ValueError, KeyError):
+        return 0
+
+def save_checkpoint(key: str, last_track_id: int):
+    temp_file = CHECKPOINT_FILE.with_suffix(".tmp")
+    temp_file.write_text(json.dumps({"key": key, "last_track_id": last_track_id, "updated_at": time.time()}), encoding="utf-8")
+    os.replace(temp_file, CHECKPOINT_FILE)
+
+def run_reprocess(
+    processor_names: List[str], user_id: Optional[int] = None, batch_size: int = 200, workers: Optional[int] = None,
+    max_rate: Optional[float] = None, pause_s: float = 0.0, niceness: int = 10, force: bool = False, restart: bool = False
+) -> int:
+    key = _checkpoint_key(processor_names, user_id, force)
+    last_track_id = 0 if restart else load_checkpoint(key)
+    if last_track_id:
+        print(f"Setze nach Track ID {last_track_id} fort (Checkpoint).")
+    started = time.perf_counter()
+    scanned = 0; processed = 0; failed = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(niceness,)) as executor:
+        while True:
+            db = db_config.SessionLocal()
+            try:
+                query = db.query(db_config.TrackDB).filter(db_config.TrackDB.id > last_track_id, db_config.TrackDB.deleted_at.is_(None))
+                if user_id is not None:
+                    query = query.filter(db_config.TrackDB.user_id == user_id)
+                batch = query.order_by(db_config.TrackDB.id).limit(batch_size).all()
+                if not batch:
+                    break
+                batch_ids = [track.id for track in batch]
+                tasks: List[ComputeTask] = [
+                    (track.id, names, track.stored_filename)
+                    for track in batch
+                    for names in [processor_names if force else track_processing.stale_processor_names(track, processor_names)]
+                    if names
+                ]
+                # Erst den ganzen Block rechnen, dann in einer kurzen Transaktion schreiben: die SQLite-Schreibsperre
+                # (die App wartet höchstens busy_timeout=5s) wird nicht über die Berechnung hinweg gehalten
+                results = list(executor.map(_compute_task, tasks, chunksize=4))
+                db.rollback()  # Lese-Transaktion beenden; Tracks frisch laden, inzwischen gelöschte fallen heraus
+                tracks_by_id = {track.id: track for track in db.query(db_config.TrackDB).filter(
+                    db_config.TrackDB.id.in_(batch_ids), db_config.TrackDB.deleted_at.is_(None))}
+                for track_id, track_results, errors in results:
+                    for name, error in errors.items():
+                        failed += 1
+                        print(f"Track ID {track_id} / {name}: {error}")
+                    if track_id not in tracks_by_id: continue
+                    for name, result in track_results.items():
+                        track_processing.apply_processor_result(db, tracks_by_id[track_id], track_processing.TRACK_PROCESSORS[name], result)
+                        processed += 1
+                db.commit()
+                scanned += len(batch_ids)
+                last_track_id = batch_ids[-1]
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            save_checkpoint(key, last_track_id)
+
+            elapsed = time.perf_counter() - started
+            print(f"bis Track ID {last_track_id}: {scanned} Tracks geprüft, {processed} Artefakte berechnet, "
+                  f"{failed} Fehler ({scanned / max(elapsed, 1e-9):.1f} Tracks/s)")
+            if max_rate:
+                ahead_s = scanned / max_rate - (time.perf_counter() - started)
+                if ahead_s > 0: time.sleep(ahead_s)
+            if pause_s > 0:
+                time.sleep(pause_s)
+
+    CHECKPOINT_FILE.unlink(missing_ok=True)
+    print(f"Fertig: {scanned} Tracks geprüft, {processed} Artefakte berechnet, {failed} Fehler "
+          f"in {time.perf_counter() - started:.1f}s.")
+    return 0 if failed == 0 else 2
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Abgeleitete Track-Daten für bestehende Tracks (neu) berechnen.")
+    parser.add_argument("--processor", action="append", choices=sorted(track_processing.TRACK_PROCESSORS),
+                        help="Nur diese Prozessoren (mehrfach möglich, Standard: alle)")
+    parser.add_argument("--user-id", type=int, default=None, help="Nur Tracks dieses Users")
+    parser.add_argument("--batch-size", type=int, default=200, help="Tracks pro Block/Transaktion")
+    parser.add_argument("--workers", type=int, default=None, help="Rechenprozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--max-rate", type=float, default=None, help="Höchstens so viele Tracks pro Sekunde")
+    parser.add_argument("--pause", type=float, default=0.0, help="Pause in Sekunden nach jedem Block")
+    parser.add_argument("--nice", type=int, default=10, help="nice-Wert der Rechenprozesse (0 = unverändert)")
+    parser.add_argument("--force", action="store_true", help="Auch Tracks mit aktueller Version neu berechnen")
+    parser.add_argument("--restart", action="store_true", help="Checkpoint ignorieren und von vorn beginnen")
+    args = parser.parse_args(argv)
+    processor_names = args.processor or list(track_processing.TRACK_PROCESSORS)
+    migrations.prepare_database()
+    try:
+        return run_reprocess(processor_names, user_id=args.user_id, batch_size=max(1, args.batch_size), workers=args.workers,
+                             max_rate=args.max_rate, pause_s=args.pause, niceness=args.nice, force=args.force, restart=args.restart)
+    except KeyboardInterrupt:
+        print("Abgebrochen - erneuter Aufruf setzt beim letzten Checkpoint fort.")
+        return 130
+
+if __name__ == "__main__":
+    sys.exit(main())
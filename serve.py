@@ -0,0 +1,201 @@
+"""
+Produktionsstart: mehrere Worker-Prozesse hinter einem Port.
+
+Aufruf:
+    GPX_STORAGE_SECRET=... python serve.py [--workers N] [--host 0.0.0.0] [--port 8081] [--migrate]
+
+Jeder Worker ist ein eigener main.py-Prozess (GPX_MODE=prod, ohne Reload) auf einem internen Port ab
+--port + 1. Davor nimmt ein schlanker TCP-Proxy die Verbindungen am öffentlichen Port an und verteilt
+sie fest auf einen Worker ("sticky"): NiceGUI hält die Websocket-Verbindung und den UI-Zustand einer Seite
+im Prozess, der sie ausgeliefert hat. Maßgeblich ist ein Routing-Cookie (ROUTE_COOKIE) aus dem Kopf der
+ersten Anfrage einer Verbindung; ohne gültiges Cookie wählt der Proxy den Worker mit den wenigsten offenen
+Verbindungen und setzt das Cookie in der Antwort. So verteilen sich auch Nutzer hinter einem NAT oder
+Reverse-Proxy (gleiche Client-IP) auf alle Worker. Ein vorgeschalteter Reverse-Proxy darf Verbindungen zum
+Proxy nicht für verschiedene Clients wiederverwenden (nginx: kein upstream keepalive, Standard).
+Sitzungsdaten (app.storage.user) liegen im gemeinsamen SQLite-Speicher (session_store.py), fällt ein Worker
+aus, übernimmt der nächste (mit neuem Cookie). Abgestürzte Worker werden neu gestartet.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+import job_queue
+import migrations
+import settings
+
+BASE_DIR = settings.BASE_DIR
+RESTART_DELAY_S = 2.0
+CONNECT_TIMEOUT_S = 2.0
+PROXY_BUFFER_SIZE = 64 * 1024
+HEAD_TIMEOUT_S = 10.0  # Warten auf den Kopf der ersten Anfrage, danach ohne Cookie weiter
+ROUTE_COOKIE = b"gpx_worker"
+
+_round_robin = itertools.count()
+
+class WorkerProcess:
+    def __init__(self, number: int, host: str, port: int, env: dict):
+        self.number = number; self.host = host; self.port = port; self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.connections = 0  # offene Client-Verbindungen über den Proxy
+
+    def start(self):
+        env = dict(self.env, GPX_PORT=str(self.port), GPX_HOST=self.host)
+        self.process = subprocess.Popen([sys.executable, str(BASE_DIR / "main.py")], cwd=str(BASE_DIR), env=env)
+        print(f"Worker {self.number} gestartet (PID {self.process.pid}, Port {self.port}).")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.is_alive():
+            self.process.terminate()
+
+def _route_from_head(head: bytes) -> Optional[int]:
+    """Worker-Nummer aus dem Routing-Cookie im Anfragekopf, sonst None."""
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() != b"cookie":
+            continue
+        for part in value.split(b";"):
+            cookie_name, _, cookie_value = part.strip().partition(b"=")
+            if cookie_name == ROUTE_COOKIE and cookie_value.isdigit():
+                return int(cookie_value)
+    return None
+
+def _pick_workers(route: Optional[int], workers: List[WorkerProcess]) -> List[WorkerProcess]:
+    """Worker aus dem Cookie zuerst, danach (bzw. ohne Cookie) nach Anzahl offener Verbindungen, bei Gleichstand reihum."""
+    offset = next(_round_robin) % len(workers)
+    by_load = sorted(workers, key=lambda worker: (worker.connections, (worker.number - offset) % len(workers)))
+    if route is not None and 0 <= route < len(workers):
+        return [workers[route]] + [worker for worker in by_load if worker is not workers[route]]
+    return by_load
+
+async def _read_request_head(reader: asyncio.StreamReader) -> bytes:
+    """Liest den Kopf der ersten HTTP-Anfrage; bei zu großem Kopf, Zeitüberschreitung oder Nicht-HTTP leer bzw. unvollständig."""
+    try:
+        return await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=HEAD_TIMEOUT_S)
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except (asyncio.LimitOverrunError, asyncio.TimeoutError):
+        return b""  # Daten bleiben im Puffer und werden unverändert weitergereicht
+
+async def _pipe_with_cookie(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, set_cookie: Optional[bytes]):
+    """Wie _pipe, setzt aber zuvor 'set_cookie' in den Kopf der ersten Antwort."""
+    if set_cookie:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            status_line, _, rest = head.partition(b"\r\n")
+            writer.write(status_line + b"\r\nSet-Cookie: " + set_cookie + b"\r\n" + rest)
+        except asyncio.IncompleteReadError as e:
+            writer.write(e.partial)
+        except asyncio.LimitOverrunError:
+            pass  # kein HTTP-Kopf in Reichweite: ohne Cookie weiterreichen
+        except (ConnectionError, asyncio.CancelledError):
+            writer.close(); return
+    await _pipe(reader, writer)
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            data = await reader.read(PROXY_BUFFER_SIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        try:
+            writer.close()
+        except Exception:
+            pass
+
+async def _handle_client(client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter, workers: List[WorkerProcess]):
+    peer = client_writer.get_extra_info("peername")
+    client_host = peer[0] if peer else ""
+    head = await _read_request_head(client_reader)
+    route = _route_from_head(head)
+    for worker in _pick_workers(route, workers):
+        if not worker.is_alive():
+            continue
+        try:
+            upstream_reader, upstream_writer = await asyncio.wait_for(
+                asyncio.open_connection("127.0.0.1", worker.port), timeout=CONNECT_TIMEOUT_S)
+        except (OSError, asyncio.TimeoutError):
+            continue
+        # Sitzungscookie ohne Ablaufdatum; nur setzen, wenn der Client (noch) nicht an diesem Worker hängt
+        set_cookie = None if route == worker.number or not head else \
+            ROUTE_COOKIE + b"=" + str(worker.number).encode() + b"; Path=/; HttpOnly; SameSite=Lax"
+        worker.connections += 1
+        try:
+            upstream_writer.write(head)
+            await asyncio.gather(_pipe(client_reader, upstream_writer), _pipe_with_cookie(upstream_reader, client_writer, set_cookie))
+        finally:
+            worker.connections -= 1
+        return
+    print(f"Kein Worker erreichbar für {client_host}.")
+    client_writer.close()
+
+async def _supervise(workers: List[WorkerProcess], stop_event: asyncio.Event):
+    while not stop_event.is_set():
+        for worker in workers:
+            if worker.process is not None and not worker.is_alive():
+                print(f"Worker {worker.number} beendet (Code {worker.process.returncode}), starte neu.")
+                worker.start()
+        try: await asyncio.wait_for(stop_event.wait(), timeout=RESTART_DELAY_S)
+        except asyncio.TimeoutError: pass
+
+async def run_server(host: str, port: int, num_workers: int, migrate: bool = False) -> int:
+    if not settings.STORAGE_SECRET:
+        print("GPX_STORAGE_SECRET ist nicht gesetzt - im Produktionsmodus erforderlich.")
+        return 1
+    migrations.prepare_database(auto_migrate=migrate)
+    # einmalig vor dem Start, damit sich die Worker nicht gegenseitig laufende Jobs zurücksetzen
+    job_queue.recover_and_prune()
+
+    env = dict(os.environ, GPX_MODE="prod", GPX_JOB_RECOVER="0")
+    workers = [WorkerProcess(i, "127.0.0.1", port + 1 + i, env) for i in range(max(1, num_workers))]
+    for worker in workers:
+        worker.start()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try: loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError: pass
+
+    server = await asyncio.start_server(lambda r, w: _handle_client(r, w, workers), host, port)
+    print(f"GPX Track Manager: {len(workers)} Worker hinter http://{host}:{port}")
+    supervisor = asyncio.create_task(_supervise(workers, stop_event))
+    try:
+        await stop_event.wait()
+    finally:
+        server.close()
+        supervisor.cancel()
+        for worker in workers:
+            worker.stop()
+        deadline = time.monotonic() + 10
+        for worker in workers:
+            if worker.process is not None:
+                try: worker.process.wait(timeout=max(0.1, deadline - time.monotonic()))
+                except subprocess.TimeoutExpired: worker.process.kill()
+    print("Server beendet.")
+    return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="GPX Track Manager im Produktionsmodus mit mehreren Worker-Prozessen starten.")
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS, help="Anzahl Worker-Prozesse (Standard: GPX_WORKERS bzw. CPU-Kerne)")
+    parser.add_argument("--host", default=os.environ.get("GPX_HOST", "0.0.0.0"), help="Öffentliche Adresse")
+    parser.add_argument("--port", type=int, default=settings.PORT, help="Öffentlicher Port; Worker nutzen die folgenden Ports")
+    parser.add_argument("--migrate", action="store_true", help="Ausstehende Schema-Migrationen vor dem Start anwenden")
+    args = parser.parse_args(argv)
+    return asyncio.run(run_server(args.host, args.port, args.workers, migrate=args.migrate))
+
+if __name__ == "__main__":
+    sys.exit(main())
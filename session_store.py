@@ -0,0 +1,164 @@
+# projekt_gpx_viewer/session_store.py
+"""
+SQLite-basierter Speicher für app.storage.user/general, gemeinsam nutzbar von mehreren Worker-Prozessen.
+
+NiceGUI legt pro Session ein PersistentDict an (Standard: eine JSON-Datei pro Prozessverzeichnis, optional Redis).
+install() tauscht die Fabrik gegen SqlitePersistentDict aus, das alle Einträge in einer WAL-SQLite-Datei hält.
+Jeder Schreibvorgang erhöht eine Versionsnummer; refresh_user_storage() lädt die Daten neu, wenn ein anderer
+Prozess sie inzwischen geändert hat (Aufruf zu Beginn jeder Seite).
+
+Geschrieben werden nur die seit dem letzten Laden/Speichern geänderten Schlüssel, in einer Transaktion über den
+aktuellen Stand der Zeile (BEGIN IMMEDIATE). Schreiben zwei Prozesse verschiedene Schlüssel derselben Session,
+bleiben beide erhalten; nur bei demselben Schlüssel gewinnt der letzte Schreiber.
+
+install() greift auf NiceGUI-Interna zu (Storage._create_persistent_dict, app.storage._general; geprüft mit
+NiceGUI 2.24) - bei einem NiceGUI-Update zuerst hier nachsehen.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from nicegui import app, background_tasks, core, json
+from nicegui.persistence import PersistentDict
+from nicegui.storage import Storage
+
+import settings
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def _connection() -> sqlite3.Connection:
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        settings.SESSION_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(settings.SESSION_DB_PATH, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    if not _schema_ready:
+        with _schema_lock:
+            conn.execute("CREATE TABLE IF NOT EXISTS storage (id TEXT PRIMARY KEY, data TEXT NOT NULL, "
+                         "version INTEGER NOT NULL DEFAULT 1, updated_at REAL NOT NULL)")
+            _schema_ready = True
+    return conn
+
+def _load(storage_id: str) -> Tuple[Dict, int]:
+    row = _connection().execute("SELECT data, version FROM storage WHERE id = ?", (storage_id,)).fetchone()
+    return (json.loads(row[0]), row[1]) if row else ({}, 0)
+
+def _load_version(storage_id: str) -> int:
+    row = _connection().execute("SELECT version FROM storage WHERE id = ?", (storage_id,)).fetchone()
+    return row[0] if row else 0
+
+def _save_changes(storage_id: str, changed: Dict[str, str], removed: List[str]) -> Tuple[int, int]:
+    """
+    Übernimmt geänderte (JSON je Schlüssel) und entfernte Schlüssel in den gespeicherten Stand, andere Schlüssel
+    bleiben unberührt. Rückgabe: (version_vorher, version_nachher).
+    """
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT data, version FROM storage WHERE id = ?", (storage_id,)).fetchone()
+        data = json.loads(row[0]) if row else {}
+        previous_version = row[1] if row else 0
+        for key in removed: data.pop(key, None)
+        data.update({key: json.loads(value_json) for key, value_json in changed.items()})
+        conn.execute("INSERT INTO storage (id, data, version, updated_at) VALUES (?, ?, ?, ?) "
+                     "ON CONFLICT(id) DO UPDATE SET data = excluded.data, version = excluded.version, updated_at = excluded.updated_at",
+                     (storage_id, json.dumps(data), previous_version + 1, time.time()))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return previous_version, previous_version + 1
+
+def _delete(storage_id: str):
+    _connection().execute("DELETE FROM storage WHERE id = ?", (storage_id,))
+
+class SqlitePersistentDict(PersistentDict):
+
+    def __init__(self, storage_id: str) -> None:
+        self.storage_id = storage_id
+        self.version = 0
+        self._loading = False
+        self._saved_json: Dict[str, str] = {}  # Stand je Schlüssel beim letzten Laden/Speichern
+        super().__init__(data={}, on_change=self.backup)
+
+    def _replace_data(self, data: Dict, version: int):
+        self._loading = True  # eigenes Neuladen soll keinen Schreibvorgang auslösen
+        try:
+            for key in [k for k in self if k not in data]:
+                del self[key]
+            self.update(data)
+        finally:
+            self._loading = False
+        self.version = version
+        self._saved_json = {key: json.dumps(value) for key, value in data.items()}
+
+    def _changes(self) -> Tuple[Dict[str, str], List[str]]:
+        current = {key: json.dumps(value) for key, value in self.items()}
+        changed = {key: value_json for key, value_json in current.items() if self._saved_json.get(key) != value_json}
+        return changed, [key for key in self._saved_json if key not in current]
+
+    def _mark_saved(self, changed: Dict[str, str], removed: List[str], versions: Tuple[int, int]):
+        self._saved_json.update(changed)
+        for key in removed: self._saved_json.pop(key, None)
+        # hat inzwischen ein anderer Prozess geschrieben, bleibt die Version alt und refresh() lädt dessen Schlüssel nach
+        if versions[0] == self.version:
+            self.version = versions[1]
+
+    async def initialize(self) -> None:
+        self._replace_data(*await asyncio.to_thread(_load, self.storage_id))
+
+    def initialize_sync(self) -> None:
+        self._replace_data(*_load(self.storage_id))
+
+    async def refresh(self) -> bool:
+        """Lädt neu, falls ein anderer Prozess eine neuere Version geschrieben hat. Rückgabe: True bei Neuladen."""
+        if await asyncio.to_thread(_load_version, self.storage_id) == self.version:
+            return False
+        self._replace_data(*await asyncio.to_thread(_load, self.storage_id))
+        return True
+
+    def backup(self) -> None:
+        if self._loading:
+            return
+        if not self and self.version == 0:
+            return
+
+        @background_tasks.await_on_shutdown
+        async def async_backup() -> None:
+            changed, removed = self._changes()  # erst beim Ausführen: zusammengefasste Änderungen in einem Schreibvorgang
+            if changed or removed:
+                self._mark_saved(changed, removed, await asyncio.to_thread(_save_changes, self.storage_id, changed, removed))
+
+        if core.loop and core.loop.is_running():
+            background_tasks.create_lazy(async_backup(), name=f"sqlite-storage-{self.storage_id}")
+        else:
+            changed, removed = self._changes()
+            if changed or removed:
+                self._mark_saved(changed, removed, _save_changes(self.storage_id, changed, removed))
+
+    def clear(self) -> None:
+        super().clear()
+        _delete(self.storage_id)
+        self.version = 0
+        self._saved_json = {}
+
+def install():
+    """Ersetzt NiceGUIs Datei-Speicher durch den SQLite-Speicher (vor ui.run aufrufen)."""
+    Storage._create_persistent_dict = staticmethod(lambda storage_id: SqlitePersistentDict(storage_id))  # pylint: disable=protected-access
+    # der general-Speicher wurde bereits beim Import von NiceGUI angelegt
+    app.storage._general = SqlitePersistentDict("general")  # pylint: disable=protected-access
+    app.storage._general.initialize_sync()  # pylint: disable=protected-access
+
+async def refresh_user_storage() -> Optional[bool]:
+    """Gleicht app.storage.user mit dem gemeinsamen Speicher ab (ohne Wirkung beim Datei-Speicher)."""
+    user_storage = app.storage.user
+    if isinstance(user_storage, SqlitePersistentDict):
+        return await user_storage.refresh()
+    return None
@@ -0,0 +1,114 @@
+# projekt_gpx_viewer/settings.py
+"""Zentrale Konfiguration. Alle Werte lassen sich über Umgebungsvariablen überschreiben."""
+import os
+from pathlib import Path
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Warnung: Ungültiger Wert für {name}={value!r}, verwende Standard {default}.")
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Warnung: Ungültiger Wert für {name}={value!r}, verwende Standard {default}.")
+        return default
+
+# Uploads
+MAX_UPLOAD_SIZE_MB = _env_int("GPX_MAX_UPLOAD_MB", 50)
+MAX_UPLOAD_SIZE_BYTES = MAX_UPLOAD_SIZE_MB * 1024 * 1024
+UPLOAD_CHUNK_SIZE_BYTES = 1024 * 1024
+MAX_ARCHIVE_UPLOAD_SIZE_MB = _env_int("GPX_MAX_ARCHIVE_UPLOAD_MB", 500)
+MAX_ARCHIVE_UPLOAD_SIZE_BYTES = MAX_ARCHIVE_UPLOAD_SIZE_MB * 1024 * 1024
+ARCHIVE_INGEST_CONCURRENCY = _env_int("GPX_ARCHIVE_INGEST_CONCURRENCY", 4)
+
+# Analysen
+ASCENT_HYSTERESIS_M = _env_float("GPX_ASCENT_HYSTERESIS_M", 5.0)
+
+# Hintergrund-Jobs
+JOB_WORKERS = _env_int("GPX_JOB_WORKERS", 2)
+
+# Löschen: Tracks landen zunächst im Papierkorb und lassen sich so lange wiederherstellen,
+# danach entfernt der Hintergrund-Aufräumer (file_gc.py) Zeile, GPX-Datei und abgeleitete Artefakte
+TRACK_DELETE_UNDO_WINDOW_S = _env_int("GPX_DELETE_UNDO_WINDOW_S", 300)
+FILE_GC_INTERVAL_S = _env_int("GPX_FILE_GC_INTERVAL_S", 60)
+FILE_GC_BATCH_SIZE = _env_int("GPX_FILE_GC_BATCH_SIZE", 200)
+# Abgleich Blob-Speicher <-> TrackDB.stored_filename; verwaiste Dateien erst ab diesem Alter löschen (laufende Schreibvorgänge)
+FILE_SCAN_INTERVAL_S = _env_int("GPX_FILE_SCAN_INTERVAL_S", 6 * 3600)
+FILE_SCAN_ORPHAN_MIN_AGE_S = _env_int("GPX_FILE_SCAN_ORPHAN_MIN_AGE_S", 3600)
+FILE_SCAN_WORKERS = _env_int("GPX_FILE_SCAN_WORKERS", 8)
+
+# Ablage der GPX-Originaldateien (blob_storage.py): "local" = gpx_uploads/ mit Hash-Unterverzeichnissen,
+# "s3" = S3-kompatibler Objektspeicher (AWS, MinIO, ...). Bestand im alten, flachen Layout übernimmt
+# "python blob_storage.py migrate".
+BLOB_BACKEND = os.environ.get("GPX_BLOB_BACKEND", "local").strip().lower()
+S3_ENDPOINT = os.environ.get("GPX_S3_ENDPOINT", "")  # z.B. http://127.0.0.1:9000 (MinIO)
+S3_BUCKET = os.environ.get("GPX_S3_BUCKET", "gpx-tracks")
+S3_REGION = os.environ.get("GPX_S3_REGION", "us-east-1")
+S3_ACCESS_KEY = os.environ.get("GPX_S3_ACCESS_KEY", "")
+S3_SECRET_KEY = os.environ.get("GPX_S3_SECRET_KEY", "")
+S3_PREFIX = os.environ.get("GPX_S3_PREFIX", "gpx/")
+S3_TIMEOUT_S = _env_float("GPX_S3_TIMEOUT_S", 30.0)
+S3_MAX_CONNECTIONS = _env_int("GPX_S3_MAX_CONNECTIONS", 32)  # je Prozess, synchron und asynchron getrennt
+BLOB_MIGRATE_CONCURRENCY = _env_int("GPX_BLOB_MIGRATE_CONCURRENCY", 16)
+
+# Server / Betrieb
+# GPX_MODE=dev: ein Prozess mit Auto-Reload (Standard). GPX_MODE=prod: ohne Reload, gestartet über serve.py.
+BASE_DIR = Path(__file__).resolve().parent
+MODE = os.environ.get("GPX_MODE", "dev").strip().lower()
+DEV_MODE = MODE != "prod"
+HOST = os.environ.get("GPX_HOST", "127.0.0.1" if DEV_MODE else "0.0.0.0")
+PORT = _env_int("GPX_PORT", 8081)
+SERVER_WORKERS = _env_int("GPX_WORKERS", os.cpu_count() or 1)
+STORAGE_SECRET = os.environ.get("GPX_STORAGE_SECRET", "")
+DEV_STORAGE_SECRET = "MEIN_SUPER_GEHEIMER_STORAGE_KEY_UNBEDINGT_AENDERN"  # nur für den Entwicklungsmodus
+DATABASE_PATH = Path(os.environ.get("GPX_DATABASE_PATH") or BASE_DIR / "tracks_users_sqlalchemy.db")
+# Gemeinsamer Speicher für app.storage (alle Worker-Prozesse), siehe session_store.py
+SESSION_DB_PATH = Path(os.environ.get("GPX_SESSION_DB_PATH") or BASE_DIR / ".nicegui" / "sessions.db")
+# Unterbrochene Jobs beim Start wieder einreihen; serve.py erledigt das einmal vor dem Start der Worker
+JOB_RECOVER_ON_START = _env_int("GPX_JOB_RECOVER", 1) == 1
+
+# Authentifizierung
+BCRYPT_ROUNDS = _env_int("GPX_BCRYPT_ROUNDS", 12)  # schwächere Hashes werden beim nächsten Login neu gehasht
+AUTH_THREADS = _env_int("GPX_AUTH_THREADS", 2)  # parallele bcrypt-Prüfungen, begrenzt die CPU-Last durch Logins
+# Schlüssel für die HMAC-Prüfsummen der 2FA-Codes (Standard: Storage-Secret)
+TWO_FA_SECRET = os.environ.get("GPX_2FA_SECRET") or STORAGE_SECRET or DEV_STORAGE_SECRET
+TWO_FA_CODE_LIFETIME_MINUTES = _env_int("GPX_2FA_CODE_LIFETIME_MIN", 10)
+# Prozesslokaler Cache für User-Datensätze (Header, 2FA-Dialog); TTL begrenzt die Verzögerung zwischen Worker-Prozessen
+USER_CACHE_SIZE = _env_int("GPX_USER_CACHE_SIZE", 1024)
+USER_CACHE_TTL_S = _env_float("GPX_USER_CACHE_TTL_S", 30.0)
+
+# Kartenkacheln (Proxy /tiles/{z}/{x}/{y}.png mit Plattencache, siehe tile_cache.py)
+TILE_UPSTREAM_URL = os.environ.get("GPX_TILE_UPSTREAM_URL", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+TILE_USER_AGENT = os.environ.get("GPX_TILE_USER_AGENT", "GPX-Track-Manager/1.0 (self-hosted; tile cache)")
+TILE_CACHE_DIR = Path(os.environ.get("GPX_TILE_CACHE_DIR") or BASE_DIR / "tile_cache")
+TILE_CACHE_MAX_MB = _env_int("GPX_TILE_CACHE_MAX_MB", 1024)
+TILE_DEFAULT_MAX_AGE_S = _env_int("GPX_TILE_DEFAULT_MAX_AGE_S", 7 * 24 * 3600)  # falls der Upstream keine Cache-Header sendet
+TILE_UPSTREAM_CONNECTIONS = _env_int("GPX_TILE_UPSTREAM_CONNECTIONS", 2)
+TILE_MAX_ZOOM = 19
+# Vorladen nach dem Upload: nur gegen einen eigenen Tile-Server - die OSM-Nutzungsrichtlinie verbietet Bulk-Abrufe,
+# gegen tile.openstreetmap.org bleibt es auch mit GPX_TILE_SEED=1 aus (tile_cache.seeding_enabled)
+TILE_SEED_ENABLED = _env_int("GPX_TILE_SEED", 0) == 1
+TILE_SEED_MIN_ZOOM = _env_int("GPX_TILE_SEED_MIN_ZOOM", 8)
+TILE_SEED_MAX_ZOOM = _env_int("GPX_TILE_SEED_MAX_ZOOM", 15)
+TILE_SEED_MAX_TILES = _env_int("GPX_TILE_SEED_MAX_TILES", 400)  # pro Track, höhere Zoomstufen fallen bei Überschreitung weg
+
+# Oberfläche
+# Filter- und Auswahländerungen werden so lange gesammelt, bevor Tabelle/Karte neu geladen werden
+UI_REFRESH_DEBOUNCE_S = _env_float("GPX_UI_REFRESH_DEBOUNCE_S", 0.25)
+# Höhenprofile: gespeicherte Auflösung pro Track und gemeinsames Punktbudget des Vergleichsdiagramms
+ELEVATION_PROFILE_POINTS = _env_int("GPX_ELEVATION_PROFILE_POINTS", 2000)
+ELEVATION_CHART_POINT_BUDGET = _env_int("GPX_ELEVATION_CHART_POINT_BUDGET", 4000)
+ELEVATION_CHART_MAX_TRACKS = _env_int("GPX_ELEVATION_CHART_MAX_TRACKS", 20)
+# Vorschaubilder der Streckenform in der Trackliste (Kantenlänge, Browser-Cache der versionierten URLs)
+THUMBNAIL_SIZE_PX = _env_int("GPX_THUMBNAIL_SIZE_PX", 48)
+THUMBNAIL_CACHE_MAX_AGE_S = _env_int("GPX_THUMBNAIL_CACHE_MAX_AGE_S", 365 * 24 * 3600)
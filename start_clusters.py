@@ -0,0 +1,85 @@
+# projekt_gpx_viewer/start_clusters.py
+"""
+Übersichtskarte: Startpunkte aller Tracks eines Users, serverseitig auf einem Raster pro Zoomstufe gruppiert.
+
+Grundlage sind die gespeicherten Spalten TrackDB.start_lat/start_lon. Die Rasterzellen sind CLUSTER_CELL_PX
+Bildschirmpixel groß, gemessen in Web-Mercator-Pixeln der Zoomstufe (wie die Karte selbst) - das Raster ist damit
+pro Zoomstufe global fest, Verschieben der Karte ändert die Gruppen nicht. Gebildet werden die Zellen per GROUP BY
+in SQLite - übertragen werden nur die Zellen im sichtbaren Ausschnitt, die
+Antwort wächst also mit der Zahl der sichtbaren Cluster, nicht mit der Zahl der Tracks.
+"""
+import math
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import Integer, cast, func, literal
+from sqlalchemy.orm import Session
+
+import db_config
+
+TILE_SIZE_PX = 256
+CLUSTER_CELL_PX = 64
+MAX_CLUSTERS = 2000  # Obergrenze pro Antwort, falls ein Client einen riesigen Ausschnitt meldet
+MAX_SELECT_TRACKS = 200  # jeder ausgewählte Track lädt seine Polylinie
+
+MAX_GRID_ROWS = 256  # Rasterzeilen pro Anfrage (ein Bildschirm hat weit weniger), begrenzt die Zahl der Zeilengrenzen
+MERCATOR_MAX_LAT = 85.0511287798
+
+def _world_px(zoom: int) -> float:
+    return TILE_SIZE_PX * 2.0 ** max(0, zoom)
+
+def mercator_y_px(lat: float, zoom: int) -> float:
+    """Web-Mercator-Pixelzeile (0 = Nordrand der Welt) eines Breitengrads auf der Zoomstufe."""
+    sin_lat = math.sin(math.radians(max(-MERCATOR_MAX_LAT, min(MERCATOR_MAX_LAT, lat))))
+    return (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * _world_px(zoom)
+
+def lat_for_mercator_y_px(y_px: float, zoom: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y_px / _world_px(zoom)))))
+
+def cell_lon_step_deg(zoom: int) -> float:
+    """Längenschritt einer Zelle; in Mercator-Pixeln ist die Länge linear, die Breite nicht (siehe get_start_clusters)."""
+    return 360.0 / (2 ** max(0, zoom)) * CLUSTER_CELL_PX / TILE_SIZE_PX
+
+def _clamp_bounds(south: float, west: float, north: float, east: float) -> Tuple[float, float, float, float]:
+    # Leaflet meldet nach mehrfachem Umrunden der Erde Längen außerhalb von ±180 - dann einfach alles
+    if east - west >= 360.0 or west < -180.0 or east > 180.0:
+        west, east = -180.0, 180.0
+    return max(-90.0, south), west, min(90.0, north), east
+
+def _active_starts(db: Session, user_id: int):
+    track = db_config.TrackDB
+    return db.query(track).filter(track.user_id == user_id, track.deleted_at.is_(None),
+                                  track.start_lat.isnot(None), track.start_lon.isnot(None))
+
+def get_start_clusters(db: Session, user_id: int, zoom: int, south: float, west: float, north: float, east: float) -> List[Dict[str, Any]]:
+    """
+    Cluster im Ausschnitt: [{lat, lon (Mittelwert), count, bounds [[s, w], [n, e]] der enthaltenen Startpunkte}, ...].
+    Die Zellgrenzen hängen nur vom Zoom ab (Mercator-Pixelraster), Verschieben der Karte ändert die Gruppen nicht.
+    """
+    south, west, north, east = _clamp_bounds(south, west, north, east)
+    top_row = int(mercator_y_px(north, zoom) // CLUSTER_CELL_PX)
+    bottom_row = min(int(mercator_y_px(south, zoom) // CLUSTER_CELL_PX), top_row + MAX_GRID_ROWS - 1)
+    # Rasterzeilen sind in Grad ungleich hoch: Zeile = oberste Zeile + Anzahl der Zeilengrenzen nördlich des Punktes,
+    # die Grenzen kommen als Parameter mit (SQLite hat ln()/tan() nicht immer)
+    boundaries = [lat_for_mercator_y_px(row * CLUSTER_CELL_PX, zoom) for row in range(top_row + 1, bottom_row + 2)]
+    south = max(south, boundaries[-1])  # bei mehr als MAX_GRID_ROWS Zeilen nur die nördlichen
+    track = db_config.TrackDB
+    cell_y = sum((cast(track.start_lat < boundary, Integer) for boundary in boundaries[:-1]), literal(top_row)).label("cell_y")
+    # +180 hält die Werte positiv, CAST schneidet dann wie floor() ab (SQLite hat floor() nicht immer)
+    cell_x = cast((track.start_lon + 180.0) / cell_lon_step_deg(zoom), Integer).label("cell_x")
+    rows = _active_starts(db, user_id) \
+        .filter(track.start_lat.between(south, north), track.start_lon.between(west, east)) \
+        .with_entities(cell_y, cell_x, func.count(), func.avg(track.start_lat), func.avg(track.start_lon),
+                       func.min(track.start_lat), func.min(track.start_lon), func.max(track.start_lat), func.max(track.start_lon)) \
+        .group_by(cell_y, cell_x).order_by(func.count().desc()).limit(MAX_CLUSTERS).all()
+    return [{"lat": round(avg_lat, 6), "lon": round(avg_lon, 6), "count": count,
+             "bounds": [[min_lat, min_lon], [max_lat, max_lon]]}
+            for _, _, count, avg_lat, avg_lon, min_lat, min_lon, max_lat, max_lon in rows]
+
+def get_track_ids_in_bounds(db: Session, user_id: int, south: float, west: float, north: float, east: float,
+                            limit: int = MAX_SELECT_TRACKS) -> List[int]:
+    """Track-IDs, deren Startpunkt im Rechteck liegt (für das Auswählen eines Clusters), neueste zuerst."""
+    track = db_config.TrackDB
+    rows = _active_starts(db, user_id) \
+        .filter(track.start_lat.between(south, north), track.start_lon.between(west, east)) \
+        .with_entities(track.id).order_by(track.track_date.desc().nullslast(), track.id.desc()).limit(limit).all()
+    return [track_id for (track_id,) in rows]
@@ -0,0 +1,65 @@
+// Übersichtskarte: vom Server gruppierte Track-Startpunkte (start_clusters.py) als Zahl-Marker.
+// Nach jedem Verschieben/Zoomen meldet die Karte ihren Ausschnitt ('start_clusters_viewport'), der Server
+// antwortet mit set(). Klick auf einen Cluster zoomt hinein; einzelne bzw. nicht weiter teilbare Cluster
+// (oder Strg/Cmd+Klick) werden ausgewählt ('start_clusters_select').
+window.gpxStartClusters = (() => {
+  const stores = {};
+
+  function withMap(mapId, action) {
+    const map = getElement(mapId)?.map;
+    if (!map) { setTimeout(() => withMap(mapId, action), 100); return; }
+    action(map, (stores[mapId] ??= { layer: null, onMove: null, seq: 0 }));
+  }
+
+  function reportViewport(mapId, map, store) {
+    const b = map.getBounds();
+    emitEvent('start_clusters_viewport', {
+      map_id: mapId, seq: ++store.seq, zoom: map.getZoom(),
+      south: b.getSouth(), west: b.getWest(), north: b.getNorth(), east: b.getEast(),
+    });
+  }
+
+  function enable(mapId, enabled) {
+    withMap(mapId, (map, store) => {
+      if (store.onMove) { map.off('moveend', store.onMove); store.onMove = null; }
+      if (store.layer) { map.removeLayer(store.layer); store.layer = null; }
+      if (!enabled) return;
+      store.layer = L.layerGroup().addTo(map);
+      store.onMove = () => reportViewport(mapId, map, store);
+      map.on('moveend', store.onMove);
+      reportViewport(mapId, map, store);
+    });
+  }
+
+  function icon(count) {
+    const size = count === 1 ? 14 : Math.round(Math.min(44, 20 + 6 * Math.log10(count)));
+    return L.divIcon({
+      className: '', iconSize: [size, size],
+      html: `<div style="width:${size}px;height:${size}px;border-radius:50%;background:rgba(25,118,210,0.8);`
+        + `box-sizing:border-box;border:2px solid #fff;color:#fff;font:bold 11px/${size - 4}px sans-serif;text-align:center;">`
+        + `${count === 1 ? '' : count}</div>`,
+    });
+  }
+
+  function set(mapId, seq, clusters) {
+    withMap(mapId, (map, store) => {
+      if (!store.layer || seq !== store.seq) return;  // veraltete Antwort auf einen früheren Ausschnitt
+      store.layer.clearLayers();
+      for (const cluster of clusters) {
+        const marker = L.marker([cluster.lat, cluster.lon], { icon: icon(cluster.count) });
+        marker.bindTooltip(cluster.count === 1 ? '1 Track' : `${cluster.count} Tracks`);
+        marker.on('click', (e) => {
+          const bounds = L.latLngBounds(cluster.bounds);
+          const splittable = cluster.count > 1 && !bounds.getSouthWest().equals(bounds.getNorthEast())
+            && map.getZoom() < map.getMaxZoom();
+          const selectOnly = e.originalEvent && (e.originalEvent.ctrlKey || e.originalEvent.metaKey);
+          if (splittable && !selectOnly) map.fitBounds(bounds.pad(0.2));
+          else emitEvent('start_clusters_select', { map_id: mapId, bounds: cluster.bounds });
+        });
+        store.layer.addLayer(marker);
+      }
+    });
+  }
+
+  return { enable, set };
+})();
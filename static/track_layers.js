@@ -0,0 +1,68 @@
+// Browserseitiger Speicher für Track-Polylinien, je Leaflet-Karte (NiceGUI-Element-ID).
+// Der Server schickt die Geometrie eines Tracks nur einmal pro Seite; Auswahländerungen blenden die
+// gespeicherten Layer danach nur noch ein/aus (siehe update_map_and_related_stats in main.py).
+window.gpxTrackLayers = (() => {
+  const stores = {};
+
+  function getStore(mapId) {
+    return (stores[mapId] ??= { layers: new Map(), visible: new Set(), queue: [], timer: null });
+  }
+
+  // Leaflet lädt asynchron; Aufrufe vor der Initialisierung der Karte werden in Reihenfolge nachgeholt.
+  function flush(mapId) {
+    const store = getStore(mapId);
+    const map = getElement(mapId)?.map;
+    if (!map) {
+      store.timer ??= setTimeout(() => { store.timer = null; flush(mapId); }, 100);
+      return;
+    }
+    while (store.queue.length) store.queue.shift()(map, store);
+  }
+
+  function run(mapId, action) {
+    getStore(mapId).queue.push(action);
+    flush(mapId);
+  }
+
+  function add(mapId, tracks, style) {
+    run(mapId, (map, store) => {
+      for (const [trackId, points] of Object.entries(tracks)) {
+        const id = Number(trackId);
+        if (store.layers.has(id)) map.removeLayer(store.layers.get(id));
+        store.layers.set(id, L.polyline(points, style));
+        store.visible.delete(id);
+      }
+    });
+  }
+
+  function show(mapId, trackIds, fit, defaultView) {
+    run(mapId, (map, store) => {
+      const wanted = new Set(trackIds);
+      for (const id of store.visible) {
+        if (!wanted.has(id)) { map.removeLayer(store.layers.get(id)); store.visible.delete(id); }
+      }
+      let bounds = null;
+      for (const id of wanted) {
+        const layer = store.layers.get(id);
+        if (!layer || !layer.getLatLngs().length) continue;
+        if (!store.visible.has(id)) { layer.addTo(map); store.visible.add(id); }
+        bounds = bounds ? bounds.extend(layer.getBounds()) : L.latLngBounds(layer.getBounds().getSouthWest(), layer.getBounds().getNorthEast());
+      }
+      if (fit && bounds) map.fitBounds(bounds);
+      else if (!bounds && defaultView) map.setView(defaultView.center, defaultView.zoom);
+    });
+  }
+
+  function forget(mapId, trackIds) {
+    run(mapId, (map, store) => {
+      for (const id of trackIds) {
+        const layer = store.layers.get(id);
+        if (layer) map.removeLayer(layer);
+        store.layers.delete(id);
+        store.visible.delete(id);
+      }
+    });
+  }
+
+  return { add, show, forget };
+})();
@@ -0,0 +1,5 @@
+# Tests importieren die Module flach aus dem Projektverzeichnis (wie main.py)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
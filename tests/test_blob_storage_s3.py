@@ -0,0 +1,104 @@
+"""
+S3Store gegen einen echten S3-kompatiblen Endpunkt (z.B. lokaler MinIO), ohne GPX_S3_ENDPOINT übersprungen:
+
+    GPX_S3_ENDPOINT=http://127.0.0.1:9000 GPX_S3_ACCESS_KEY=... GPX_S3_SECRET_KEY=... python -m pytest tests/test_blob_storage_s3.py
+
+Der Bucket (GPX_S3_BUCKET) wird bei Bedarf angelegt; jeder Lauf arbeitet unter einem eigenen Präfix.
+"""
+import asyncio
+import hashlib
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+import blob_storage
+import db_config
+import settings
+
+pytestmark = pytest.mark.skipif(not settings.S3_ENDPOINT, reason="GPX_S3_ENDPOINT nicht gesetzt")
+
+def _ensure_bucket(store: blob_storage.S3Store):
+    path = "/" + store.bucket
+    url, signed = store._request_args("PUT", path)  # pylint: disable=protected-access
+    response = store._client.put(url, headers=signed)  # pylint: disable=protected-access
+    assert response.status_code < 300 or response.status_code == 409, response.text  # 409: existiert bereits
+
+@pytest.fixture
+def incoming_dir(tmp_path, monkeypatch) -> Path:
+    """Temp-Dateien (Upload, Download) im Testverzeichnis statt in GPX_UPLOAD_DIR."""
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    monkeypatch.setattr(db_config, "GPX_INCOMING_DIR", incoming)
+    return incoming
+
+def _make_store(legacy=None) -> blob_storage.S3Store:
+    store = blob_storage.S3Store(settings.S3_ENDPOINT, settings.S3_BUCKET, settings.S3_ACCESS_KEY, settings.S3_SECRET_KEY,
+                                 region=settings.S3_REGION, prefix=f"test-{uuid.uuid4().hex[:12]}/", legacy=legacy)
+    _ensure_bucket(store)
+    return store
+
+def test_put_get_delete_roundtrip(incoming_dir):
+    store = _make_store()
+    data = b"<gpx>" + bytes(range(256)) * 100 + b"</gpx>"
+    store.put_bytes("a.gpx", data)
+    assert store.exists("a.gpx")
+    assert store.get_bytes("a.gpx") == data
+    with store.local_file("a.gpx") as path:
+        assert path is not None and path.read_bytes() == data
+        download = path
+    assert not download.exists()  # Temp-Datei nach dem with-Block entfernt
+    assert store.delete("a.gpx")
+    assert not store.exists("a.gpx")
+    assert store.get_bytes("a.gpx") is None
+    with store.local_file("a.gpx") as path:
+        assert path is None
+    assert list(incoming_dir.iterdir()) == []
+
+def test_put_file_consumes_source_and_lists_keys(incoming_dir):
+    store = _make_store()
+    started = time.time()
+    for i in range(3):
+        source = incoming_dir / f"upload{i}.part"
+        source.write_bytes(f"track {i}".encode())
+        store.put_file(f"t{i}.gpx", source)
+        assert not source.exists()
+    keys = store.list_keys()
+    assert sorted(keys) == ["t0.gpx", "t1.gpx", "t2.gpx"]
+    assert all(mtime > started - 300 for mtime in keys.values())
+    for key in keys: store.delete(key)
+    assert store.list_keys() == {}
+
+def test_async_methods(incoming_dir):
+    store = _make_store()
+    data = hashlib.sha256(b"x").digest() * 1000
+
+    async def scenario():
+        try:
+            await asyncio.gather(*(store.aput_bytes(f"k{i}.gpx", data) for i in range(10)))
+            assert await store.aexists("k3.gpx")
+            assert await store.aget_bytes("k3.gpx") == data
+            assert await store.aget_bytes("fehlt.gpx") is None
+            await asyncio.gather(*(store.adelete(f"k{i}.gpx") for i in range(10)))
+            assert not await store.aexists("k3.gpx")
+        finally:
+            await store.aclose()
+    asyncio.run(scenario())
+
+def test_legacy_files_are_read_and_deleted(incoming_dir, tmp_path):
+    legacy = blob_storage.LocalShardedStore(tmp_path / "uploads")
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "alt.gpx").write_bytes(b"lokal")
+    store = _make_store(legacy=legacy)
+    assert store.exists("alt.gpx")
+    assert store.get_bytes("alt.gpx") == b"lokal"
+    assert "alt.gpx" in store.list_keys()
+    assert store.delete("alt.gpx")
+    assert not store.exists("alt.gpx")
+    assert not (tmp_path / "uploads" / "alt.gpx").exists()
+
+def test_invalid_key_is_rejected(incoming_dir):
+    store = _make_store()
+    with pytest.raises(ValueError):
+        store.put_bytes("../a.gpx", b"x")
@@ -0,0 +1,87 @@
+"""Zählt gestartete/abgeschlossene Refreshs des RefreshScheduler für typische Eingabefolgen."""
+import asyncio
+
+from refresh_scheduler import REFRESH_FULL, REFRESH_MAP, RefreshScheduler
+
+DELAY_S = 0.05
+REFRESH_S = 0.04
+
+class FakePage:
+    """Ein Refresh liest den Zustand beim Start und braucht REFRESH_S."""
+    def __init__(self):
+        self.state = None
+        self.applied = []
+
+    async def run_refresh(self, level: int):
+        state = self.state
+        await asyncio.sleep(REFRESH_S)
+        self.applied.append((level, state))
+
+def _run(events, delay_s: float = DELAY_S):
+    """events: (Pause vorher in s, Stufe, Zustand). Rückgabe: (FakePage, Scheduler) nach Leerlauf."""
+    async def scenario():
+        page = FakePage()
+        scheduler = RefreshScheduler(page.run_refresh, delay_s)
+        for pause_s, level, state in events:
+            if pause_s: await asyncio.sleep(pause_s)
+            page.state = state
+            scheduler.request(level)
+        await scheduler.wait_idle()
+        return page, scheduler
+    return asyncio.run(scenario())
+
+def test_debounce_collapses_burst_into_one_refresh():
+    page, scheduler = _run([(DELAY_S / 10, REFRESH_MAP, i) for i in range(30)])
+    assert scheduler.stats() == {"requested": 30, "executed": 1, "completed": 1, "superseded": 0}
+    assert page.applied == [(REFRESH_MAP, 29)]
+
+def test_spaced_requests_run_separately():
+    page, scheduler = _run([(0, REFRESH_MAP, "a"), (DELAY_S + REFRESH_S * 2, REFRESH_MAP, "b")])
+    assert scheduler.stats()["executed"] == 2
+    assert page.applied == [(REFRESH_MAP, "a"), (REFRESH_MAP, "b")]
+
+def test_collapsed_requests_use_highest_level():
+    page, scheduler = _run([(0, REFRESH_FULL, "filter"), (DELAY_S / 10, REFRESH_MAP, "filter+auswahl")])
+    assert scheduler.stats()["executed"] == 1
+    assert page.applied == [(REFRESH_FULL, "filter+auswahl")]
+
+def test_running_refresh_is_superseded_and_keeps_its_level():
+    page, scheduler = _run([(0, REFRESH_FULL, "filter"), (DELAY_S + REFRESH_S / 2, REFRESH_MAP, "filter+auswahl")])
+    assert scheduler.stats() == {"requested": 2, "executed": 2, "completed": 1, "superseded": 1}
+    assert page.applied == [(REFRESH_FULL, "filter+auswahl")]
+
+def test_superseded_refresh_does_not_count_again_while_successor_waits():
+    page, scheduler = _run([(0, REFRESH_FULL, "filter"), (DELAY_S + REFRESH_S / 2, REFRESH_MAP, "auswahl"),
+                            (DELAY_S / 10, REFRESH_MAP, "auswahl2")])
+    assert scheduler.stats() == {"requested": 3, "executed": 2, "completed": 1, "superseded": 1}
+    assert page.applied == [(REFRESH_FULL, "auswahl2")]
+
+def test_level_of_cancelled_refresh_is_not_inherited():
+    async def scenario():
+        page = FakePage()
+        scheduler = RefreshScheduler(page.run_refresh, DELAY_S)
+        scheduler.request(REFRESH_FULL)
+        await asyncio.sleep(DELAY_S + REFRESH_S / 2)
+        scheduler.request(REFRESH_MAP)  # bricht den laufenden vollen Refresh ab
+        await asyncio.sleep(0)
+        scheduler.cancel()  # Verbindungsabbruch: alles verwerfen
+        scheduler.request(REFRESH_MAP)
+        await scheduler.wait_idle()
+        return page, scheduler
+    page, scheduler = asyncio.run(scenario())
+    assert page.applied == [(REFRESH_MAP, None)]
+
+def test_cancel_discards_pending_and_running_refresh():
+    async def scenario():
+        page = FakePage()
+        scheduler = RefreshScheduler(page.run_refresh, DELAY_S)
+        scheduler.request(REFRESH_FULL)
+        await asyncio.sleep(DELAY_S + REFRESH_S / 2)
+        scheduler.cancel()
+        await scheduler.wait_idle()
+        scheduler.request(REFRESH_MAP)  # später, z.B. nach erneutem Verbinden
+        await scheduler.wait_idle()
+        return page, scheduler
+    page, scheduler = asyncio.run(scenario())
+    assert page.applied == [(REFRESH_MAP, None)]
+    assert scheduler.stats() == {"requested": 2, "executed": 2, "completed": 1, "superseded": 0}
@@ -0,0 +1,39 @@
+"""Start-Cluster auf einer In-Memory-Datenbank: das Raster hängt nur vom Zoom ab, nicht vom Kartenausschnitt."""
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import db_config
+import start_clusters
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    db_config.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(db_config.UserDB(id=1, username="test", email="test@example.org", hashed_password="x"))
+    session.commit()
+    rng = random.Random(7)
+    for i in range(300):
+        session.add(db_config.TrackDB(user_id=1, name=f"t{i}", original_filename=f"t{i}.gpx", stored_filename=f"t{i}.gpx",
+                                      start_lat=rng.uniform(47.0, 48.0), start_lon=rng.uniform(11.0, 12.0)))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def _clusters(db, zoom, south, west, north, east):
+    return sorted((c["count"], c["lat"], c["lon"]) for c in start_clusters.get_start_clusters(db, 1, zoom, south, west, north, east))
+
+@pytest.mark.parametrize("zoom", [6, 9, 12])
+def test_panning_keeps_clusters(db, zoom):
+    reference = _clusters(db, zoom, 46.5, 10.5, 48.5, 12.5)
+    assert sum(count for count, _, _ in reference) == 300
+    assert _clusters(db, zoom, 46.9, 10.9, 49.7, 12.1) == reference  # nach Norden verschoben
+    assert _clusters(db, zoom, 40.0, 10.0, 48.1, 13.0) == reference  # nach Süden verschoben, größer
+
+def test_single_row_viewport(db):
+    clusters = start_clusters.get_start_clusters(db, 1, 2, 47.0, 11.0, 48.0, 12.0)
+    assert [c["count"] for c in clusters] == [300]
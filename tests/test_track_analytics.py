@@ -0,0 +1,37 @@
+"""Kennzahlen aus analyze_point_arrays für synthetische Tracks mit bekannter Geschwindigkeit."""
+import numpy as np
+
+from track_analytics import analyze_point_arrays
+
+SPEED_MPS = 5.0
+METERS_PER_DEG_LAT = 6371000.0 * np.pi / 180.0
+
+def _track_with_stop(moving_s: int = 200, stop_s: int = 60):
+    """Nach Norden mit SPEED_MPS, ein Punkt pro Sekunde; dazwischen stop_s Sekunden an derselben Stelle."""
+    distance_m = np.concatenate((np.arange(moving_s + 1) * SPEED_MPS,
+                                 np.full(stop_s, moving_s * SPEED_MPS),
+                                 (moving_s + np.arange(1, moving_s + 1)) * SPEED_MPS))
+    lat = 47.0 + distance_m / METERS_PER_DEG_LAT
+    lon = np.full(lat.size, 11.0)
+    ele = np.full(lat.size, 500.0)
+    time_s = 1_700_000_000.0 + np.arange(lat.size, dtype=np.float64)
+    return lat, lon, ele, time_s
+
+def test_stop_keeps_real_timestamps():
+    lat, lon, ele, time_s = _track_with_stop()
+    result = analyze_point_arrays(lat, lon, ele, time_s)
+    assert abs(result["max_speed_kmh"] - SPEED_MPS * 3.6) < 0.2
+    assert abs(result["avg_moving_speed_kmh"] - SPEED_MPS * 3.6) < 0.2
+    assert result["moving_time_s"] == 400.0  # jede Sekunde in Bewegung zählt, auch die erste nach der Pause
+    assert [split["duration_s"] for split in result["splits"][:2]] == [200.0, 260.0]  # Pause im zweiten Kilometer
+    assert result["elapsed_time_s"] == time_s[-1] - time_s[0]
+
+def test_missing_timestamps_filled_by_point_index():
+    lat, lon, ele, time_s = _track_with_stop()
+    complete = analyze_point_arrays(lat, lon, ele, time_s)
+    gappy = time_s.copy()
+    gappy[210:250] = np.nan  # mitten in der Pause
+    gappy[50:55] = np.nan
+    result = analyze_point_arrays(lat, lon, ele, gappy)
+    for key in ("max_speed_kmh", "avg_moving_speed_kmh", "moving_time_s", "elapsed_time_s"):
+        assert abs(result[key] - complete[key]) < 0.2, key
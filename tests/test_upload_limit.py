@@ -0,0 +1,67 @@
+"""UploadSizeLimitMiddleware vor einer Upload-Route, die wie ui.upload den Multipart-Body liest."""
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import ingest
+import settings
+
+UPLOAD_PATH = "/_nicegui/client/abc/upload/1"
+MB = 1024 * 1024
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE_BYTES", 1 * MB)
+    monkeypatch.setattr(settings, "MAX_ARCHIVE_UPLOAD_SIZE_BYTES", 4 * MB)
+    received = {}
+
+    async def upload_route(request: Request):
+        form = await request.form()
+        received.update({name: len(await upload.read()) for name, upload in form.items()})
+        return JSONResponse({"upload": "success"})
+
+    app = Starlette(routes=[Route(UPLOAD_PATH, upload_route, methods=["POST"])])
+    app.add_middleware(ingest.UploadSizeLimitMiddleware)
+    test_client = TestClient(app)
+    test_client.received = received
+    return test_client
+
+def _chunks(data: bytes, size: int = 64 * 1024):
+    """Ohne Content-Length (chunked), damit nur die laufende Zählung greift."""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def _multipart(filename: str, size: int):
+    boundary = "testboundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            "Content-Type: application/octet-stream\r\n\r\n").encode() + b"x" * size + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"content-type": f"multipart/form-data; boundary={boundary}"}
+
+def test_small_track_file_passes(client):
+    body, headers = _multipart("a.gpx", MB // 2)
+    response = client.post(UPLOAD_PATH, content=_chunks(body), headers=headers)
+    assert response.status_code == 200
+    assert client.received == {"file": MB // 2}
+
+def test_track_file_over_its_limit_is_cut_off_while_streaming(client):
+    body, headers = _multipart("a.gpx", 3 * MB)  # unter dem Archiv-, über dem Datei-Limit
+    response = client.post(UPLOAD_PATH, content=_chunks(body), headers=headers)
+    assert response.status_code == 413
+    assert client.received == {}
+
+def test_archive_may_use_archive_limit(client):
+    body, headers = _multipart("a.zip", 3 * MB)
+    assert client.post(UPLOAD_PATH, content=_chunks(body), headers=headers).status_code == 200
+
+def test_content_length_over_archive_limit_is_rejected_upfront(client):
+    body, headers = _multipart("a.zip", 5 * MB)
+    response = client.post(UPLOAD_PATH, content=body, headers=headers)
+    assert response.status_code == 413
+    assert client.received == {}
+
+def test_other_routes_are_not_limited(client):
+    body, headers = _multipart("a.gpx", 3 * MB)
+    assert client.post("/other", content=_chunks(body), headers=headers).status_code == 404
@@ -0,0 +1,116 @@
+# projekt_gpx_viewer/thumbnails.py
+"""
+Vorschaubilder der Streckenform (SVG) für die Trackliste, erzeugt vom Prozessor 'thumbnail'
+(track_processing.py) und unter derived/thumbnails/<track_id>.svg abgelegt.
+
+Die Geometrie wird in Pixelkoordinaten projiziert (Breitengrad-korrigiert) und auf ein Halbpixel-Raster
+vereinfacht, ein Thumbnail bleibt so unabhängig von der Punktzahl bei wenigen hundert Bytes. Ausgeliefert
+werden die Dateien über /thumbnails/<id>.svg?v=<version>-<inhalts-hash> mit langer Cache-Dauer - nach
+einer Bearbeitung ändert sich der Hash und damit die URL. Jede Datei trägt diesen Schlüssel als Kommentar
+am Anfang; passt er nicht zum aktuellen Stand des Tracks (Datei fehlt, Job noch nicht gelaufen, Bearbeitung
+noch nicht fertig geschrieben), wird das Bild einmalig aus der GPX-Datei des Tracks erzeugt.
+"""
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+import blob_storage
+import db_config
+import gpx_utils
+import settings
+
+THUMBNAIL_VERSION = 1  # Prozessor-Version, auch Teil der URL: erhöhen, wenn sich die Darstellung ändert
+THUMBNAIL_PADDING_PX = 3
+# Raster der Vereinfachung; feiner als ein Pixel, damit kurze Zacken sichtbar bleiben
+SIMPLIFY_GRID_PX = 0.5
+MAX_THUMBNAIL_POINTS = 500
+STROKE_COLOR = "#1976d2"
+
+def simplify_to_pixels(lat: np.ndarray, lon: np.ndarray, size_px: int) -> np.ndarray:
+    """Projiziert auf eine size_px x size_px-Fläche (Seitenverhältnis bleibt) und entfernt Punkte im selben Rasterfeld. Form (n, 2)."""
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon = lat[valid], lon[valid]
+    if lat.size < 2:
+        return np.empty((0, 2))
+    x = lon * np.cos(np.radians(lat.mean()))
+    y = -lat  # Norden oben
+    extent = max(x.max() - x.min(), y.max() - y.min()) or 1.0
+    drawable_px = size_px - 2 * THUMBNAIL_PADDING_PX
+    scale = drawable_px / extent
+    offset_x = THUMBNAIL_PADDING_PX + (drawable_px - (x.max() - x.min()) * scale) / 2
+    offset_y = THUMBNAIL_PADDING_PX + (drawable_px - (y.max() - y.min()) * scale) / 2
+    pixels = np.column_stack(((x - x.min()) * scale + offset_x, (y - y.min()) * scale + offset_y))
+    cells = np.round(pixels / SIMPLIFY_GRID_PX).astype(np.int64)
+    keep = np.ones(len(cells), dtype=bool)
+    keep[1:] = np.any(cells[1:] != cells[:-1], axis=1)
+    keep[-1] = True
+    pixels = pixels[keep]
+    if len(pixels) > MAX_THUMBNAIL_POINTS:
+        pixels = pixels[np.unique(np.linspace(0, len(pixels) - 1, MAX_THUMBNAIL_POINTS).astype(np.int64))]
+    return pixels
+
+def render_thumbnail_svg(lat: np.ndarray, lon: np.ndarray, size_px: Optional[int] = None) -> bytes:
+    """SVG mit Streckenverlauf sowie Start- (grün) und Zielpunkt (rot); ohne Punkte ein leeres Bild."""
+    size_px = size_px or settings.THUMBNAIL_SIZE_PX
+    pixels = simplify_to_pixels(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64), size_px)
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{size_px}" height="{size_px}" viewBox="0 0 {size_px} {size_px}">']
+    if len(pixels):
+        points_attr = " ".join(f"{px:.1f},{py:.1f}" for px, py in pixels.tolist())
+        parts.append(f'<polyline points="{points_attr}" fill="none" stroke="{STROKE_COLOR}" stroke-width="1.5" '
+                     'stroke-linejoin="round" stroke-linecap="round"/>')
+        (start_x, start_y), (end_x, end_y) = pixels[0], pixels[-1]
+        parts.append(f'<circle cx="{end_x:.1f}" cy="{end_y:.1f}" r="2" fill="#c62828"/>')
+        parts.append(f'<circle cx="{start_x:.1f}" cy="{start_y:.1f}" r="2" fill="#2e7d32"/>')
+    parts.append("</svg>")
+    return "".join(parts).encode("utf-8")
+
+def thumbnail_key(track: db_config.TrackDB) -> str:
+    """Darstellungs-Version und Inhalts-Hash: Teil der URL und in der gespeicherten Datei vermerkt."""
+    return f"{THUMBNAIL_VERSION}-{(track.content_sha256 or track.stored_filename or '')[:12]}"
+
+def _key_comment(key: str) -> bytes:
+    return f"<!-- {key} -->".encode("utf-8")
+
+def compute_thumbnail_from_gpx_file(gpx_filepath_str: str) -> Optional[bytes]:
+    point_arrays = gpx_utils.get_point_arrays_from_gpx_file(gpx_filepath_str)
+    if point_arrays is None:
+        return None
+    return render_thumbnail_svg(point_arrays["lat"], point_arrays["lon"])
+
+def save_thumbnail(track_id: int, svg: bytes, key: str):
+    """Schreibt atomar (Temp-Datei + os.replace), parallele Leser sehen nie eine halbe Datei. key: siehe thumbnail_key."""
+    target_path = db_config.get_thumbnail_filepath(track_id)
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = target_path.with_name(f".{target_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temp_path.write_bytes(_key_comment(key) + svg)
+    os.replace(temp_path, target_path)
+
+def load_thumbnail(track_id: int, key: str) -> Optional[bytes]:
+    """Gespeichertes Thumbnail, nur wenn es zum Schlüssel passt (sonst None)."""
+    try:
+        svg = db_config.get_thumbnail_filepath(track_id).read_bytes()
+    except FileNotFoundError:
+        return None
+    return svg if svg.startswith(_key_comment(key)) else None
+
+def load_or_render_thumbnail(track: db_config.TrackDB) -> Optional[bytes]:
+    """
+    Gespeichertes Thumbnail zum aktuellen Inhalt oder neu aus der GPX-Datei erzeugt; None, wenn sie fehlt.
+    Nicht aus dem Punktspeicher: der kann kurz nach einer Bearbeitung noch den alten Inhalt halten.
+    """
+    key = thumbnail_key(track)
+    svg = load_thumbnail(track.id, key)
+    if svg is not None:
+        return svg
+    with blob_storage.get_store().local_file(track.stored_filename) as gpx_file_path:
+        svg = compute_thumbnail_from_gpx_file(str(gpx_file_path)) if gpx_file_path is not None else None
+    if svg is None:
+        return None
+    save_thumbnail(track.id, svg, key)
+    return _key_comment(key) + svg
+
+def thumbnail_url(track: db_config.TrackDB) -> str:
+    """URL mit Inhalts-Hash als Version, damit die lange Cache-Dauer nach Bearbeitungen nicht greift."""
+    return f"/thumbnails/{track.id}.svg?v={thumbnail_key(track)}"
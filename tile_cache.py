@@ -0,0 +1,276 @@
+# projekt_gpx_viewer/tile_cache.py
+"""
+Proxy für Kartenkacheln mit Plattencache (Route /tiles/{z}/{x}/{y}.png in main.py).
+
+Kacheln liegen als TILE_CACHE_DIR/z/x/y.png, daneben y.meta mit Ablaufzeit, ETag und Last-Modified aus den
+Upstream-Headern. Frische Kacheln kommen direkt von der Platte; abgelaufene werden per If-None-Match/
+If-Modified-Since revalidiert, bei Upstream-Fehlern wird die alte Kachel weiter ausgeliefert. Gleichzeitige
+Anfragen nach derselben Kachel lösen nur einen Upstream-Abruf aus. Überschreitet der Cache TILE_CACHE_MAX_MB,
+werden die am längsten nicht genutzten Kacheln gelöscht (LRU über die mtime, die bei Treffern aufgefrischt wird).
+
+Der Upstream (Standard: tile.openstreetmap.org) ist über GPX_TILE_UPSTREAM_URL austauschbar, z.B. gegen einen
+lokalen Ersatz-Server für Tests. Mit GPX_TILE_SEED=1 und einem eigenen Upstream lädt nach dem Upload eines
+Tracks ein Job 'seed_tiles' die Kacheln seiner Bounding-Box für die Zoomstufen TILE_SEED_MIN_ZOOM..TILE_SEED_MAX_ZOOM
+vor. Gegen die öffentlichen OSM-Server wird nie vorgeladen: deren Nutzungsrichtlinie untersagt Bulk-Abrufe.
+"""
+import email.utils
+import math
+import os
+import re
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy.orm import Session
+
+import job_queue
+import settings
+
+JOB_KIND_SEED_TILES = "seed_tiles"
+UPSTREAM_TIMEOUT_S = 10.0
+STALE_MAX_AGE_S = 60  # Browser-Cachezeit für abgelaufene Kacheln, die wegen Upstream-Fehlern ausgeliefert werden
+LRU_TOUCH_INTERVAL_S = 3600  # mtime höchstens stündlich auffrischen, spart Schreibzugriffe bei Treffern
+EVICTION_TARGET_RATIO = 0.9
+
+# (PNG-Bytes, verbleibende Gültigkeit in Sekunden)
+TileResult = Tuple[bytes, int]
+TileKey = Tuple[int, int, int]
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+_inflight: Dict[TileKey, threading.Event] = {}
+_inflight_lock = threading.Lock()
+_size_lock = threading.Lock()
+_cache_size_bytes: Optional[int] = None
+_eviction_running = False
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= settings.TILE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+def _tile_path(z: int, x: int, y: int) -> Path:
+    return settings.TILE_CACHE_DIR / str(z) / str(x) / f"{y}.png"
+
+def _get_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    headers={"User-Agent": settings.TILE_USER_AGENT}, timeout=UPSTREAM_TIMEOUT_S, follow_redirects=True,
+                    limits=httpx.Limits(max_connections=max(1, settings.TILE_UPSTREAM_CONNECTIONS)))
+    return _client
+
+def close():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+def _read_meta(tile_path: Path) -> Tuple[float, Optional[str], Optional[str]]:
+    """(Ablaufzeit, ETag, Last-Modified); fehlende/kaputte Metadaten gelten als abgelaufen."""
+    try:
+        expires_str, etag, last_modified = tile_path.with_suffix(".meta").read_text(encoding="utf-8").split("\n")[:3]
+        return float(expires_str), etag or None, last_modified or None
+    except (OSError, ValueError):
+        return 0.0, None, None
+
+def _write_atomic(path: Path, data: bytes):
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+def _write_meta(tile_path: Path, expires: float, etag: Optional[str], last_modified: Optional[str]):
+    _write_atomic(tile_path.with_suffix(".meta"), f"{expires}\n{etag or ''}\n{last_modified or ''}".encode("utf-8"))
+
+def _expiry_from_headers(headers: httpx.Headers, now: float) -> float:
+    cache_control = headers.get("cache-control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return now
+    max_age_match = re.search(r"max-age=(\d+)", cache_control)
+    if max_age_match:
+        return now + int(max_age_match.group(1)) - int(headers.get("age", "0") or 0)
+    if headers.get("expires"):
+        try:
+            return email.utils.parsedate_to_datetime(headers["expires"]).timestamp()
+        except (TypeError, ValueError):
+            return now
+    return now + settings.TILE_DEFAULT_MAX_AGE_S
+
+def _touch(tile_path: Path, now: float):
+    try:
+        if now - tile_path.stat().st_mtime > LRU_TOUCH_INTERVAL_S:
+            os.utime(tile_path, (now, now))
+    except OSError:
+        pass
+
+def _read_cached(tile_path: Path, allow_stale: bool) -> Optional[TileResult]:
+    now = time.time()
+    expires, _, _ = _read_meta(tile_path)
+    if expires <= now and not allow_stale:
+        return None
+    try:
+        content = tile_path.read_bytes()
+    except OSError:
+        return None
+    _touch(tile_path, now)
+    return content, max(int(expires - now), STALE_MAX_AGE_S if expires <= now else 0)
+
+def _refresh_tile(z: int, x: int, y: int, tile_path: Path) -> Optional[TileResult]:
+    _, etag, last_modified = _read_meta(tile_path)
+    has_cached = tile_path.exists()
+    request_headers = {}
+    if has_cached and etag: request_headers["If-None-Match"] = etag
+    if has_cached and last_modified: request_headers["If-Modified-Since"] = last_modified
+    try:
+        response = _get_client().get(settings.TILE_UPSTREAM_URL.format(z=z, x=x, y=y), headers=request_headers)
+    except httpx.HTTPError as e:
+        print(f"Kachel {z}/{x}/{y}: Upstream nicht erreichbar: {e}")
+        return _read_cached(tile_path, allow_stale=True)
+    now = time.time()
+    expires = _expiry_from_headers(response.headers, now)
+    if response.status_code == 304 and has_cached:
+        _write_meta(tile_path, expires, response.headers.get("etag", etag), response.headers.get("last-modified", last_modified))
+        return _read_cached(tile_path, allow_stale=True)
+    if response.status_code != 200 or not response.headers.get("content-type", "").startswith("image/"):
+        print(f"Kachel {z}/{x}/{y}: Upstream antwortet mit HTTP {response.status_code}.")
+        return _read_cached(tile_path, allow_stale=True)
+
+    content = response.content
+    previous_size = tile_path.stat().st_size if has_cached else 0
+    tile_path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(tile_path, content)
+    _write_meta(tile_path, expires, response.headers.get("etag"), response.headers.get("last-modified"))
+    _account_written_bytes(len(content) - previous_size)
+    return content, max(int(expires - now), 0)
+
+def get_tile(z: int, x: int, y: int) -> Optional[TileResult]:
+    """Liefert eine Kachel aus dem Cache oder vom Upstream (blockierend, für run.io_bound). None, wenn nicht verfügbar."""
+    tile_path = _tile_path(z, x, y)
+    cached = _read_cached(tile_path, allow_stale=False)
+    if cached:
+        return cached
+    key = (z, x, y)
+    with _inflight_lock:
+        event = _inflight.get(key)
+        is_owner = event is None
+        if is_owner:
+            event = _inflight[key] = threading.Event()
+    if not is_owner:  # anderer Thread lädt dieselbe Kachel gerade
+        event.wait(UPSTREAM_TIMEOUT_S + 1)
+        return _read_cached(tile_path, allow_stale=True)
+    try:
+        return _refresh_tile(z, x, y, tile_path)
+    except Exception as e:
+        print(f"Fehler beim Laden der Kachel {z}/{x}/{y}: {e}")
+        traceback.print_exc()
+        return _read_cached(tile_path, allow_stale=True)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        event.set()
+
+# --- Größenbegrenzung (LRU) ------------------------------------------------------------------------------------
+
+def _scan_tiles() -> List[Tuple[float, int, Path]]:
+    tiles = []
+    for root, _, files in os.walk(settings.TILE_CACHE_DIR):
+        for filename in files:
+            if filename.endswith(".png") and not filename.startswith("."):
+                path = Path(root) / filename
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                tiles.append((stat.st_mtime, stat.st_size, path))
+    return tiles
+
+def _account_written_bytes(delta: int):
+    global _cache_size_bytes, _eviction_running
+    with _size_lock:
+        if _cache_size_bytes is None:
+            _cache_size_bytes = sum(size for _, size, _ in _scan_tiles())
+        else:
+            _cache_size_bytes += delta
+        if _cache_size_bytes <= settings.TILE_CACHE_MAX_MB * 1024 * 1024 or _eviction_running:
+            return
+        _eviction_running = True
+    threading.Thread(target=evict_tiles, name="tile-cache-eviction", daemon=True).start()
+
+def evict_tiles() -> int:
+    """Löscht die am längsten ungenutzten Kacheln, bis der Cache unter 90 % der Obergrenze liegt. Rückgabe: Anzahl."""
+    global _cache_size_bytes, _eviction_running
+    removed = 0
+    try:
+        tiles = _scan_tiles()
+        total = sum(size for _, size, _ in tiles)
+        target = settings.TILE_CACHE_MAX_MB * 1024 * 1024 * EVICTION_TARGET_RATIO
+        for _, size, path in sorted(tiles, key=lambda t: t[0]):
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            path.with_suffix(".meta").unlink(missing_ok=True)
+            total -= size; removed += 1
+        with _size_lock:
+            _cache_size_bytes = total
+        if removed:
+            print(f"Kachel-Cache: {removed} Kacheln entfernt, {total / 1024 / 1024:.1f} MB belegt.")
+    except Exception as e:
+        print(f"Fehler beim Aufräumen des Kachel-Caches: {e}")
+        traceback.print_exc()
+    finally:
+        with _size_lock:
+            _eviction_running = False
+    return removed
+
+# --- Vorladen --------------------------------------------------------------------------------------------------
+
+def _tile_xy(lat: float, lon: float, z: int) -> Tuple[int, int]:
+    lat = max(min(lat, 85.0511), -85.0511)
+    n = 2 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def tiles_for_bounds(bounds: Tuple[Tuple[float, float], Tuple[float, float]], min_zoom: int, max_zoom: int, max_tiles: int) -> List[TileKey]:
+    """Alle Kacheln der Bounding-Box ((lat_min, lon_min), (lat_max, lon_max)) je Zoomstufe, bis max_tiles erreicht ist."""
+    (lat_min, lon_min), (lat_max, lon_max) = bounds
+    tiles: List[TileKey] = []
+    for z in range(min_zoom, max_zoom + 1):
+        x_min, y_min = _tile_xy(lat_max, lon_min, z)  # y wächst nach Süden
+        x_max, y_max = _tile_xy(lat_min, lon_max, z)
+        level = [(z, x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+        if len(tiles) + len(level) > max_tiles:
+            break
+        tiles.extend(level)
+    return tiles
+
+def seed_tiles(bounds: Tuple[Tuple[float, float], Tuple[float, float]]) -> Dict[str, int]:
+    tiles = tiles_for_bounds(bounds, settings.TILE_SEED_MIN_ZOOM, settings.TILE_SEED_MAX_ZOOM, settings.TILE_SEED_MAX_TILES)
+    available = sum(1 for tile in tiles if get_tile(*tile))
+    return {"tiles": len(tiles), "available": available}
+
+def is_public_osm_upstream(upstream_url: str) -> bool:
+    host = urlsplit(upstream_url.replace("{s}", "a")).hostname or ""
+    return host == "openstreetmap.org" or host.endswith(".openstreetmap.org")
+
+def seeding_enabled() -> bool:
+    return settings.TILE_SEED_ENABLED and not is_public_osm_upstream(settings.TILE_UPSTREAM_URL)
+
+def enqueue_seed_tiles(db: Session, user_id: int, track_id: int, bounds: Optional[Tuple[Tuple[float, float], Tuple[float, float]]], commit: bool = True):
+    if not bounds or not seeding_enabled():
+        return
+    job_queue.enqueue_job(db, JOB_KIND_SEED_TILES, {"bounds": [list(bounds[0]), list(bounds[1])]},
+                          user_id=user_id, track_id=track_id, max_attempts=1, commit=commit)
+
+@job_queue.register_job_handler(JOB_KIND_SEED_TILES)
+def _handle_seed_tiles_job(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not seeding_enabled():
+        return None  # vor dem Abschalten eingereihte Jobs
+    (lat_min, lon_min), (lat_max, lon_max) = job["payload"]["bounds"]
+    seed_tiles(((lat_min, lon_min), (lat_max, lon_max)))
+    return None  # kein Ergebnis für die UI
@@ -0,0 +1,153 @@
+# projekt_gpx_viewer/track_analytics.py
+"""
+Vektorisierte Track-Analysen auf Punkt-Arrays (NumPy).
+
+Eingabe sind gleich lange Arrays lat/lon (Grad), ele (m, NaN = fehlt) und time (Unix-Sekunden, NaN = fehlt),
+wie sie gpx_utils.extract_point_arrays liefert. Ergebnis ist ein JSON-serialisierbares Dict mit
+Bewegungs-/Gesamtzeit, Ø- und Max-Geschwindigkeit, Kilometer-Splits, Steigungsverteilung und
+geglättetem Anstieg (Hysterese).
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import settings
+
+_EARTH_RADIUS_M = 6371000.0
+MOVING_SPEED_THRESHOLD_MPS = 0.5     # darunter gilt ein Abschnitt als Pause (~1.8 km/h)
+MAX_MOVING_GAP_S = 300.0             # längere Aufzeichnungslücken zählen nie als Bewegung
+MAX_SPEED_WINDOW_POINTS = 5          # Max-Geschwindigkeit über gleitendes Fenster, dämpft GPS-Ausreißer
+GRADE_SAMPLE_STEP_M = 25.0
+GRADE_BIN_EDGES_PERCENT = [-np.inf, -15.0, -10.0, -5.0, -2.0, 2.0, 5.0, 10.0, 15.0, np.inf]
+SPLIT_LENGTH_M = 1000.0
+
+def segment_distances_m(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Haversine-Distanz zwischen aufeinanderfolgenden Punkten (Länge n-1)."""
+    lat_rad = np.radians(lat); lon_rad = np.radians(lon)
+    dlat = np.diff(lat_rad); dlon = np.diff(lon_rad)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat_rad[:-1]) * np.cos(lat_rad[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * _EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def cumulative_track_metrics(lat: np.ndarray, lon: np.ndarray, ele: np.ndarray) -> Dict[str, Any]:
+    """
+    Präfixsummen (Länge n) für 2D-/3D-Distanz und Anstieg/Abstieg, Höhenlücken linear aufgefüllt.
+    Anstieg wie gpxpy.get_uphill_downhill mit 0.3/0.4/0.3-Glättung, damit Werte zu mit gpxpy geparsten Tracks passen.
+    """
+    size = int(lat.size)
+    segment_2d = segment_distances_m(lat, lon) if size >= 2 else np.empty(0)
+    valid_ele = np.isfinite(ele)
+    if valid_ele.sum() >= 2:
+        filled = np.interp(np.arange(size), np.flatnonzero(valid_ele), ele[valid_ele])
+        smoothed = filled.copy()
+        if size > 2: smoothed[1:-1] = 0.3 * filled[:-2] + 0.4 * filled[1:-1] + 0.3 * filled[2:]
+        d_ele = np.diff(smoothed)
+        segment_3d = np.hypot(segment_2d, np.diff(filled))
+    else:
+        d_ele = np.zeros(max(0, size - 1))
+        segment_3d = segment_2d
+    return {"cum_2d_m": np.concatenate(([0.0], np.cumsum(segment_2d))),
+            "cum_3d_m": np.concatenate(([0.0], np.cumsum(segment_3d))),
+            "cum_up_m": np.concatenate(([0.0], np.cumsum(np.clip(d_ele, 0.0, None)))),
+            "cum_down_m": np.concatenate(([0.0], np.cumsum(np.clip(-d_ele, 0.0, None)))),
+            "has_elevation": bool(valid_ele.sum() >= 2)}
+
+def hysteresis_ascent_descent(elevations: np.ndarray, threshold_m: float) -> Dict[str, float]:
+    """
+    Anstieg/Abstieg mit Totband: Eine Höhenänderung zählt erst, wenn sie 'threshold_m' gegenüber dem letzten
+    Referenzpunkt übersteigt. Läuft auf dem (auf GRADE_SAMPLE_STEP_M) neu abgetasteten Profil, daher kurz.
+    """
+    ascent = 0.0; descent = 0.0
+    if elevations.size == 0:
+        return {"ascent_m": 0.0, "descent_m": 0.0}
+    reference = float(elevations[0])
+    for value in elevations[1:].tolist():
+        delta = value - reference
+        if delta >= threshold_m:
+            ascent += delta; reference = value
+        elif -delta >= threshold_m:
+            descent -= delta; reference = value
+    return {"ascent_m": round(ascent, 1), "descent_m": round(descent, 1)}
+
+def _splits(cumulative_m: np.ndarray, rel_time: Optional[np.ndarray], elevation: Optional[np.ndarray]) -> List[Dict[str, Any]]:
+    total_m = float(cumulative_m[-1])
+    if total_m <= 0:
+        return []
+    marks = np.append(np.arange(SPLIT_LENGTH_M, total_m, SPLIT_LENGTH_M), total_m)
+    boundaries = np.concatenate(([0.0], marks))
+    splits: List[Dict[str, Any]] = []
+    times = np.interp(boundaries, cumulative_m, rel_time) if rel_time is not None else None
+    elevs = np.interp(boundaries, cumulative_m, elevation) if elevation is not None else None
+    for i in range(len(marks)):
+        length_m = boundaries[i + 1] - boundaries[i]
+        split: Dict[str, Any] = {"km": i + 1, "distance_m": round(float(length_m), 1)}
+        if times is not None:
+            duration = float(times[i + 1] - times[i])
+            split["duration_s"] = round(duration, 1)
+            split["pace_s_per_km"] = round(duration / (length_m / 1000.0), 1) if length_m > 0 else None
+        if elevs is not None:
+            split["elevation_change_m"] = round(float(elevs[i + 1] - elevs[i]), 1)
+        splits.append(split)
+    return splits
+
+def analyze_point_arrays(
+    lat: np.ndarray, lon: np.ndarray, ele: np.ndarray, time_s: np.ndarray,
+    hysteresis_threshold_m: Optional[float] = None
+) -> Dict[str, Any]:
+    """Berechnet alle Kennzahlen in einem Durchlauf über die Arrays. Fehlende Zeiten/Höhen führen zu None-Feldern."""
+    threshold = settings.ASCENT_HYSTERESIS_M if hysteresis_threshold_m is None else hysteresis_threshold_m
+    result: Dict[str, Any] = {
+        "point_count": int(lat.size), "elapsed_time_s": None, "moving_time_s": None,
+        "avg_moving_speed_kmh": None, "max_speed_kmh": None, "splits": [], "grade_distribution": [],
+        "smoothed_ascent_m": None, "smoothed_descent_m": None, "hysteresis_threshold_m": threshold,
+    }
+    if lat.size < 2:
+        return result
+
+    seg_m = segment_distances_m(lat, lon)
+    cumulative_m = np.concatenate(([0.0], np.cumsum(seg_m)))
+
+    valid_time = np.isfinite(time_s)
+    rel_time: Optional[np.ndarray] = None
+    if valid_time.sum() >= 2:
+        # nur fehlende Zeitstempel ergänzen, über den Punktindex interpoliert (wie TrackSeries.index_for_time): über die
+        # Distanz bekämen Punkte an derselben Stelle (Pause) alle dieselbe Zeit und die Pause fiele weg
+        filled_time = time_s.astype(np.float64, copy=True)
+        if not valid_time.all():
+            filled_time[~valid_time] = np.interp(np.flatnonzero(~valid_time), np.flatnonzero(valid_time), time_s[valid_time])
+        rel_time = filled_time - filled_time[0]
+        dt = np.diff(filled_time)
+        result["elapsed_time_s"] = round(float(time_s[valid_time].max() - time_s[valid_time].min()), 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            seg_speed = np.where(dt > 0, seg_m / dt, 0.0)
+        moving = (seg_speed >= MOVING_SPEED_THRESHOLD_MPS) & (dt > 0) & (dt <= MAX_MOVING_GAP_S)
+        moving_time = float(dt[moving].sum())
+        result["moving_time_s"] = round(moving_time, 1)
+        if moving_time > 0:
+            result["avg_moving_speed_kmh"] = round(float(seg_m[moving].sum()) / moving_time * 3.6, 2)
+        window = min(MAX_SPEED_WINDOW_POINTS, lat.size - 1)
+        window_dt = filled_time[window:] - filled_time[:-window]
+        window_m = cumulative_m[window:] - cumulative_m[:-window]
+        usable = window_dt > 0
+        if usable.any():
+            result["max_speed_kmh"] = round(float((window_m[usable] / window_dt[usable]).max()) * 3.6, 2)
+
+    valid_ele = np.isfinite(ele)
+    elevation_filled: Optional[np.ndarray] = None
+    if valid_ele.sum() >= 2 and cumulative_m[-1] > 0:
+        elevation_filled = np.interp(cumulative_m, cumulative_m[valid_ele], ele[valid_ele])
+        sample_at = np.arange(0.0, cumulative_m[-1], GRADE_SAMPLE_STEP_M)
+        sampled_ele = np.interp(sample_at, cumulative_m, elevation_filled)
+        if sampled_ele.size >= 2:
+            grades = np.diff(sampled_ele) / GRADE_SAMPLE_STEP_M * 100.0
+            counts, _ = np.histogram(grades, bins=GRADE_BIN_EDGES_PERCENT)
+            result["grade_distribution"] = [
+                {"from_percent": None if np.isinf(lo) else lo, "to_percent": None if np.isinf(hi) else hi,
+                 "distance_km": round(int(n) * GRADE_SAMPLE_STEP_M / 1000.0, 3)}
+                for lo, hi, n in zip(GRADE_BIN_EDGES_PERCENT[:-1], GRADE_BIN_EDGES_PERCENT[1:], counts)
+            ]
+        smoothed = hysteresis_ascent_descent(np.append(sampled_ele, elevation_filled[-1]), threshold)
+        result["smoothed_ascent_m"] = smoothed["ascent_m"]
+        result["smoothed_descent_m"] = smoothed["descent_m"]
+
+    result["splits"] = _splits(cumulative_m, rel_time, elevation_filled)
+    return result
@@ -0,0 +1,268 @@
+# projekt_gpx_viewer/track_editing.py
+"""
+Bearbeiten gespeicherter Tracks: Zuschneiden (nach Punktindex oder Zeit), Teilen und Zusammenführen.
+
+Grundlage sind die Punkt-Arrays aus dem Punktspeicher (point_store.py, sonst einmalig aus der GPX-Datei).
+Distanz und Anstieg/Abstieg eines Ausschnitts ergeben sich aus Präfixsummen (TrackSeries.range_stats) in
+O(1), ohne die GPX-Datei erneut zu parsen; Bounding Box und Höhenprofil aus Slices derselben Arrays.
+
+Zurückgeschrieben wird atomar: neue GPX-Dateien entstehen in GPX_INCOMING_DIR und werden an den
+Blob-Speicher übergeben (blob_storage.py), alle Track-Zeilen einer Operation ändern sich in einer Transaktion; erst nach dem Commit werden
+die alten Dateien gelöscht (bei Fehlern vor dem Commit die neuen). Punktspeicher, Höhenprofil und Analysen werden
+direkt aus den Arrays aktualisiert, übrige Prozessoren (Fingerprint) als Jobs neu eingereiht; scheitert das
+Schreiben der abgeleiteten Daten nach dem Commit, laufen auch deren Prozessoren als Job.
+Beim Zusammenführen landen die Quelltracks im Papierkorb (soft_delete_tracks) und bleiben bis zum Ende des
+Undo-Fensters wiederherstellbar.
+
+Hinweis: Die neue GPX-Datei enthält nur Position, Höhe und Zeit in einem Segment; Erweiterungen der
+Originaldatei (Puls, Trittfrequenz, ...) gehen bei der Bearbeitung verloren.
+"""
+import json
+import os
+import tempfile
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import blob_storage
+import db_config
+import elevation_profiles
+import export
+import gpx_utils
+import job_queue
+import point_store
+import thumbnails
+import track_analytics
+import track_processing
+
+MIN_POINTS_PER_TRACK = 2
+# werden beim Zurückschreiben direkt aus den Arrays erzeugt, alle übrigen Prozessoren laufen als Job;
+# das Thumbnail gehört dazu, weil seine URL am Inhalts-Hash hängt und sonst das alte Bild lange gecacht würde
+DIRECT_PROCESSORS = ("analytics", "points", "profile", "thumbnail", "start_point")
+# deren Ergebnis schreibt _PendingWrite.finish erst nach dem Commit (Dateien statt Spalten)
+FILE_PROCESSORS = ("points", "profile", "thumbnail")
+
+class TrackSeries:
+    """Punkt-Arrays eines Tracks mit Präfixsummen für Distanz (2D/3D) und geglätteten Anstieg/Abstieg."""
+    def __init__(self, point_arrays: Dict[str, np.ndarray]):
+        self.arrays = {name: np.asarray(point_arrays[name], dtype=np.float64) for name in ("lat", "lon", "ele", "time")}
+        self.size = int(self.arrays["lat"].size)
+        metrics = track_analytics.cumulative_track_metrics(self.arrays["lat"], self.arrays["lon"], self.arrays["ele"])
+        self.has_elevation = metrics["has_elevation"]
+        self.cum_2d_m, self.cum_3d_m = metrics["cum_2d_m"], metrics["cum_3d_m"]
+        self.cum_up_m, self.cum_down_m = metrics["cum_up_m"], metrics["cum_down_m"]
+
+    def slice(self, start: int, end: int) -> Dict[str, np.ndarray]:
+        return {name: values[start:end] for name, values in self.arrays.items()}
+
+    def range_stats(self, start: int, end: int) -> Dict[str, float]:
+        """Kennzahlen der Punkte start..end-1 aus den Präfixsummen (O(1))."""
+        last = end - 1
+        return {"distance_km": round(float(self.cum_3d_m[last] - self.cum_3d_m[start]) / 1000.0, 2),
+                "total_ascent": round(float(self.cum_up_m[last] - self.cum_up_m[start]), 2),
+                "total_descent": round(float(self.cum_down_m[last] - self.cum_down_m[start]), 2)}
+
+    def range_bounds(self, start: int, end: int) -> Optional[Tuple[Tuple[float, float], Tuple[float, float]]]:
+        lat, lon = self.arrays["lat"][start:end], self.arrays["lon"][start:end]
+        if lat.size == 0: return None
+        return ((float(lat.min()), float(lon.min())), (float(lat.max()), float(lon.max())))
+
+    def range_profile(self, start: int, end: int) -> np.ndarray:
+        return elevation_profiles.profile_from_cumulative(self.cum_2d_m[start:end], self.arrays["ele"][start:end])
+
+    def index_for_time(self, when: datetime, side: str = "left") -> int:
+        """Erster Punktindex ab 'when' (side='right': erster Index danach); Punkte ohne Zeit über die Distanz interpoliert."""
+        time_s = self.arrays["time"]; valid = np.isfinite(time_s)
+        if valid.sum() < 2:
+            raise ValueError("Track hat keine Zeitstempel.")
+        filled = np.maximum.accumulate(np.interp(np.arange(self.size), np.flatnonzero(valid), time_s[valid]))
+        timestamp = when.replace(tzinfo=when.tzinfo or timezone.utc).timestamp()
+        return int(np.searchsorted(filled, timestamp, side=side))
+
+def load_track_series(user_id: int, track: db_config.TrackDB) -> Optional[TrackSeries]:
+    arrays = point_store.get_track_point_arrays(user_id, [track.id]).get(track.id)
+    if arrays is None:
+        with blob_storage.get_store().local_file(track.stored_filename) as gpx_file_path:
+            arrays = gpx_utils.get_point_arrays_from_gpx_file(str(gpx_file_path)) if gpx_file_path is not None else None
+    return TrackSeries(arrays) if arrays is not None else None
+
+class _PendingWrite:
+    """Sammelt die Datei-/Artefaktänderungen einer Operation bis zum Commit."""
+    def __init__(self):
+        self.new_keys: List[str] = []; self.old_keys: List[str] = []
+        self.points: Dict[int, Dict[str, np.ndarray]] = {}; self.profiles: Dict[int, np.ndarray] = {}
+        self.thumbnails: Dict[int, Tuple[str, bytes]] = {}  # track_id -> (thumbnail_key, svg)
+        self.committed = False  # danach verweisen committete Zeilen auf new_keys, die dürfen nicht mehr weg
+
+    def rollback(self):
+        if self.committed: return
+        for stored_filename in self.new_keys:
+            try: blob_storage.get_store().delete(stored_filename)
+            except OSError as e: print(f"Fehler beim Aufräumen der Datei {stored_filename}: {e}")
+
+    def finish(self, user_id: int):
+        for stored_filename in self.old_keys:
+            try: blob_storage.get_store().delete(stored_filename)
+            except OSError as e: print(f"Konnte alte Datei {stored_filename} nicht löschen: {e}")
+        point_store.write_tracks(user_id, self.points)
+        for track_id, profile in self.profiles.items(): elevation_profiles.save_profile(track_id, profile)
+        for track_id, (key, svg) in self.thumbnails.items(): thumbnails.save_thumbnail(track_id, svg, key)
+
+def _write_gpx_file(track_name: str, original_filename: str, point_arrays: Dict[str, np.ndarray], pending: _PendingWrite) -> Tuple[str, str]:
+    content = export.gpx_bytes_from_point_arrays(track_name, point_arrays)
+    fd, temp_name = tempfile.mkstemp(suffix=".gpx", dir=db_config.GPX_INCOMING_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content); f.flush(); os.fsync(f.fileno())
+        stored_filename = db_config._make_stored_filename(original_filename)
+        blob_storage.get_store().put_file(stored_filename, Path(temp_name))
+    finally:
+        Path(temp_name).unlink(missing_ok=True)
+    pending.new_keys.append(stored_filename)
+    return stored_filename, db_config.compute_content_hash(content)
+
+def _apply_range(track: db_config.TrackDB, series: TrackSeries, start: int, end: int, pending: _PendingWrite):
+    """Schreibt Punkte start..end-1 von 'series' als neuen Inhalt von 'track' (ohne Commit; neue Tracks vorher flushen)."""
+    point_arrays = series.slice(start, end)
+    # neu geschrieben wird immer GPX - eine FIT/TCX/GeoJSON-Quelle bekommt die passende Endung (Export, Speicher-Key)
+    track.original_filename = str(Path(track.original_filename or "track.gpx").with_suffix(".gpx"))
+    stored_filename, content_sha256 = _write_gpx_file(track.name, track.original_filename, point_arrays, pending)
+    if track.stored_filename: pending.old_keys.append(track.stored_filename)
+    track.stored_filename = stored_filename
+    track.content_sha256 = content_sha256
+    stats = series.range_stats(start, end)
+    track.distance_km = stats["distance_km"]
+    track.gpx_parsed_total_ascent = stats["total_ascent"]
+    track.gpx_parsed_total_descent = stats["total_descent"]
+    track.start_lat, track.start_lon = float(point_arrays["lat"][0]), float(point_arrays["lon"][0])
+    first_time = point_arrays["time"][np.isfinite(point_arrays["time"])][:1]
+    if first_time.size: track.track_date = datetime.fromtimestamp(float(first_time[0]), tz=timezone.utc).replace(tzinfo=None)
+    db_config.apply_analytics_to_track(track, track_analytics.analyze_point_arrays(
+        point_arrays["lat"], point_arrays["lon"], point_arrays["ele"], point_arrays["time"]))
+    versions = {name: track_processing.TRACK_PROCESSORS[name].version for name in DIRECT_PROCESSORS}
+    track.processing_versions = json.dumps(versions, sort_keys=True)  # Fingerprint & Co. gelten als veraltet
+    pending.points[track.id] = point_arrays
+    pending.profiles[track.id] = series.range_profile(start, end)
+    pending.thumbnails[track.id] = (thumbnails.thumbnail_key(track), thumbnails.render_thumbnail_svg(point_arrays["lat"], point_arrays["lon"]))
+
+def _forget_processor_versions(db: Session, track_id: int, processor_names: Tuple[str, ...]):
+    track = db.get(db_config.TrackDB, track_id)
+    if not track: return
+    versions = json.loads(track.processing_versions or "{}")
+    for name in processor_names: versions.pop(name, None)
+    track.processing_versions = json.dumps(versions, sort_keys=True)
+
+def _commit(db: Session, user_id: int, pending: _PendingWrite, track_ids: List[int]):
+    """Commit der Track-Zeilen; Fehler danach werden nur protokolliert, die neuen Dateien bleiben in jedem Fall erhalten."""
+    try:
+        db.commit()
+    except Exception:
+        db.rollback(); pending.rollback(); raise
+    pending.committed = True
+    finished = True
+    try:
+        pending.finish(user_id)
+    except Exception as e:
+        finished = False
+        print(f"Abgeleitete Daten für Tracks {track_ids} nicht geschrieben, Prozessoren werden neu eingereiht: {e}")
+        traceback.print_exc()
+    try:
+        for track_id in track_ids:
+            if not finished: _forget_processor_versions(db, track_id, FILE_PROCESSORS)
+            track_processing.enqueue_track_processing(db, user_id, track_id, commit=False)
+        db.commit()
+        job_queue.notify_new_jobs()
+    except Exception as e:
+        db.rollback()
+        print(f"Prozessor-Jobs für Tracks {track_ids} nicht eingereiht (reprocess.py holt sie nach): {e}")
+        traceback.print_exc()
+
+def _get_track(db: Session, user_id: int, track_id: int) -> db_config.TrackDB:
+    track = db_config.get_track_details(db, user_id, track_id)
+    if not track:
+        raise ValueError(f"Track ID {track_id} nicht gefunden.")
+    return track
+
+def crop_track(db: Session, user_id: int, track_id: int, start_index: Optional[int] = None, end_index: Optional[int] = None,
+               start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> Optional[int]:
+    """Behält nur Punkte start..end-1 (Index) bzw. zwischen start_time und end_time. Rückgabe: verbleibende Punkte oder None."""
+    pending = _PendingWrite()
+    try:
+        track = _get_track(db, user_id, track_id)
+        series = load_track_series(user_id, track)
+        if series is None: raise ValueError(f"Punkte von Track ID {track_id} nicht lesbar.")
+        start = series.index_for_time(start_time) if start_time else max(0, start_index or 0)
+        end = series.index_for_time(end_time, side="right") if end_time else min(series.size, series.size if end_index is None else end_index)
+        if end - start < MIN_POINTS_PER_TRACK:
+            raise ValueError(f"Ausschnitt {start}..{end} enthält weniger als {MIN_POINTS_PER_TRACK} Punkte.")
+        if start == 0 and end == series.size:
+            return series.size
+        _apply_range(track, series, start, end, pending)
+        _commit(db, user_id, pending, [track.id])
+        print(f"Track ID {track_id} zugeschnitten: Punkte {start}..{end - 1} von {series.size}.")
+        return end - start
+    except Exception as e:
+        db.rollback(); pending.rollback()
+        print(f"Fehler beim Zuschneiden von Track ID {track_id} für User ID {user_id}: {e}")
+        traceback.print_exc()
+        return None
+
+def split_track(db: Session, user_id: int, track_id: int, split_index: int) -> Optional[List[int]]:
+    """Teilt am Punkt split_index; der Punkt gehört zu beiden Teilen. Rückgabe: [ursprüngliche ID, neue ID] oder None."""
+    pending = _PendingWrite()
+    try:
+        track = _get_track(db, user_id, track_id)
+        series = load_track_series(user_id, track)
+        if series is None: raise ValueError(f"Punkte von Track ID {track_id} nicht lesbar.")
+        if not (MIN_POINTS_PER_TRACK - 1 <= split_index <= series.size - MIN_POINTS_PER_TRACK):
+            raise ValueError(f"Teilungspunkt {split_index} außerhalb von 1..{series.size - 2}.")
+        second = db_config.TrackDB(user_id=user_id, name=f"{track.name} (Teil 2)", original_filename=track.original_filename,
+                                   stored_filename="", labels=track.labels)
+        db.add(second); db.flush()  # ID für Punktspeicher/Profil
+        _apply_range(second, series, split_index, series.size, pending)
+        _apply_range(track, series, 0, split_index + 1, pending)
+        track.name = f"{track.name} (Teil 1)"
+        _commit(db, user_id, pending, [track.id, second.id])
+        print(f"Track ID {track_id} bei Punkt {split_index} geteilt, zweiter Teil: Track ID {second.id}.")
+        return [track.id, second.id]
+    except Exception as e:
+        db.rollback(); pending.rollback()
+        print(f"Fehler beim Teilen von Track ID {track_id} für User ID {user_id}: {e}")
+        traceback.print_exc()
+        return None
+
+def merge_tracks(db: Session, user_id: int, track_ids: List[int]) -> Optional[int]:
+    """
+    Führt Tracks (zeitlich sortiert, ohne Zeitstempel in Auswahlreihenfolge) im ersten zusammen; die übrigen
+    landen im Papierkorb (in derselben Transaktion). Rückgabe: ID des zusammengeführten Tracks oder None.
+    """
+    pending = _PendingWrite()
+    try:
+        tracks_by_id = {t.id: t for t in db_config.get_tracks_by_ids(db, user_id, track_ids)}
+        if len(tracks_by_id) < 2: raise ValueError("Mindestens zwei eigene Tracks zum Zusammenführen nötig.")
+        parts: List[Tuple[db_config.TrackDB, TrackSeries]] = []
+        for track_id in track_ids:
+            if track_id not in tracks_by_id: continue
+            series = load_track_series(user_id, tracks_by_id[track_id])
+            if series is None: raise ValueError(f"Punkte von Track ID {track_id} nicht lesbar.")
+            parts.append((tracks_by_id[track_id], series))
+        def first_time(part):
+            times = part[1].arrays["time"][np.isfinite(part[1].arrays["time"])]
+            return float(times[0]) if times.size else float("inf")
+        parts.sort(key=first_time)  # stabil: ohne Zeitstempel bleibt die Auswahlreihenfolge
+        merged = TrackSeries({name: np.concatenate([series.arrays[name] for _, series in parts]) for name in ("lat", "lon", "ele", "time")})
+        target = parts[0][0]
+        _apply_range(target, merged, 0, merged.size, pending)
+        db_config.soft_delete_tracks(db, user_id, [track.id for track, _ in parts[1:]], commit=False)
+        _commit(db, user_id, pending, [target.id])
+        print(f"{len(parts)} Tracks in Track ID {target.id} zusammengeführt ({merged.size} Punkte).")
+        return target.id
+    except Exception as e:
+        db.rollback(); pending.rollback()
+        print(f"Fehler beim Zusammenführen der Tracks {track_ids} für User ID {user_id}: {e}")
+        traceback.print_exc()
+        return None
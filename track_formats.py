@@ -0,0 +1,318 @@
+# projekt_gpx_viewer/track_formats.py
+"""
+Weitere Track-Formate neben GPX: FIT (binär, Garmin & Co.), TCX und GeoJSON.
+
+Das Format wird am Inhalt erkannt (detect_format: FIT-Header ".FIT", sonst erstes Zeichen bzw. Wurzelelement),
+nicht an der Dateiendung. Alle Decoder liefern dieselben Punkt-Arrays wie gpx_utils.extract_point_arrays
+(lat, lon, ele mit NaN = fehlt, time als Unix-Sekunden mit NaN = fehlt); parse_track_content baut daraus
+dasselbe Ergebnis-Dict wie gpx_utils.parse_gpx_data_from_content. Die Originaldatei wird unverändert
+gespeichert, gpx_utils verzweigt beim Lesen anhand der ersten Bytes hierher.
+
+FIT wird direkt mit struct dekodiert: pro Definitionsnachricht entsteht einmal ein struct.Struct, das aus
+den Datennachrichten nur Zeitstempel, Position und Höhe der 'record'-Nachrichten liest; alle übrigen Felder
+und Nachrichten werden per Padding übersprungen.
+"""
+import json
+import struct
+import traceback
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import track_analytics
+
+FORMAT_GPX = "gpx"
+FORMAT_FIT = "fit"
+FORMAT_TCX = "tcx"
+FORMAT_GEOJSON = "geojson"
+SUPPORTED_EXTENSIONS = (".gpx", ".fit", ".tcx", ".geojson", ".json")
+SNIFF_BYTES = 4096  # XML-Prolog und Kommentare vor dem Wurzelelement passen hinein
+
+# FIT-Protokoll (https://developer.garmin.com/fit/protocol/)
+FIT_EPOCH_OFFSET_S = 631065600  # 1989-12-31T00:00:00Z
+FIT_SEMICIRCLE_DEG = 180.0 / 2 ** 31
+FIT_MESG_RECORD = 20
+FIT_FIELD_TIMESTAMP = 253
+# record-Felder: Nummer -> (Name, erwarteter Basistyp)
+FIT_RECORD_FIELDS = {0: ("lat", 0x85), 1: ("lon", 0x85), 2: ("altitude", 0x84), 78: ("enhanced_altitude", 0x86)}
+FIT_BASE_TYPE_FORMATS = {0x84: "H", 0x85: "i", 0x86: "I"}
+FIT_INVALID = {"lat": 0x7FFFFFFF, "lon": 0x7FFFFFFF, "altitude": 0xFFFF, "enhanced_altitude": 0xFFFFFFFF, "timestamp": 0xFFFFFFFF}
+
+class FitDefinition(NamedTuple):
+    global_num: int
+    struct: struct.Struct  # ganze Nachricht; liest nur die Felder aus 'indices', der Rest ist Padding
+    indices: Dict[str, int]
+
+def detect_format(head: bytes) -> str:
+    """Format anhand der ersten Bytes (mind. SNIFF_BYTES für XML); im Zweifel GPX."""
+    if len(head) >= 12 and head[0] in (12, 14) and head[8:12] == b".FIT":
+        return FORMAT_FIT
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if text[:1] in (b"{", b"["):
+        return FORMAT_GEOJSON
+    if b"<TrainingCenterDatabase" in text:
+        return FORMAT_TCX
+    return FORMAT_GPX
+
+def detect_file_format(filepath_str: str) -> str:
+    with open(filepath_str, "rb") as f:
+        return detect_format(f.read(SNIFF_BYTES))
+
+def is_supported_filename(filename: str) -> bool:
+    return filename.lower().endswith(SUPPORTED_EXTENSIONS)
+
+def _point_arrays(lat: List[float], lon: List[float], ele: List[float], time_s: List[float]) -> Dict[str, np.ndarray]:
+    return {"lat": np.asarray(lat, dtype=np.float64), "lon": np.asarray(lon, dtype=np.float64),
+            "ele": np.asarray(ele, dtype=np.float64), "time": np.asarray(time_s, dtype=np.float64)}
+
+def _parse_iso_time(value: Any) -> float:
+    if value is None or value == "":
+        return float("nan")
+    if isinstance(value, (int, float)):
+        return float(value) / 1000.0 if value > 1e11 else float(value)  # Millisekunden (JavaScript) oder Sekunden
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return float("nan")
+    return parsed.replace(tzinfo=parsed.tzinfo or timezone.utc).timestamp()
+
+# --- FIT -------------------------------------------------------------------------------------------------------
+
+def _compile_fit_definition(endian: str, global_num: int, fields: List[Tuple[int, int, int]], developer_size: int) -> FitDefinition:
+    parts = [endian]; indices: Dict[str, int] = {}
+    for field_num, size, base_type in fields:
+        if field_num == FIT_FIELD_TIMESTAMP and base_type == 0x86 and size == 4:
+            name = "timestamp"
+        elif global_num == FIT_MESG_RECORD and field_num in FIT_RECORD_FIELDS and FIT_RECORD_FIELDS[field_num][1] == base_type \
+                and size == struct.calcsize(FIT_BASE_TYPE_FORMATS[base_type]):
+            name = FIT_RECORD_FIELDS[field_num][0]
+        else:
+            parts.append(f"{size}x"); continue
+        indices[name] = len(indices)
+        parts.append(FIT_BASE_TYPE_FORMATS[base_type])
+    if developer_size:
+        parts.append(f"{developer_size}x")
+    return FitDefinition(global_num, struct.Struct("".join(parts)), indices)
+
+def decode_fit(data: bytes) -> Dict[str, np.ndarray]:
+    """Punkt-Arrays aus allen 'record'-Nachrichten mit Position (auch verkettete FIT-Dateien). ValueError bei Defekten."""
+    rows: List[Tuple[float, float, float, float]] = []
+    offset = 0
+    while offset + 12 <= len(data):
+        header_size = data[offset]
+        if header_size < 12 or data[offset + 8:offset + 12] != b".FIT":
+            if rows: break  # Müll nach der letzten Datei
+            raise ValueError("Kein FIT-Header gefunden.")
+        data_size = int.from_bytes(data[offset + 4:offset + 8], "little")
+        position = offset + header_size; end = position + data_size
+        if end > len(data):
+            raise ValueError(f"FIT-Datei abgeschnitten ({len(data) - position} von {data_size} Bytes).")
+        definitions: Dict[int, FitDefinition] = {}
+        last_timestamp: Optional[int] = None
+        while position < end:
+            header = data[position]; position += 1
+            compressed_time: Optional[int] = None
+            if header & 0x80:  # komprimierter Zeitstempel: 5 Bit Versatz zum letzten vollen Zeitstempel
+                local_num = (header >> 5) & 0x03
+                if last_timestamp is not None:
+                    time_offset = header & 0x1F
+                    compressed_time = (last_timestamp & ~0x1F) + time_offset
+                    if time_offset < (last_timestamp & 0x1F): compressed_time += 0x20
+                    last_timestamp = compressed_time
+            elif header & 0x40:  # Definitionsnachricht
+                endian = ">" if data[position + 1] else "<"
+                global_num = struct.unpack_from(endian + "H", data, position + 2)[0]
+                field_count = data[position + 4]; position += 5
+                fields = [tuple(data[position + 3 * i:position + 3 * i + 3]) for i in range(field_count)]
+                position += 3 * field_count
+                developer_size = 0
+                if header & 0x20:
+                    developer_count = data[position]; position += 1
+                    developer_size = sum(data[position + 3 * i + 1] for i in range(developer_count))
+                    position += 3 * developer_count
+                definitions[header & 0x0F] = _compile_fit_definition(endian, global_num, fields, developer_size)
+                continue
+            else:
+                local_num = header & 0x0F
+            definition = definitions.get(local_num)
+            if definition is None:
+                raise ValueError(f"FIT-Datennachricht ohne Definition (lokaler Typ {local_num}).")
+            values = definition.struct.unpack_from(data, position); position += definition.struct.size
+            indices = definition.indices
+            if "timestamp" in indices and values[indices["timestamp"]] != FIT_INVALID["timestamp"]:
+                last_timestamp = values[indices["timestamp"]]
+            if definition.global_num != FIT_MESG_RECORD or "lat" not in indices or "lon" not in indices:
+                continue
+            lat_raw, lon_raw = values[indices["lat"]], values[indices["lon"]]
+            if lat_raw == FIT_INVALID["lat"] or lon_raw == FIT_INVALID["lon"]:
+                continue
+            elevation = float("nan")
+            if "enhanced_altitude" in indices and values[indices["enhanced_altitude"]] != FIT_INVALID["enhanced_altitude"]:
+                elevation = values[indices["enhanced_altitude"]] / 5.0 - 500.0
+            elif "altitude" in indices and values[indices["altitude"]] != FIT_INVALID["altitude"]:
+                elevation = values[indices["altitude"]] / 5.0 - 500.0
+            timestamp = compressed_time if compressed_time is not None else (
+                values[indices["timestamp"]] if "timestamp" in indices else None)
+            rows.append((lat_raw, lon_raw, elevation,
+                         timestamp + FIT_EPOCH_OFFSET_S if timestamp is not None and timestamp != FIT_INVALID["timestamp"] else float("nan")))
+        offset = end + 2  # CRC der Datei
+    if not rows:
+        return _point_arrays([], [], [], [])
+    table = np.asarray(rows, dtype=np.float64)
+    return {"lat": table[:, 0] * FIT_SEMICIRCLE_DEG, "lon": table[:, 1] * FIT_SEMICIRCLE_DEG,
+            "ele": np.ascontiguousarray(table[:, 2]), "time": np.ascontiguousarray(table[:, 3])}
+
+# --- TCX -------------------------------------------------------------------------------------------------------
+
+def decode_tcx(data: bytes) -> Tuple[Optional[str], Dict[str, np.ndarray]]:
+    """(Name des Kurses bzw. None, Punkt-Arrays); Trackpoints ohne Position (nur Puls o.ä.) werden übersprungen."""
+    root = ET.fromstring(data)
+    ns = root.tag[:root.tag.index("}") + 1] if root.tag.startswith("{") else ""
+    lat: List[float] = []; lon: List[float] = []; ele: List[float] = []; time_s: List[float] = []
+    nan = float("nan")
+    for trackpoint in root.iter(f"{ns}Trackpoint"):
+        position = trackpoint.find(f"{ns}Position")
+        if position is None:
+            continue
+        lat_text = position.findtext(f"{ns}LatitudeDegrees"); lon_text = position.findtext(f"{ns}LongitudeDegrees")
+        if not lat_text or not lon_text:
+            continue
+        lat.append(float(lat_text)); lon.append(float(lon_text))
+        altitude_text = trackpoint.findtext(f"{ns}AltitudeMeters")
+        ele.append(float(altitude_text) if altitude_text else nan)
+        time_s.append(_parse_iso_time(trackpoint.findtext(f"{ns}Time")))
+    name = root.findtext(f"{ns}Courses/{ns}Course/{ns}Name") or None
+    return name, _point_arrays(lat, lon, ele, time_s)
+
+# --- GeoJSON ---------------------------------------------------------------------------------------------------
+
+def _geojson_features(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    kind = document.get("type")
+    if kind == "FeatureCollection":
+        return document.get("features") or []
+    if kind == "Feature":
+        return [document]
+    return [{"type": "Feature", "geometry": document, "properties": {}}]  # reine Geometrie
+
+def _coordinate_times(properties: Dict[str, Any]) -> Any:
+    # togeojson: coordinateProperties.times (neu) bzw. coordTimes (alt), bei MultiLineString verschachtelt
+    return (properties.get("coordinateProperties") or {}).get("times") or properties.get("coordTimes") or properties.get("times")
+
+def _coordinate_table(coordinates: List[List[float]]) -> np.ndarray:
+    """(n, 3)-Array lon/lat/ele; Positionen ohne Höhe bekommen NaN."""
+    try:
+        table = np.asarray(coordinates, dtype=np.float64)
+    except ValueError:  # gemischt 2D/3D
+        table = np.asarray([(c[0], c[1], c[2] if len(c) > 2 else np.nan) for c in coordinates], dtype=np.float64)
+    if table.ndim != 2 or table.shape[0] == 0:
+        return np.empty((0, 3))
+    if table.shape[1] == 2:
+        table = np.column_stack((table, np.full(table.shape[0], np.nan)))
+    return table[:, :3]
+
+def decode_geojson(data: bytes) -> Tuple[Optional[str], Dict[str, np.ndarray]]:
+    """
+    (Name, Punkt-Arrays) aus LineString/MultiLineString-Features, hintereinander gehängt; enthält die Datei
+    keine Linien, werden Point-Features in Dateireihenfolge als Track gelesen (properties.time).
+    """
+    document = json.loads(data)
+    if not isinstance(document, dict):
+        raise ValueError("GeoJSON-Wurzel ist kein Objekt.")
+    name: Optional[str] = (document.get("properties") or {}).get("name") if isinstance(document.get("properties"), dict) else None
+    parts: List[np.ndarray] = []; time_parts: List[np.ndarray] = []
+    points: List[Tuple[float, float, float, float]] = []
+    for feature in _geojson_features(document):
+        geometry = feature.get("geometry") or {}
+        properties = feature.get("properties") or {}
+        kind = geometry.get("type"); coordinates = geometry.get("coordinates") or []
+        if kind == "LineString":
+            lines, line_times = [coordinates], [_coordinate_times(properties)]
+        elif kind == "MultiLineString":
+            times = _coordinate_times(properties)
+            lines = coordinates
+            line_times = times if isinstance(times, list) and times and isinstance(times[0], list) else [None] * len(lines)
+        elif kind == "Point" and len(coordinates) >= 2:
+            points.append((coordinates[1], coordinates[0], coordinates[2] if len(coordinates) > 2 else np.nan,
+                           _parse_iso_time(properties.get("time"))))
+            continue
+        else:
+            continue
+        name = name or properties.get("name")
+        for line, times in zip(lines, line_times):
+            table = _coordinate_table(line)
+            if not table.shape[0]: continue
+            parts.append(table)
+            if isinstance(times, list) and len(times) == table.shape[0]:
+                time_parts.append(np.fromiter((_parse_iso_time(t) for t in times), dtype=np.float64, count=len(times)))
+            else:
+                time_parts.append(np.full(table.shape[0], np.nan))
+    if parts:
+        table = np.concatenate(parts)
+        return name, {"lat": np.ascontiguousarray(table[:, 1]), "lon": np.ascontiguousarray(table[:, 0]),
+                      "ele": np.ascontiguousarray(table[:, 2]), "time": np.concatenate(time_parts)}
+    lat, lon, ele, time_s = zip(*points) if points else ([], [], [], [])
+    return name, _point_arrays(list(lat), list(lon), list(ele), list(time_s))
+
+# --- Gemeinsame Schnittstelle ----------------------------------------------------------------------------------
+
+def decode_track(track_format: str, data: bytes) -> Tuple[Optional[str], Dict[str, np.ndarray]]:
+    """(Trackname oder None, Punkt-Arrays) für FIT/TCX/GeoJSON; Fehler im Inhalt als ValueError/ParseError."""
+    if track_format == FORMAT_FIT:
+        return None, decode_fit(data)
+    if track_format == FORMAT_TCX:
+        return decode_tcx(data)
+    if track_format == FORMAT_GEOJSON:
+        return decode_geojson(data)
+    raise ValueError(f"Kein Decoder für Format {track_format!r}.")
+
+def parsed_result_from_point_arrays(original_filename: str, track_name: Optional[str], arrays: Dict[str, np.ndarray]) -> Optional[Dict[str, Any]]:
+    """Ergebnis-Dict wie gpx_utils.parse_gpx_data_from_content (Distanz 3D, Anstieg geglättet wie gpxpy)."""
+    if arrays["lat"].size == 0:
+        print(f"Warnung: Keine Punkte mit Position in Datei {original_filename} gefunden.")
+        return None
+    if not track_name:
+        track_name = original_filename.rsplit('.', 1)[0] if '.' in original_filename else original_filename
+    metrics = track_analytics.cumulative_track_metrics(arrays["lat"], arrays["lon"], arrays["ele"])
+    valid_times = arrays["time"][np.isfinite(arrays["time"])]
+    track_date = datetime.fromtimestamp(float(valid_times[0]), tz=timezone.utc).replace(tzinfo=None) if valid_times.size else None
+    analytics: Optional[Dict[str, Any]] = None
+    try:
+        analytics = track_analytics.analyze_point_arrays(arrays["lat"], arrays["lon"], arrays["ele"], arrays["time"])
+    except Exception as e_analytics:
+        print(f"Warnung: Analyse für {original_filename} fehlgeschlagen: {e_analytics}")
+    return {
+        "original_filename": original_filename,
+        "track_name": track_name or "Unbenannter Track",
+        "distance_km": round(float(metrics["cum_3d_m"][-1]) / 1000.0, 2),
+        "track_date": track_date,
+        "total_ascent": round(float(metrics["cum_up_m"][-1]), 2),
+        "total_descent": round(float(metrics["cum_down_m"][-1]), 2),
+        "points": np.column_stack((arrays["lat"], arrays["lon"])).tolist(),
+        "analytics": analytics,
+    }
+
+def parse_track_content(track_format: str, original_filename: str, file_content_bytes: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        track_name, arrays = decode_track(track_format, file_content_bytes)
+        return parsed_result_from_point_arrays(original_filename, track_name, arrays)
+    except (ValueError, ET.ParseError, struct.error, KeyError, TypeError, IndexError) as e_format:
+        print(f"{track_format.upper()} Fehler in Datei {original_filename}: {e_format}")
+        return None
+    except Exception as e:
+        print(f"Allgemeiner Fehler beim Parsen von {track_format.upper()} {original_filename}: {e}")
+        traceback.print_exc()
+        return None
+
+def load_point_arrays(track_format: str, filepath_str: str) -> Optional[Dict[str, np.ndarray]]:
+    """Punkt-Arrays einer gespeicherten FIT/TCX/GeoJSON-Datei oder None bei Fehlern."""
+    try:
+        with open(filepath_str, "rb") as f:
+            return decode_track(track_format, f.read())[1]
+    except FileNotFoundError:
+        print(f"Fehler: Track-Datei nicht gefunden unter {filepath_str}")
+        return None
+    except (ValueError, ET.ParseError, struct.error, KeyError, TypeError, IndexError) as e_format:
+        print(f"{track_format.upper()} Fehler beim Lesen der Punkte aus {filepath_str}: {e_format}")
+        return None
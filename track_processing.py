@@ -0,0 +1,203 @@
+# projekt_gpx_viewer/track_processing.py
+"""
+Registry der abgeleiteten Track-Artefakte ("Prozessoren").
+
+Ein Prozessor besteht aus
+  - compute(punkt_arrays) -> Ergebnis: rein, ohne DB-Zugriff, picklebar (läuft auch in Prozess-Pools),
+  - apply(db, track, ergebnis) -> optionales Info-Dict: schreibt das Ergebnis in DB/Dateisystem.
+Die Track-Datei wird pro Track nur einmal geladen und geparst (load_point_arrays), alle Prozessoren rechnen auf
+denselben Punkt-Arrays (gpx_utils.extract_point_arrays). Nach dem Upload wird pro Track ein Job 'track_processor'
+mit allen veralteten Prozessoren eingereiht (siehe job_queue.py); für Bestandsdaten gibt es reprocess.py. Welche Prozessor-Version zuletzt gelaufen ist, steht pro Track
+in TrackDB.processing_versions - nach einer Versionserhöhung gelten nur diese Tracks als veraltet.
+"""
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import blob_storage
+import db_config
+import elevation_profiles
+import fingerprint
+import gpx_utils
+import job_queue
+import point_store
+import thumbnails
+import track_analytics
+
+JOB_KIND_TRACK_PROCESSOR = "track_processor"
+
+PointArrays = Dict[str, np.ndarray]
+
+class TrackProcessor(NamedTuple):
+    name: str
+    version: int
+    compute: Callable[[PointArrays], Any]
+    apply: Callable[[Session, db_config.TrackDB, Any], Optional[Dict[str, Any]]]
+
+TRACK_PROCESSORS: Dict[str, TrackProcessor] = {}
+
+def register_track_processor(name: str, version: int, compute: Callable[[PointArrays], Any],
+                             apply: Callable[[Session, db_config.TrackDB, Any], Optional[Dict[str, Any]]]):
+    TRACK_PROCESSORS[name] = TrackProcessor(name, version, compute, apply)
+
+def get_processing_versions(track: db_config.TrackDB) -> Dict[str, int]:
+    try:
+        return json.loads(track.processing_versions or "{}")
+    except json.JSONDecodeError:
+        return {}
+
+def stale_processor_names(track: db_config.TrackDB, processor_names: Optional[List[str]] = None) -> List[str]:
+    versions = get_processing_versions(track)
+    return [name for name in (processor_names or list(TRACK_PROCESSORS))
+            if versions.get(name, 0) < TRACK_PROCESSORS[name].version]
+
+def mark_parse_time_artifacts(parsed_gpx_data: Dict[str, Any]):
+    """Artefakte, die schon beim Parsen entstehen (Analysen, Startpunkt), als aktuell markieren, damit kein Job sie wiederholt."""
+    versions = {}
+    if parsed_gpx_data.get("analytics"):
+        versions["analytics"] = TRACK_PROCESSORS["analytics"].version
+    if parsed_gpx_data.get("points"):
+        versions["start_point"] = TRACK_PROCESSORS["start_point"].version
+    if versions:
+        parsed_gpx_data["processing_versions"] = versions
+
+def apply_processor_result(db: Session, track: db_config.TrackDB, processor: TrackProcessor, result: Any) -> Optional[Dict[str, Any]]:
+    """Schreibt das Ergebnis und vermerkt die Prozessor-Version am Track (ohne Commit)."""
+    info = processor.apply(db, track, result)
+    versions = get_processing_versions(track)
+    versions[processor.name] = processor.version
+    track.processing_versions = json.dumps(versions, sort_keys=True)
+    return info
+
+def enqueue_track_processing(db: Session, user_id: int, track_id: int, processor_names: Optional[List[str]] = None, commit: bool = True):
+    """Reiht einen Job mit allen veralteten Prozessoren des Tracks ein (Standard: alle registrierten Prozessoren)."""
+    track = db.query(db_config.TrackDB).filter(db_config.TrackDB.id == track_id, db_config.TrackDB.user_id == user_id).first()
+    if not track:
+        return
+    stale_names = stale_processor_names(track, processor_names)
+    if stale_names:
+        job_queue.enqueue_job(db, JOB_KIND_TRACK_PROCESSOR, {"processors": stale_names}, user_id=user_id,
+                              track_id=track_id, commit=False)
+    if commit:
+        db.commit()
+        job_queue.notify_new_jobs()
+
+def load_point_arrays(stored_filename: str) -> PointArrays:
+    """Lädt die Track-Datei einmal aus dem Blob-Speicher und parst sie einmal; fehlt sie oder ist unlesbar, Exception."""
+    with blob_storage.get_store().local_file(stored_filename) as gpx_file_path:
+        if gpx_file_path is None:
+            raise FileNotFoundError(f"Track-Datei fehlt: {stored_filename}")
+        point_arrays = gpx_utils.get_point_arrays_from_gpx_file(str(gpx_file_path))
+    if point_arrays is None:
+        raise ValueError(f"Punkte aus {stored_filename} nicht lesbar.")
+    return point_arrays
+
+def compute_processors(point_arrays: PointArrays, processor_names: List[str]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Rechnet die Prozessoren auf denselben Punkt-Arrays. Rückgabe: (ergebnisse, fehlermeldungen) je Prozessorname."""
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for name in processor_names:
+        try:
+            results[name] = TRACK_PROCESSORS[name].compute(point_arrays)
+        except Exception as e:
+            errors[name] = f"{type(e).__name__}: {e}"
+    return results, errors
+
+def run_processors_for_track(processor_names: List[str], track_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Datei einmal laden und parsen, die noch veralteten Prozessoren rechnen und in einer Transaktion schreiben.
+    Schlagen einzelne Prozessoren fehl, bleiben die übrigen gespeichert und der Job wird (nur für diese) wiederholt.
+    """
+    db = db_config.SessionLocal()
+    try:
+        track = db.query(db_config.TrackDB).filter(db_config.TrackDB.id == track_id).first()
+        if not track:
+            return None
+        stale_names = stale_processor_names(track, processor_names)
+        if not stale_names:
+            return None
+        results, errors = compute_processors(load_point_arrays(track.stored_filename), stale_names)
+        info: Dict[str, Any] = {}
+        for name, result in results.items():
+            info.update(apply_processor_result(db, track, TRACK_PROCESSORS[name], result) or {})
+        db.commit()
+        if errors:
+            raise RuntimeError("; ".join(f"{name}: {error}" for name, error in errors.items()))
+        return info or None
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+@job_queue.register_job_handler(JOB_KIND_TRACK_PROCESSOR)
+def _handle_track_processor_job(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    payload = job["payload"]
+    # "processor": einzelner Prozessor aus Jobs, die vor der Bündelung pro Track eingereiht wurden
+    return run_processors_for_track(payload.get("processors") or [payload["processor"]], job["track_id"])
+
+# --- Prozessoren -----------------------------------------------------------------------------------------------
+
+def _compute_fingerprint(point_arrays: PointArrays) -> Optional[Dict[str, Any]]:
+    computed = fingerprint.compute_fingerprint(np.column_stack((point_arrays["lat"], point_arrays["lon"])))
+    if not computed:
+        return None
+    signature, cell_count = computed
+    return {"signature": signature.tobytes(), "cell_count": cell_count}
+
+def _apply_fingerprint(db: Session, track: db_config.TrackDB, result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not result:
+        return None
+    signature = np.frombuffer(result["signature"], dtype=np.uint32)
+    similar = fingerprint.find_similar_tracks(db, track.user_id, signature, exclude_track_id=track.id, limit=3)
+    fingerprint.store_fingerprint(db, track.user_id, track.id, signature, result["cell_count"], commit=False)
+    return {"similar_tracks": fingerprint.similar_track_hints(db, track.user_id, similar)}
+
+register_track_processor("fingerprint", 1, _compute_fingerprint, _apply_fingerprint)
+
+def _compute_analytics(point_arrays: PointArrays) -> Optional[Dict[str, Any]]:
+    return track_analytics.analyze_point_arrays(point_arrays["lat"], point_arrays["lon"], point_arrays["ele"], point_arrays["time"])
+
+def _apply_analytics(db: Session, track: db_config.TrackDB, result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    db_config.apply_analytics_to_track(track, result)
+    return None
+
+register_track_processor("analytics", 1, _compute_analytics, _apply_analytics)
+
+def _compute_profile(point_arrays: PointArrays) -> np.ndarray:
+    return elevation_profiles.compute_profile(point_arrays["lat"], point_arrays["lon"], point_arrays["ele"])
+
+def _apply_profile(db: Session, track: db_config.TrackDB, result: np.ndarray) -> Optional[Dict[str, Any]]:
+    elevation_profiles.save_profile(track.id, result)
+    return None
+
+register_track_processor("profile", 1, _compute_profile, _apply_profile)
+
+def _compute_points(point_arrays: PointArrays) -> PointArrays:
+    return point_arrays
+
+def _apply_points(db: Session, track: db_config.TrackDB, result: PointArrays) -> Optional[Dict[str, Any]]:
+    point_store.write_track(track.user_id, track.id, result)
+    return None
+
+register_track_processor("points", 1, _compute_points, _apply_points)
+
+def _compute_thumbnail(point_arrays: PointArrays) -> bytes:
+    return thumbnails.render_thumbnail_svg(point_arrays["lat"], point_arrays["lon"])
+
+def _apply_thumbnail(db: Session, track: db_config.TrackDB, result: bytes) -> Optional[Dict[str, Any]]:
+    thumbnails.save_thumbnail(track.id, result, thumbnails.thumbnail_key(track))
+    return None
+
+register_track_processor("thumbnail", thumbnails.THUMBNAIL_VERSION, _compute_thumbnail, _apply_thumbnail)
+
+def _compute_start_point(point_arrays: PointArrays) -> Optional[List[float]]:
+    return [float(point_arrays["lat"][0]), float(point_arrays["lon"][0])] if point_arrays["lat"].size else None
+
+def _apply_start_point(db: Session, track: db_config.TrackDB, result: Optional[List[float]]) -> Optional[Dict[str, Any]]:
+    track.start_lat, track.start_lon = result or (None, None)
+    return None
+
+register_track_processor("start_point", 1, _compute_start_point, _apply_start_point)